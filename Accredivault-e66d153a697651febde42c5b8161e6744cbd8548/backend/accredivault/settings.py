@@ -25,6 +25,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'documents.middleware.MetricsMiddleware',
+    'documents.middleware.CompressionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -33,6 +35,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'documents.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'accredivault.urls'
@@ -54,6 +57,81 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'accredivault.wsgi.application'
+ASGI_APPLICATION = 'accredivault.asgi.application'
+
+# /api/metrics needs "Authorization: Bearer <METRICS_TOKEN>". Without a token
+# only direct loopback requests may scrape it, unless METRICS_PUBLIC opens it
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_PUBLIC = os.getenv('METRICS_PUBLIC', 'False').lower() == 'true'
+
+# Per-request profiling (off by default). Requests are profiled when they carry
+# a signed X-Profile-Token header (`manage.py profile_token <path>`) or fall in
+# the sample rate; results are listed at /admin/profiles/.
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False').lower() == 'true'
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_SECRET = os.getenv('PROFILING_SECRET', '')
+PROFILING_DIR = Path(os.getenv('PROFILING_DIR', BASE_DIR / 'profiles'))
+
+# Serve verify/download endpoints from documents.async_views (run under ASGI)
+USE_ASYNC_VIEWS = os.getenv('USE_ASYNC_VIEWS', 'False').lower() == 'true'
+
+# Server-Sent Events at /api/docs/events/, only with USE_ASYNC_VIEWS (501
+# otherwise, since under WSGI each stream would hold a worker). One poller per
+# worker reads the change log every SSE_POLL_SECONDS and fans out to all
+# subscribers; streams end after SSE_MAX_STREAM_SECONDS and the browser
+# reconnects with Last-Event-ID.
+SSE_POLL_SECONDS = float(os.getenv('SSE_POLL_SECONDS', '1'))
+SSE_HEARTBEAT_SECONDS = int(os.getenv('SSE_HEARTBEAT_SECONDS', '15'))
+SSE_MAX_STREAM_SECONDS = int(os.getenv('SSE_MAX_STREAM_SECONDS', '300'))
+SSE_REPLAY_LIMIT = 1000
+
+# Ed25519 keys for signing document manifests (see documents/signing.py):
+# comma-separated kid:base64-seed pairs from `manage.py generate_signing_key`.
+# Without keys, manifests are returned unsigned.
+MANIFEST_SIGNING_KEYS = os.getenv('MANIFEST_SIGNING_KEYS', '')
+MANIFEST_ACTIVE_KEY_ID = os.getenv('MANIFEST_ACTIVE_KEY_ID', '')
+MANIFEST_RETIRED_PUBLIC_KEYS = os.getenv('MANIFEST_RETIRED_PUBLIC_KEYS', '')
+
+# Compress uploads before encryption: '' (off), 'zlib' or 'br' (brotli).
+# Already-compressed PDFs are detected from a sample and stored as-is.
+UPLOAD_COMPRESSION = os.getenv('UPLOAD_COMPRESSION', '')
+
+# Parallel SHA-256 tree hash stored next to file_hash for uploads of at least
+# TREE_HASH_MIN_BYTES (see documents/treehash.py); 0 workers = min(8, CPUs)
+TREE_HASH_ENABLED = os.getenv('TREE_HASH_ENABLED', 'False').lower() == 'true'
+TREE_HASH_MIN_BYTES = int(os.getenv('TREE_HASH_MIN_BYTES', str(2 * 1024 * 1024)))
+TREE_HASH_WORKERS = int(os.getenv('TREE_HASH_WORKERS', '0'))
+
+# Storage integrity scrubbing (manage.py scrub_storage)
+SCRUB_WORKERS = int(os.getenv('SCRUB_WORKERS', '4'))
+SCRUB_MAX_MB_PER_SEC = float(os.getenv('SCRUB_MAX_MB_PER_SEC', '20'))
+SCRUB_CHECKPOINT_PATH = Path(os.getenv('SCRUB_CHECKPOINT_PATH', BASE_DIR / 'scrub_checkpoint.json'))
+
+# Storage garbage collection (manage.py reconcile_storage): blobs with no
+# Document row are only deleted once they are older than this
+STORAGE_GC_GRACE_SECONDS = int(os.getenv('STORAGE_GC_GRACE_SECONDS', str(24 * 3600)))
+
+# Delta sync (/api/docs/changes/) only returns rows older than this, so rows
+# from transactions still in flight can't be skipped by a client's cursor
+DELTA_SYNC_SETTLE_SECONDS = float(os.getenv('DELTA_SYNC_SETTLE_SECONDS', '2'))
+
+# Resumable uploads (/api/docs/uploads/): ciphertext of unfinished uploads is
+# spooled here; sessions idle for longer than the TTL are removed by
+# `manage.py cleanup_upload_sessions`
+RESUMABLE_UPLOAD_DIR = Path(os.getenv('RESUMABLE_UPLOAD_DIR', BASE_DIR / 'upload_sessions'))
+RESUMABLE_UPLOAD_MAX_BYTES = int(os.getenv('RESUMABLE_UPLOAD_MAX_BYTES', str(200 * 1024 * 1024)))
+RESUMABLE_UPLOAD_MAX_CHUNK_BYTES = int(os.getenv('RESUMABLE_UPLOAD_MAX_CHUNK_BYTES', str(8 * 1024 * 1024)))
+RESUMABLE_UPLOAD_TTL_SECONDS = int(os.getenv('RESUMABLE_UPLOAD_TTL_SECONDS', str(24 * 3600)))
+# A PATCH holds its session this long at most; a killed worker's claim lapses after it
+RESUMABLE_UPLOAD_LOCK_SECONDS = int(os.getenv('RESUMABLE_UPLOAD_LOCK_SECONDS', '600'))
+
+# Idempotency-Key on uploads: responses are replayed for the TTL (expired rows
+# are removed by `manage.py cleanup_idempotency_keys`); a repeat waits up to
+# WAIT seconds (at most 5) for the first request before answering 409, and a
+# claim older than LOCK seconds without a response is treated as abandoned
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv('IDEMPOTENCY_TTL_SECONDS', str(24 * 3600)))
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv('IDEMPOTENCY_WAIT_SECONDS', '1'))
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv('IDEMPOTENCY_LOCK_SECONDS', '600'))
 
 # Database
 DATABASES = {
@@ -63,12 +141,50 @@ DATABASES = {
     }
 }
 
+# Read replicas (optional): comma-separated SQLite files kept in sync with the
+# primary (see `manage.py sync_replicas`). Reads go to a replica unless the
+# client wrote within the last REPLICA_PIN_SECONDS.
+DATABASE_REPLICAS = []
+for _path in [p.strip() for p in os.getenv('DB_REPLICA_PATHS', '').split(',') if p.strip()]:
+    _alias = f'replica{len(DATABASE_REPLICAS) + 1}'
+    DATABASES[_alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': _path,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(_alias)
+
+# Per-institution shards (optional): comma-separated SQLite files holding
+# document data next to 'default'; each institution lives on one of them (see
+# documents/sharding.py and `manage.py rebalance_shards`). Replicas mirror
+# 'default' only, so ShardRouter goes first and document reads always hit the
+# owner's shard; replicas then serve the remaining tables.
+DOCUMENT_SHARDS = ['default']
+for _path in [p.strip() for p in os.getenv('DB_SHARD_PATHS', '').split(',') if p.strip()]:
+    _alias = f'shard{len(DOCUMENT_SHARDS)}'
+    DATABASES[_alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': _path,
+    }
+    DOCUMENT_SHARDS.append(_alias)
+# How long a process trusts its cached institution -> shard placement
+SHARD_DIRECTORY_CACHE_SECONDS = float(os.getenv('SHARD_DIRECTORY_CACHE_SECONDS', '5'))
+
+DATABASE_ROUTERS = ['documents.sharding.ShardRouter'] if len(DOCUMENT_SHARDS) > 1 else []
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS.append('documents.routers.ReplicaRouter')
+if DATABASE_REPLICAS:
+    MIDDLEWARE.append('documents.middleware.ReplicaPinningMiddleware')
+REPLICA_PIN_COOKIE = 'avault_pin'
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', '5'))
+
 # REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        # orjson-backed when installed, otherwise identical to JSONRenderer
+        'documents.renderers.FastJSONRenderer',
     ],
     'EXCEPTION_HANDLER': 'rest_framework.views.exception_handler',
 }
@@ -97,7 +213,53 @@ CORS_ALLOW_HEADERS = [
     'x-requested-with',
     'x-user-id',  # Custom headers for auth
     'x-user-role',
+    'last-event-id',  # EventSource reconnects
+    'upload-offset',  # resumable uploads
+    'upload-length',
+    'tus-resumable',
+    'idempotency-key',
 ]
+CORS_EXPOSE_HEADERS = ['ETag', 'Retry-After', 'Location', 'Upload-Offset', 'Upload-Length', 'Upload-Expires', 'Tus-Resumable',
+                        'Idempotent-Replayed']
+
+# Admission control for the public verify endpoints (documents/throttling.py).
+# Buckets refill at `rate` tokens/second up to `burst`, per client and for
+# all clients together; state lives in a SQLite file shared by all workers.
+THROTTLE_ENABLED = os.getenv('THROTTLE_ENABLED', 'True').lower() == 'true'
+THROTTLE_DB_PATH = os.getenv('THROTTLE_DB_PATH', str(BASE_DIR / 'throttle.sqlite3'))
+THROTTLE_RATES = {
+    'verify_document': {'rate': 5, 'burst': 30, 'global_rate': 500, 'global_burst': 1000},
+    # Decrypt + SHA-256 over up to 10MB per call
+    'verify_document_file': {'rate': 0.5, 'burst': 10, 'global_rate': 20, 'global_burst': 40},
+}
+# Set to e.g. 'X-Forwarded-For' when running behind a trusted reverse proxy, and
+# THROTTLE_TRUSTED_PROXIES to how many proxies append to it. The client is the
+# address that many entries from the right; entries further left are client-written.
+THROTTLE_CLIENT_IP_HEADER = os.getenv('THROTTLE_CLIENT_IP_HEADER', '')
+THROTTLE_TRUSTED_PROXIES = int(os.getenv('THROTTLE_TRUSTED_PROXIES', '1'))
+# In-flight cap for all workers together (leases in THROTTLE_DB_PATH); expensive
+# (decrypting) calls may use only a share of it. A lease left by a killed worker
+# expires after lease_seconds.
+THROTTLE_CONCURRENCY = {'limit': 32, 'expensive_share': 0.25, 'lease_seconds': 120}
+
+# Bloom filter over issued doc_ids (documents/bloom.py): the verify endpoints
+# answer unknown ids with 404 without a query. Each process loads the
+# snapshot in a background thread on first use and catches up with new
+# uploads every REFRESH seconds;
+# `manage.py build_doc_filter` rewrites the snapshot at the current size.
+DOC_FILTER_ENABLED = os.getenv('DOC_FILTER_ENABLED', 'True').lower() == 'true'
+DOC_FILTER_SNAPSHOT_PATH = Path(os.getenv('DOC_FILTER_SNAPSHOT_PATH', BASE_DIR / 'doc_filter.bin'))
+DOC_FILTER_FALSE_POSITIVE_RATE = float(os.getenv('DOC_FILTER_FALSE_POSITIVE_RATE', '0.01'))
+DOC_FILTER_REFRESH_SECONDS = float(os.getenv('DOC_FILTER_REFRESH_SECONDS', '30'))
+
+# HTTP caching. Metadata is public and revalidated with its ETag; the encrypted
+# blob never changes for a doc_id but needs role headers, so only private caches
+# may keep it.
+DOCUMENT_CACHE_CONTROL = 'public, max-age=5, must-revalidate'
+DOWNLOAD_CACHE_CONTROL = 'private, max-age=86400'
+
+# Responses smaller than this are sent uncompressed (CompressionMiddleware)
+COMPRESSION_MIN_SIZE = 1024
 
 # File Upload Settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
@@ -2,8 +2,11 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from documents import profiling
 
 urlpatterns = [
+    path('admin/profiles/', profiling.profile_list, name='profile-list'),
+    path('admin/profiles/<str:name>/', profiling.profile_download, name='profile-download'),
     path('admin/', admin.site.urls),
     path('api/', include('documents.urls')),
 ]
@@ -0,0 +1,104 @@
+"""Shared helpers for the benchmark scripts in this directory.
+
+``setup_django()`` boots the project against a throwaway SQLite database and
+media directory (never ``db.sqlite3`` or ``media/``), with a random encryption
+key if none is configured. Results are written as JSON tagged with the git
+commit so runs can be compared with ``compare.py``.
+"""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+
+
+def setup_django(workdir=None):
+    """Configure Django on a scratch database/media root and migrate it."""
+    sys.path.insert(0, str(BACKEND_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'accredivault.settings')
+    workdir = Path(workdir or tempfile.mkdtemp(prefix='accredivault-bench-'))
+
+    from django.conf import settings
+    settings.DATABASES['default']['NAME'] = str(workdir / 'bench.sqlite3')
+    settings.MEDIA_ROOT = str(workdir / 'media')
+    settings.DEBUG = False
+    # Measure the endpoints themselves, not the verify rate limits
+    settings.THROTTLE_ENABLED = False
+    settings.THROTTLE_DB_PATH = str(workdir / 'throttle.sqlite3')
+    # A snapshot of the bench database must never be loaded by a real server
+    settings.DOC_FILTER_SNAPSHOT_PATH = str(workdir / 'doc_filter.bin')
+    if not getattr(settings, 'ENCRYPTION_KEY', None):
+        settings.ENCRYPTION_KEY = os.urandom(32)
+
+    import django
+    django.setup()
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+    return workdir
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of an unsorted list (pct in 0..100)."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def summarize(samples_seconds):
+    """Latency summary in milliseconds."""
+    return {
+        'count': len(samples_seconds),
+        'mean_ms': round(statistics.fmean(samples_seconds) * 1000, 3) if samples_seconds else None,
+        'p50_ms': round(percentile(samples_seconds, 50) * 1000, 3) if samples_seconds else None,
+        'p95_ms': round(percentile(samples_seconds, 95) * 1000, 3) if samples_seconds else None,
+        'p99_ms': round(percentile(samples_seconds, 99) * 1000, 3) if samples_seconds else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return 'unknown'
+
+
+def write_results(kind, results, output=None, **meta):
+    """Write {meta, results} JSON and return the path written."""
+    commit = git_commit()
+    payload = {
+        'meta': {
+            'kind': kind,
+            'commit': commit,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            **meta,
+        },
+        'results': results,
+    }
+    if output:
+        path = Path(output)
+    else:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        path = RESULTS_DIR / f'{kind}-{commit}-{int(time.time())}.json'
+    path.write_text(json.dumps(payload, indent=2))
+    return path
+
+
+def sample_pdf(size):
+    """Deterministic PDF-looking bytes of the given size."""
+    head, tail = b'%PDF-1.4\n', b'\n%%EOF\n'
+    body = (b'BT /F1 12 Tf 72 712 Td (AccrediVault benchmark) Tj ET\n' * (size // 50 + 1))
+    return head + body[:max(0, size - len(head) - len(tail))] + tail
@@ -0,0 +1,40 @@
+"""Compare two benchmark result files written by micro.py or macro.py.
+
+    python benchmarks/compare.py results/micro-abc123-....json results/micro-def456-....json
+
+Matches cases by name (plus size/rows/query where present) and prints the relative
+change of every shared timing or throughput figure.
+"""
+import json
+import sys
+
+METRICS = (
+    'best_ms', 'median_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps', 'mb_per_s',
+    'fast_render_ms', 'stock_render_ms', 'json_bytes', 'gzip_bytes', 'br_bytes',
+    'fts_p50_ms', 'like_p50_ms', 'rows_per_s', 'tail_rows_per_s', 'ratio', 'compress_ms', 'decompress_ms',
+)
+
+
+def case_key(result):
+    return (result['name'], result.get('size_bytes'), result.get('rows'), result.get('query'))
+
+
+def main(old_path, new_path):
+    old, new = (json.load(open(p)) for p in (old_path, new_path))
+    print(f"{old['meta']['commit']} -> {new['meta']['commit']}")
+    old_cases = {case_key(r): r for r in old['results']}
+    for result in new['results']:
+        before = old_cases.get(case_key(result))
+        if not before:
+            continue
+        label = ' '.join(str(k) for k in case_key(result) if k is not None)
+        for metric in METRICS:
+            if metric in result and before.get(metric):
+                change = (result[metric] - before[metric]) / before[metric] * 100
+                print(f'{label:<32} {metric:<15} {before[metric]:>12} -> {result[metric]:>12} ({change:+.1f}%)')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        raise SystemExit(__doc__)
+    main(sys.argv[1], sys.argv[2])
@@ -0,0 +1,94 @@
+"""Compression ratio and CPU cost of the pre-encryption compression stage.
+
+    python benchmarks/compression.py [--corpus DIR] [--codecs zlib,br] [--output out.json]
+
+Runs compress_for_storage over a corpus of PDFs: every ``*.pdf`` under
+``--corpus`` if given, otherwise a synthetic set covering the shapes we see
+from institutions (text-only PDFs, scans with raw image streams, PDFs whose
+streams are already Flate-compressed, and JPEG-like high-entropy scans).
+For each file and codec it reports the codec chosen, stored/original size,
+and the time spent deciding, compressing and decompressing.
+"""
+import argparse
+import random
+import statistics
+import time
+import zlib
+from pathlib import Path
+
+from common import setup_django, write_results, sample_pdf
+
+
+def synthetic_corpus(size=1024 * 1024):
+    rng = random.Random(7)
+    head, tail = b'%PDF-1.4\n', b'\n%%EOF\n'
+    # Raw 8-bit greyscale scan: paper-white background with darker text rows
+    rows = []
+    for y in range(size // 1024):
+        ink = y % 24 < 6
+        rows.append(bytes(rng.randrange(20, 90) if ink and rng.random() < 0.4 else rng.randrange(235, 256)
+                          for _ in range(1024)))
+    raw_scan = head + b'stream\n' + b''.join(rows) + b'\nendstream' + tail
+    text = sample_pdf(size)
+    flate = head + b'stream\n' + zlib.compress(raw_scan, 6) + b'\nendstream' + tail
+    jpeg_like = head + b'stream\n' + rng.randbytes(size) + b'\nendstream' + tail
+    return {'text.pdf': text, 'raw_scan.pdf': raw_scan, 'flate_streams.pdf': flate, 'jpeg_scan.pdf': jpeg_like}
+
+
+def timed(fn, repeat=5):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - started)
+    return result, round(statistics.median(samples) * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pre-encryption compression benchmark')
+    parser.add_argument('--corpus', help='directory of PDFs (default: synthetic corpus)')
+    parser.add_argument('--codecs', default='zlib,br')
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    setup_django()
+    from documents.compression import brotli, compress_for_storage, decompress, looks_compressible
+
+    if args.corpus:
+        corpus = {p.name: p.read_bytes() for p in sorted(Path(args.corpus).rglob('*.pdf'))}
+    else:
+        corpus = synthetic_corpus()
+    codecs = [c for c in args.codecs.split(',') if c and (c != 'br' or brotli is not None)]
+
+    results = []
+    totals = {codec: [0, 0] for codec in codecs}
+    for name, data in corpus.items():
+        for codec in codecs:
+            _, sample_ms = timed(lambda: looks_compressible(codec, data))
+            (chosen, stored), compress_ms = timed(lambda: compress_for_storage(data, codec))
+            _, decompress_ms = timed(lambda: decompress(chosen, stored))
+            totals[codec][0] += len(data)
+            totals[codec][1] += len(stored)
+            result = {
+                'name': 'compress',
+                'query': f'{name}:{codec}',
+                'size_bytes': len(data),
+                'stored_bytes': len(stored),
+                'codec_chosen': chosen or 'none',
+                'ratio': round(len(stored) / len(data), 3),
+                'sample_ms': sample_ms,
+                'compress_ms': compress_ms,
+                'decompress_ms': decompress_ms,
+                'mb_per_s': round(len(data) / 1e6 / (compress_ms / 1000), 1) if compress_ms else None,
+            }
+            print(result)
+            results.append(result)
+    for codec, (original, stored) in totals.items():
+        print(f'{codec}: corpus {original} -> {stored} bytes ({stored / original:.1%})')
+
+    path = write_results('compression', results, args.output, corpus=args.corpus or 'synthetic')
+    print(f'wrote {path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Insert throughput: legacy random doc ids vs time-ordered ones.
+
+    python benchmarks/ids.py [--documents 300000] [--batch 1000] [--saves 2000] [--output out.json]
+
+For each scheme, bulk-loads ``--documents`` rows into an empty Document table
+in ``--batch``-sized transactions and reports overall rows/s plus the rate of
+the final tenth, when the primary key index is largest. Legacy ids
+(``doc-<8 hex>``) that collide are counted and redrawn; in production such a
+collision made ``save()`` overwrite the existing row. ``--saves`` times
+single-row ``Document.save()`` calls, which for new ids is now a plain INSERT.
+"""
+import argparse
+import time
+import uuid
+
+from common import setup_django, write_results
+
+
+def legacy_id():
+    return f"doc-{uuid.uuid4().hex[:8]}"
+
+
+def bulk_load(make_id, count, batch):
+    from django.db import transaction
+    from documents.models import Document
+    seen, collisions, marks = set(), 0, []
+    started = time.perf_counter()
+    for start in range(0, count, batch):
+        rows = []
+        for i in range(start, min(count, start + batch)):
+            doc_id = make_id()
+            while doc_id in seen:
+                collisions += 1
+                doc_id = make_id()
+            seen.add(doc_id)
+            rows.append(Document(doc_id=doc_id, title=f'Certificate {i}', owner=f'institution-{i % 500}',
+                                 file=f'documents/{i}.pdf'))
+        with transaction.atomic():
+            Document.objects.bulk_create(rows)
+        marks.append((min(count, start + batch), time.perf_counter() - started))
+    total = marks[-1][1]
+    tail_start = next(t for n, t in marks if n >= count * 0.9)
+    return {
+        'rows_per_s': round(count / total),
+        'tail_rows_per_s': round((count - count * 0.9) / max(total - tail_start, 1e-9)),
+        'collisions': collisions,
+    }
+
+
+def timed_saves(count):
+    from documents.models import Document
+    started = time.perf_counter()
+    for i in range(count):
+        Document(title=f'Saved {i}', owner='institution-1', file=f'documents/s{i}.pdf').save()
+    return round(count / (time.perf_counter() - started))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Document id insert benchmark')
+    parser.add_argument('--documents', type=int, default=300000)
+    parser.add_argument('--batch', type=int, default=1000)
+    parser.add_argument('--saves', type=int, default=2000)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    setup_django()
+    from documents.models import Document
+    from documents.utils import new_doc_id
+
+    results = []
+    for name, make_id in (('legacy', legacy_id), ('time_ordered', new_doc_id)):
+        Document.objects.all().delete()
+        result = {'name': 'insert_ids', 'query': name, 'documents': args.documents,
+                  **bulk_load(make_id, args.documents, args.batch)}
+        print(result)
+        results.append(result)
+    Document.objects.all().delete()
+    result = {'name': 'save', 'query': 'time_ordered', 'rows_per_s': timed_saves(args.saves)}
+    print(result)
+    results.append(result)
+
+    path = write_results('ids', results, args.output, batch=args.batch)
+    print(f'wrote {path}')
+
+
+if __name__ == '__main__':
+    main()
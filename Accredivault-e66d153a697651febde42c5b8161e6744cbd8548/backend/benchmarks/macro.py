@@ -0,0 +1,138 @@
+"""HTTP macrobenchmarks: upload, list, verify and download under concurrency.
+
+    python benchmarks/macro.py [--url http://127.0.0.1:8000] [--concurrency 8] [--requests 200]
+
+Without ``--url`` the project is served in-process by Django's threaded WSGI
+server on a scratch database, so the numbers include the load generator
+sharing the GIL; point ``--url`` at gunicorn/uvicorn (with
+ENCRYPTION_KEY_B64 set and THROTTLE_ENABLED=false) for deployment-like
+figures. Reports p50/p95/p99 latency and throughput per operation and
+writes them as JSON.
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from common import setup_django, write_results, summarize, sample_pdf
+
+ADMIN = {'x-user-id': 'bench-institution', 'x-user-role': 'ADMIN'}
+VERIFIER = {'x-user-id': 'bench-verifier', 'x-user-role': 'VERIFIER'}
+
+
+def start_in_process_server():
+    setup_django()
+    from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+    from django.core.wsgi import get_wsgi_application
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler, allow_reuse_address=True)
+    server.set_app(get_wsgi_application())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}', server
+
+
+def request(method, url, headers=None, body=None):
+    req = urllib.request.Request(url, data=body, method=method, headers=headers or {})
+    try:
+        with urllib.request.urlopen(req, timeout=60) as resp:
+            return resp.status, resp.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, content) in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f'Content-Type: application/pdf\r\n\r\n'.encode() + content + b'\r\n'
+        )
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return f'multipart/form-data; boundary={boundary}', b''.join(parts)
+
+
+def run_operation(name, fn, total, concurrency):
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def one(i):
+        nonlocal errors
+        started = time.perf_counter()
+        ok = fn(i)
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    wall = time.perf_counter() - started
+    result = {'name': name, 'requests': total, 'concurrency': concurrency, 'errors': errors,
+              'throughput_rps': round(total / wall, 1), **summarize(latencies)}
+    print(result)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AccrediVault HTTP macrobenchmarks')
+    parser.add_argument('--url', help='benchmark an already running server instead of an in-process one')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200, help='requests per operation')
+    parser.add_argument('--file-size', type=int, default=256 * 1024)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    base = args.url.rstrip('/') if args.url else start_in_process_server()[0]
+    api = f'{base}/api'
+    pdf = sample_pdf(args.file_size)
+    uploaded = []
+
+    def upload(i):
+        content_type, body = multipart({'title': f'Benchmark {i}'}, {'file': (f'bench-{i}.pdf', pdf)})
+        code, raw = request('POST', f'{api}/docs/upload/', {**ADMIN, 'Content-Type': content_type}, body)
+        if code == 201:
+            doc = json.loads(raw)
+            uploaded.append((doc['doc_id'], doc['hash']))
+        return code == 201
+
+    def listing(i):
+        code, _ = request('GET', f'{api}/docs/?page_size=100&page={i % 3 + 1}')
+        return code == 200
+
+    def verify(i):
+        doc_id, file_hash = uploaded[i % len(uploaded)]
+        body = json.dumps({'doc_id': doc_id, 'file_hash': file_hash}).encode()
+        code, raw = request('POST', f'{api}/verify/', {'Content-Type': 'application/json'}, body)
+        return code == 200 and json.loads(raw).get('valid') is True
+
+    def download(i):
+        doc_id, _ = uploaded[i % len(uploaded)]
+        code, _ = request('GET', f'{api}/docs/{doc_id}/download/', VERIFIER)
+        return code == 200
+
+    results = [run_operation('upload', upload, args.requests, args.concurrency)]
+    if not uploaded:
+        raise SystemExit('No uploads succeeded; is ENCRYPTION_KEY_B64 set on the server?')
+    for name, fn in (('list', listing), ('verify', verify), ('download', download)):
+        results.append(run_operation(name, fn, args.requests, args.concurrency))
+
+    path = write_results('macro', results, args.output, target=args.url or 'in-process',
+                         file_size=args.file_size)
+    print(f'wrote {path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Microbenchmarks for the upload hot path, serialization and audit logging.
+
+    python benchmarks/micro.py [--sizes 65536,1048576,10485760] [--output out.json]
+
+Covers SHA-256 + AES-256-GCM at several file sizes (what upload_document does
+per file), DocumentSerializer rendering a 100-row page, and log_action_db.
+Each case reports the best and median of several timed repeats.
+"""
+import argparse
+import hashlib
+import os
+import statistics
+import timeit
+
+from common import setup_django, write_results, sample_pdf
+
+
+def bench(fn, number, repeat):
+    runs = [t / number for t in timeit.repeat(fn, number=number, repeat=repeat)]
+    return {
+        'best_ms': round(min(runs) * 1000, 4),
+        'median_ms': round(statistics.median(runs) * 1000, 4),
+        'number': number,
+        'repeat': repeat,
+    }
+
+
+def bench_hash_encrypt(sizes, repeat):
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    aesgcm = AESGCM(os.urandom(32))
+    results = []
+    for size in sizes:
+        plaintext = sample_pdf(size)
+        number = max(1, (8 * 1024 * 1024) // size)
+
+        def run():
+            hashlib.sha256(plaintext).hexdigest()
+            aesgcm.encrypt(os.urandom(12), plaintext, None)
+
+        result = bench(run, number, repeat)
+        result.update({
+            'name': 'hash_encrypt',
+            'size_bytes': size,
+            'mb_per_s': round(size / (result['best_ms'] / 1000) / 1e6, 1),
+        })
+        results.append(result)
+    return results
+
+
+def make_documents(count):
+    from django.core.files.base import ContentFile
+    from documents.models import Document
+    documents = []
+    for i in range(count):
+        document = Document(
+            title=f'Benchmark certificate {i}',
+            owner=f'institution-{i % 7}',
+            ai_confidence=90,
+            ai_issues=['Signature missing'] if i % 3 else [],
+            file_hash=hashlib.sha256(str(i).encode()).hexdigest(),
+        )
+        document.file.save(f'bench-{i}.pdf', ContentFile(b'x'), save=False)
+        document.save()
+        documents.append(document)
+    return documents
+
+
+def bench_serializer(documents, repeat):
+    from django.test import RequestFactory
+    from documents.serializers import DocumentSerializer
+    request = RequestFactory().get('/api/docs/')
+    result = bench(lambda: DocumentSerializer(documents, many=True, context={'request': request}).data, 20, repeat)
+    result.update({'name': 'document_serializer', 'rows': len(documents)})
+    return result
+
+
+def bench_audit(document, repeat):
+    from documents.audit import log_action_db
+    result = bench(lambda: log_action_db(document, 'VALIDATE', 'bench'), 200, repeat)
+    result['name'] = 'log_action_db'
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AccrediVault microbenchmarks')
+    parser.add_argument('--sizes', default='65536,1048576,10485760', help='comma-separated file sizes in bytes')
+    parser.add_argument('--rows', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    setup_django()
+    sizes = [int(s) for s in args.sizes.split(',')]
+    documents = make_documents(args.rows)
+
+    results = bench_hash_encrypt(sizes, args.repeat)
+    results.append(bench_serializer(documents, args.repeat))
+    results.append(bench_audit(documents[0], args.repeat))
+    for result in results:
+        print(result)
+    path = write_results('micro', results, args.output)
+    print(f'wrote {path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Encoding time and bytes on the wire for realistic document_list pages.
+
+    python benchmarks/payloads.py [--pages 20,100] [--output out.json]
+
+Renders document_list-shaped pages (nested ``ai`` objects, absolute
+``file_url``s) with DRF's JSONRenderer and FastJSONRenderer, then compresses
+them with gzip and, when installed, brotli at the levels
+CompressionMiddleware uses.
+"""
+import argparse
+import gzip
+import hashlib
+import statistics
+import timeit
+
+from common import setup_django, write_results
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def page_payload(rows):
+    from django.test import RequestFactory
+    from documents.models import Document
+    from documents.serializers import DocumentSerializer
+    issues = ['Signature missing', 'Date format unclear', 'Institution seal not visible']
+    documents = [
+        Document(
+            doc_id=f'doc-{i:08x}',
+            title=f'Bachelor of Technology transcript, semester {i % 8 + 1}',
+            owner=f'institution-{i % 12}',
+            status=['SUBMITTED', 'UNDER_REVIEW', 'APPROVED', 'REJECTED'][i % 4],
+            ai_confidence=80 + i % 15,
+            ai_issues=issues[:i % 3],
+            file=f'documents/transcript-{i}.pdf',
+            file_hash=hashlib.sha256(str(i).encode()).hexdigest(),
+        )
+        for i in range(rows)
+    ]
+    from django.utils import timezone
+    for document in documents:
+        document.created_at = document.updated_at = timezone.now()
+    request = RequestFactory().get('/api/docs/', HTTP_HOST='api.accredivault.example')
+    results = DocumentSerializer(documents, many=True, context={'request': request}).data
+    return {'results': results, 'page': 1, 'pages': 50, 'total': rows * 50}
+
+
+def timed(fn, number=50, repeat=5):
+    return round(statistics.median(t / number for t in timeit.repeat(fn, number=number, repeat=repeat)) * 1000, 4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON encoding and compression benchmark')
+    parser.add_argument('--pages', default='20,100', help='comma-separated page sizes (rows)')
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    setup_django()
+    from rest_framework.renderers import JSONRenderer
+    from documents.renderers import FastJSONRenderer, orjson
+
+    results = []
+    for rows in [int(r) for r in args.pages.split(',')]:
+        data = page_payload(rows)
+        body = JSONRenderer().render(data)
+        result = {
+            'name': 'document_list_page',
+            'rows': rows,
+            'json_bytes': len(body),
+            'stock_render_ms': timed(lambda: JSONRenderer().render(data)),
+            'fast_render_ms': timed(lambda: FastJSONRenderer().render(data)),
+            'orjson_available': orjson is not None,
+            'gzip_bytes': len(gzip.compress(body, compresslevel=6)),
+            'gzip_ms': timed(lambda: gzip.compress(body, compresslevel=6)),
+        }
+        if brotli is not None:
+            result['br_bytes'] = len(brotli.compress(body, quality=4))
+            result['br_ms'] = timed(lambda: brotli.compress(body, quality=4))
+        print(result)
+        results.append(result)
+
+    path = write_results('payloads', results, args.output)
+    print(f'wrote {path}')
+
+
+if __name__ == '__main__':
+    main()
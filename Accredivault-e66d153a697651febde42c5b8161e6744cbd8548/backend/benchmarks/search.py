@@ -0,0 +1,87 @@
+"""Search latency at scale: FTS5 index vs the LIKE scan it replaces.
+
+    python benchmarks/search.py [--documents 1000000] [--output out.json]
+
+Bulk-loads synthetic documents into a scratch SQLite database (the FTS5
+triggers index them as they are inserted), then times ranked prefix queries
+through search_doc_ids and the equivalent ``title__icontains`` filter. Titles
+mix a few very common degree words with a long tail of rarer terms, like real
+certificate titles and student names.
+"""
+import argparse
+import random
+import statistics
+import time
+
+from common import setup_django, write_results
+
+COMMON = ['bachelor', 'master', 'doctor', 'diploma', 'science', 'technology', 'arts', 'commerce',
+          'engineering', 'transcript', 'semester', 'certificate', 'medicine', 'law', 'physics']
+QUERIES = ['bach', 'master sci', 'transcript kaviru', 'engin tech', 'institution-42', 'zzz']
+
+
+def vocabulary(rng, size=50000):
+    syllables = ['ka', 'vi', 'ru', 'sha', 'ni', 'ta', 'mo', 'la', 'pra', 'de', 'ev', 'an', 'ro', 'su', 'mi']
+    return [''.join(rng.choice(syllables) for _ in range(rng.randint(2, 4))) for _ in range(size)]
+
+
+def load(count, batch_size=20000):
+    from documents.models import Document
+    rng = random.Random(42)
+    names = vocabulary(rng)
+    started = time.perf_counter()
+    for start in range(0, count, batch_size):
+        Document.objects.bulk_create([
+            Document(
+                doc_id=f'doc-{i:08x}',
+                title=' '.join(rng.sample(COMMON, 2) + rng.sample(names, 2)),
+                owner=f'institution-{rng.randrange(500)}',
+                file=f'documents/{i}.pdf',
+            )
+            for i in range(start, min(count, start + batch_size))
+        ])
+    return time.perf_counter() - started
+
+
+def time_query(fn, repeat=20):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return round(statistics.median(samples) * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Full-text search benchmark')
+    parser.add_argument('--documents', type=int, default=200000)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    setup_django()
+    from documents.models import Document
+    from documents.search import search_doc_ids
+
+    index_seconds = load(args.documents)
+    print(f'loaded and indexed {args.documents} documents in {index_seconds:.1f}s')
+    results = []
+    for q in QUERIES:
+        first = q.split()[0]
+        result = {
+            'name': 'search',
+            'query': q,
+            'documents': args.documents,
+            'fts_p50_ms': time_query(lambda: search_doc_ids(q, 20)),
+            'like_p50_ms': time_query(
+                lambda: list(Document.objects.filter(title__icontains=first).values_list('doc_id', flat=True)[:20]),
+                repeat=5,
+            ),
+        }
+        print(result)
+        results.append(result)
+    path = write_results('search', results, args.output, load_seconds=round(index_seconds, 2))
+    print(f'wrote {path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""Slow-client load test: how many trickling verifiers can one worker hold?
+
+Opens N concurrent connections that either trickle a ``/api/verify/`` request
+body (``--mode verify``) or read a ``/download/`` response slowly
+(``--mode download``), while a probe issues a fast verify request every
+``--probe-interval`` seconds. A sync worker pins one thread per slow client,
+so once its threads are used up the probe queues behind them; an async worker
+keeps answering it.
+
+Run the same command against each server, one worker each:
+
+    # WSGI: one process, 8 threads
+    gunicorn accredivault.wsgi -w 1 -k gthread --threads 8 -b 127.0.0.1:8000
+    # ASGI with the native async verify/download views
+    USE_ASYNC_VIEWS=true uvicorn accredivault.asgi:application --workers 1 --port 8001
+
+    python benchmarks/slow_clients.py --url http://127.0.0.1:8000 --clients 8,32,128
+    python benchmarks/slow_clients.py --url http://127.0.0.1:8001 --clients 8,32,128
+
+Needs ENCRYPTION_KEY_B64 on the server (one document is uploaded first).
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+from urllib.parse import urlsplit
+
+
+def _http_request(method, path, host, headers=None, body=b''):
+    lines = [f"{method} {path} HTTP/1.1", f"Host: {host}", "Connection: close"]
+    for name, value in (headers or {}).items():
+        lines.append(f"{name}: {value}")
+    lines.append(f"Content-Length: {len(body)}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode(), body
+
+
+async def _read_response(reader, read_delay=0.0, chunk=4096):
+    status_line = await reader.readline()
+    status_code = int(status_line.split()[1]) if status_line else 0
+    total = 0
+    while True:
+        data = await reader.read(chunk)
+        if not data:
+            break
+        total += len(data)
+        if read_delay:
+            await asyncio.sleep(read_delay)
+    return status_code, total
+
+
+async def _send(host, port, head, body, trickle=0.0, read_delay=0.0):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(head)
+        if trickle and body:
+            # Spread the body over `trickle` seconds, a few bytes at a time
+            step = max(1, len(body) // 20)
+            for i in range(0, len(body), step):
+                writer.write(body[i:i + step])
+                await writer.drain()
+                await asyncio.sleep(trickle / 20)
+        else:
+            writer.write(body)
+        await writer.drain()
+        return await _read_response(reader, read_delay=read_delay)
+    finally:
+        writer.close()
+
+
+async def upload_sample(host, port, netloc):
+    boundary = uuid.uuid4().hex
+    pdf = b"%PDF-1.4\n" + b"0" * (512 * 1024) + b"\n%%EOF"
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"title\"\r\n\r\nLoad test\r\n"
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"load.pdf\"\r\n"
+        f"Content-Type: application/pdf\r\n\r\n"
+    ).encode() + pdf + f"\r\n--{boundary}--\r\n".encode()
+    head, body = _http_request('POST', '/api/docs/upload/', netloc, {
+        'Content-Type': f'multipart/form-data; boundary={boundary}',
+        'x-user-id': 'loadtest', 'x-user-role': 'ADMIN',
+    }, body)
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(head + body)
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    doc = json.loads(raw.split(b"\r\n\r\n", 1)[1])
+    return doc['doc_id'], doc['hash']
+
+
+async def run_level(args, host, port, netloc, doc_id, file_hash, clients):
+    verify_body = json.dumps({'doc_id': doc_id, 'file_hash': file_hash}).encode()
+    verify_head, _ = _http_request('POST', '/api/verify/', netloc, {'Content-Type': 'application/json'}, verify_body)
+    download_head, _ = _http_request('GET', f'/api/docs/{doc_id}/download/', netloc, {
+        'x-user-id': 'loadtest', 'x-user-role': 'VERIFIER',
+    })
+
+    async def slow_client():
+        if args.mode == 'verify':
+            return await _send(host, port, verify_head, verify_body, trickle=args.slow_seconds)
+        return await _send(host, port, download_head, b'', read_delay=args.slow_seconds / 128)
+
+    probe_latencies = []
+    stop = asyncio.Event()
+
+    async def probe():
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(_send(host, port, verify_head, verify_body), timeout=args.slow_seconds * 4)
+                probe_latencies.append(time.perf_counter() - started)
+            except asyncio.TimeoutError:
+                probe_latencies.append(float('inf'))
+            await asyncio.sleep(args.probe_interval)
+
+    probe_task = asyncio.create_task(probe())
+    started = time.perf_counter()
+    results = await asyncio.gather(*(slow_client() for _ in range(clients)), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe_task
+
+    ok = sum(1 for r in results if not isinstance(r, Exception) and r[0] == 200)
+    finite = [p for p in probe_latencies if p != float('inf')]
+    return {
+        'clients': clients,
+        'completed_ok': ok,
+        'errors': clients - ok,
+        'wall_seconds': round(elapsed, 2),
+        'probe_p50_ms': round(statistics.median(finite) * 1000, 1) if finite else None,
+        'probe_max_ms': round(max(finite) * 1000, 1) if finite else None,
+        'probe_timeouts': len(probe_latencies) - len(finite),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--mode', choices=['verify', 'download'], default='verify')
+    parser.add_argument('--clients', default='8,32,128', help='comma-separated concurrency levels')
+    parser.add_argument('--slow-seconds', type=float, default=5.0, help='how long each slow client takes')
+    parser.add_argument('--probe-interval', type=float, default=0.25)
+    args = parser.parse_args()
+
+    url = urlsplit(args.url)
+    host, port = url.hostname, url.port or 80
+    doc_id, file_hash = await upload_sample(host, port, url.netloc)
+    print(f"target={args.url} mode={args.mode} doc_id={doc_id}")
+    for clients in [int(n) for n in args.clients.split(',')]:
+        print(json.dumps(await run_level(args, host, port, url.netloc, doc_id, file_hash, clients)))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,65 @@
+"""Throughput of plain SHA-256 vs the parallel SHA-256 tree hash.
+
+    python benchmarks/treehash.py [--sizes 1048576,10485760,104857600] [--workers 1,2,4,8] [--output out.json]
+
+For each file size, hashes the same buffer with hashlib.sha256 and with
+documents.treehash.tree_hash on thread pools of each worker count, and
+reports MB/s (best of several repeats). Speed-ups only show with as many
+free cores as workers; the machine's core count is recorded in the results.
+"""
+import argparse
+import os
+import statistics
+import timeit
+from concurrent.futures import ThreadPoolExecutor
+
+from common import setup_django, write_results
+
+
+def best_ms(fn, size):
+    number = max(1, (64 * 1024 * 1024) // size)
+    runs = [t / number for t in timeit.repeat(fn, number=number, repeat=5)]
+    return round(min(runs) * 1000, 3), round(statistics.median(runs) * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tree hash throughput benchmark')
+    parser.add_argument('--sizes', default='1048576,10485760,104857600')
+    parser.add_argument('--workers', default='1,2,4,8')
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    setup_django()
+    import hashlib
+    from documents.treehash import tree_hash
+
+    results = []
+    for size in [int(s) for s in args.sizes.split(',')]:
+        data = os.urandom(size)
+        cases = [('sha256', 1, lambda: hashlib.sha256(data).hexdigest())]
+        pools = []
+        for workers in [int(w) for w in args.workers.split(',')]:
+            pool = ThreadPoolExecutor(max_workers=workers)
+            pools.append(pool)
+            cases.append(('tree', workers, lambda pool=pool: tree_hash(data, pool)))
+        for name, workers, fn in cases:
+            best, median = best_ms(fn, size)
+            result = {
+                'name': name,
+                'query': f'workers={workers}',
+                'size_bytes': size,
+                'best_ms': best,
+                'median_ms': median,
+                'mb_per_s': round(size / (best / 1000) / 1e6, 1),
+            }
+            print(result)
+            results.append(result)
+        for pool in pools:
+            pool.shutdown()
+
+    path = write_results('treehash', results, args.output)
+    print(f'wrote {path}')
+
+
+if __name__ == '__main__':
+    main()
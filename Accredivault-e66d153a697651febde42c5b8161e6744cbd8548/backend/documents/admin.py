@@ -1,16 +1,96 @@
+import re
+
 from django.contrib import admin
-from .models import Document, AuditLog
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+from .models import Document, AuditLog, DocumentCounter
+from .search import search_doc_ids
+
+# Below this many rows an exact COUNT(*) is cheap and avoids a visibly wrong total
+EXACT_COUNT_BELOW = 10000
+SEARCH_LIMIT = 1000
+DOC_ID_RE = re.compile(r'doc-[0-9a-f]+')
+SHA256_RE = re.compile(r'[0-9a-fA-F]{64}')
+
+
+def estimated_count(queryset):
+    """Row count of queryset's whole table without scanning it, or None.
+
+    Documents use the counter kept by stats.record_upload; other tables use
+    pg_class.reltuples on PostgreSQL and MAX(rowid) on SQLite (an overestimate
+    after deletes).
+    """
+    if queryset.model is Document:
+        return (DocumentCounter.objects.using(queryset.db).filter(scope='total', key='all')
+                .values_list('count', flat=True).first())
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+        elif connection.vendor == 'sqlite':
+            cursor.execute(f"SELECT MAX(rowid) FROM {connection.ops.quote_name(table)}")
+        else:
+            return None
+        row = cursor.fetchone()
+    # reltuples is -1 (or 0) until the table has been analyzed
+    return row[0] if row and row[0] and row[0] > 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Skips COUNT(*) on unfiltered changelists, where it would read the whole table."""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_count(queryset)
+            if estimate is not None and estimate >= EXACT_COUNT_BELOW:
+                return estimate
+        return super().count
+
 
 @admin.register(Document)
 class DocumentAdmin(admin.ModelAdmin):
     list_display = ['doc_id', 'title', 'owner', 'status', 'ai_confidence', 'created_at']
+    # No date_hierarchy: its year/month links run a DISTINCT over the whole table
+    # on every load. The created_at filter's fixed ranges need no query.
     list_filter = ['status', 'created_at']
-    search_fields = ['doc_id', 'title', 'owner']
+    search_fields = ['=doc_id']
+    search_help_text = f"A doc_id, or words from the title or owner (first {SEARCH_LIMIT} matches)"
     readonly_fields = ['doc_id', 'created_at', 'updated_at']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if DOC_ID_RE.fullmatch(term):
+            return queryset.filter(pk=term), False
+        # Title/owner words go through the full-text index instead of LIKE '%term%'
+        return queryset.filter(pk__in=search_doc_ids(term, SEARCH_LIMIT)), False
+
 
 @admin.register(AuditLog)
 class AuditLogAdmin(admin.ModelAdmin):
     list_display = ['doc', 'action', 'actor', 'hash', 'created_at']
     list_filter = ['action', 'created_at']
-    search_fields = ['doc__doc_id', 'actor', 'hash']
-    readonly_fields = ['created_at']
\ No newline at end of file
+    list_select_related = ['doc']
+    search_fields = ['=doc__doc_id', '=actor', '=hash']
+    search_help_text = "An exact doc_id, actor or SHA-256 hash"
+    readonly_fields = ['created_at']
+    raw_id_fields = ['doc']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if SHA256_RE.fullmatch(term):
+            return queryset.filter(hash=term.lower()), False
+        # Exact matches on indexed columns (the doc FK needs no join)
+        return queryset.filter(doc_id=term) | queryset.filter(actor=term), False
@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class DocumentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'documents'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .search import restore_missing_triggers
+        post_migrate.connect(restore_missing_triggers, sender=self)
@@ -0,0 +1,216 @@
+"""Native async versions of the verification and download endpoints.
+
+Served instead of the DRF views in ``views.py`` when ``USE_ASYNC_VIEWS`` is on
+and the project runs under ASGI (``accredivault.asgi``). The SSE stream
+(``document_events``) only exists here and is routed only with the setting on;
+otherwise ``/api/docs/events/`` answers 501. Slow verifier clients then wait
+on the event loop instead of holding a sync worker thread; the ORM
+calls are async, file reads are streamed in chunks and the AES-GCM/SHA-256
+work runs in a thread pool.
+"""
+import json
+import logging
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse, HttpResponseNotModified
+
+from .models import Document
+from .serializers import DocumentSerializer
+from .utils import get_user_from_headers, get_encryption_key_from_settings, compute_verification_hash
+from .utils import blob_etag, etag_matches, file_sha256, is_own_ciphertext, digest_matches, is_sha256_hex
+from .treehash import tree_hash
+from .email_utils import notify_admin_document_verification_failed
+from .throttling import admission_control
+from .routers import replica_ok
+from .metrics import timed_phase, VERIFICATIONS, VERIFICATION_MISMATCHES
+from .events import event_stream, decode_position
+from .sharding import use_shard, shard_for_doc, is_sharded
+from . import bloom
+
+logger = logging.getLogger('documents')
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def async_api_view(methods):
+    """Minimal async counterpart of DRF's @api_view: method check + CSRF exemption."""
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+            return await view(request, *args, **kwargs)
+        wrapper.csrf_exempt = True
+        return wrapper
+    return decorator
+
+
+def _request_data(request):
+    """Parse a JSON or form body the way DRF's request.data would."""
+    if request.content_type == 'application/json':
+        return json.loads(request.body or b'{}')
+    return request.POST
+
+
+async def _shard_for_doc(doc_id):
+    # The directory lookup is a (cached) sync query; skip the thread hop when unsharded
+    if not is_sharded():
+        return 'default'
+    return await sync_to_async(shard_for_doc)(doc_id)
+
+
+async def _notify_mismatch(doc_id, expected, got):
+    # SMTP is blocking; keep it off the event loop
+    try:
+        await sync_to_async(notify_admin_document_verification_failed, thread_sensitive=False)(
+            doc_id,
+            f"Hash mismatch detected. Expected: {expected}, Got: {got}"
+        )
+    except Exception as e:
+        logger.error(f"Failed to send verification failure notification: {str(e)}")
+
+
+@replica_ok
+@admission_control('verify_document')
+@async_api_view(['POST'])
+async def verify_document(request):
+    """Async verify by doc_id and file_hash (see views.verify_document)."""
+    try:
+        try:
+            data = _request_data(request) or {}
+        except ValueError:
+            return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+        doc_id = data.get('doc_id')
+        file_hash = data.get('file_hash')
+        if not doc_id or not file_hash:
+            return JsonResponse({'error': 'doc_id and file_hash are required'}, status=400)
+        if not isinstance(doc_id, str) or not is_sha256_hex(file_hash):
+            return JsonResponse({'error': 'doc_id must be a string and file_hash a 64-character hex SHA-256'},
+                                status=400)
+        # Unknown (guessed) ids are answered from memory, before any query
+        if not await bloom.amight_exist(doc_id):
+            return JsonResponse({'error': 'Document not found'}, status=404)
+        with use_shard(await _shard_for_doc(doc_id)):
+            document = await Document.objects.aget(doc_id=doc_id)
+        is_valid = digest_matches(document, file_hash)
+        VERIFICATIONS.inc(endpoint='verify_document')
+        payload = {'valid': bool(is_valid)}
+        if is_valid:
+            payload['doc'] = DocumentSerializer(document, context={'request': request}).data
+        else:
+            VERIFICATION_MISMATCHES.inc(endpoint='verify_document')
+            await _notify_mismatch(doc_id, document.file_hash, file_hash)
+        return JsonResponse(payload, status=200)
+    except Document.DoesNotExist:
+        bloom.record_miss(doc_id)
+        return JsonResponse({'error': 'Document not found'}, status=404)
+    except Exception:
+        return JsonResponse({'error': 'Verification failed'}, status=500)
+
+
+@replica_ok
+@admission_control('verify_document_file', expensive=True)
+@async_api_view(['POST'])
+async def verify_document_file(request):
+    """Async verify by uploaded file and doc_id (see views.verify_document_file)."""
+    try:
+        # Multipart parsing reads the spooled body from disk; do it off the loop
+        post, files = await sync_to_async(lambda: (request.POST, request.FILES))()
+        doc_id = post.get('doc_id')
+        upload = files.get('file')
+        if not doc_id or not upload:
+            return JsonResponse({'error': 'doc_id and file are required'}, status=400)
+        if not await bloom.amight_exist(doc_id):
+            return JsonResponse({'error': 'Document not found'}, status=404)
+        with use_shard(await _shard_for_doc(doc_id)):
+            document = await Document.objects.aget(doc_id=doc_id)
+        # Our own encrypted blob is recognised by its stored SHA-256: no key, no decryption
+        with timed_phase('verify_document_file', 'fingerprint'):
+            fingerprint = await sync_to_async(file_sha256, thread_sensitive=False)(upload)
+        if is_own_ciphertext(fingerprint, document):
+            calc_hash = document.file_hash
+        else:
+            key = get_encryption_key_from_settings()
+            if key is None:
+                return JsonResponse({'error': 'Encryption key missing on server'}, status=500)
+            payload = await sync_to_async(upload.read, thread_sensitive=False)()
+            with timed_phase('verify_document_file', 'verify_hash'):
+                calc_hash = await sync_to_async(compute_verification_hash, thread_sensitive=False)(
+                    payload, document.enc_iv, key, document.compression, tree_hash if document.tree_hash else None
+                )
+        is_valid = digest_matches(document, calc_hash)
+        VERIFICATIONS.inc(endpoint='verify_document_file')
+        result = {'valid': bool(is_valid), 'doc_id': doc_id}
+        if is_valid:
+            result['doc'] = DocumentSerializer(document, context={'request': request}).data
+        else:
+            result['reason'] = 'hash-mismatch'
+            VERIFICATION_MISMATCHES.inc(endpoint='verify_document_file')
+            await _notify_mismatch(doc_id, document.file_hash, calc_hash)
+        return JsonResponse(result, status=200)
+    except Document.DoesNotExist:
+        bloom.record_miss(doc_id)
+        return JsonResponse({'error': 'Document not found'}, status=404)
+    except Exception:
+        return JsonResponse({'error': 'Verification failed'}, status=500)
+
+
+async def _stream_file(field_file):
+    read = sync_to_async(field_file.read, thread_sensitive=False)
+    try:
+        while True:
+            chunk = await read(DOWNLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        await sync_to_async(field_file.close, thread_sensitive=False)()
+
+
+@async_api_view(['GET'])
+async def download_encrypted_document(request, doc_id):
+    """Async streaming download of the encrypted blob (ADMIN and VERIFIER)."""
+    try:
+        user_id, user_role = get_user_from_headers(request)
+    except Exception:
+        return JsonResponse({'error': 'Missing or invalid user headers'}, status=400)
+    if user_role not in ['ADMIN', 'VERIFIER']:
+        return JsonResponse({'error': 'Not authorized to download document'}, status=403)
+    try:
+        with use_shard(await _shard_for_doc(doc_id)):
+            document = await Document.objects.aget(doc_id=doc_id)
+        etag = blob_etag(document)
+        if etag_matches(request, etag):
+            response = HttpResponseNotModified()
+        else:
+            await sync_to_async(document.file.open, thread_sensitive=False)('rb')
+            response = StreamingHttpResponse(_stream_file(document.file), content_type='application/octet-stream')
+            response['Content-Disposition'] = f'attachment; filename="{document.file.name.split("/")[-1]}"'
+        if etag:
+            response['ETag'] = etag
+        response['Cache-Control'] = settings.DOWNLOAD_CACHE_CONTROL
+        return response
+    except Document.DoesNotExist:
+        return JsonResponse({'error': 'Document not found'}, status=404)
+    except Exception:
+        return JsonResponse({'error': 'Failed to download document'}, status=500)
+
+
+@async_api_view(['GET'])
+async def document_events(request):
+    """SSE stream of uploads and status changes, filterable by owner and doc_id."""
+    raw_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        last_event_id = decode_position(raw_id) if raw_id else None
+    except ValueError:
+        return JsonResponse({'error': 'Invalid Last-Event-ID'}, status=400)
+    doc_ids = [d for value in request.GET.getlist('doc_id') for d in value.split(',') if d]
+    response = StreamingHttpResponse(
+        event_stream(request.GET.get('owner'), doc_ids, last_event_id),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # stop nginx from buffering the stream
+    return response
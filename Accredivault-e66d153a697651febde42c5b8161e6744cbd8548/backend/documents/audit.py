@@ -17,4 +17,16 @@ def log_action_db(doc, action, actor):
         hash=hash_value
     )
     
-    return hash_value
\ No newline at end of file
+    return hash_value
+
+def log_actions_db(docs, action, actor):
+    """Log the same action for many documents with a single INSERT"""
+    AuditLog.objects.bulk_create([
+        AuditLog(
+            doc=doc,
+            action=action,
+            actor=actor,
+            hash=make_hash(f"{doc.doc_id}{action}{actor}{doc.status}")
+        )
+        for doc in docs
+    ])
@@ -0,0 +1,332 @@
+"""In-memory negative lookup for doc_ids on the public verify endpoints.
+
+Scanners post random or guessed doc_ids, and without this filter each one
+costs a directory lookup, a query and a 404. A Bloom filter over every
+issued doc_id answers "definitely unknown" from memory. Only ids that might
+exist go on to the database. A false positive costs exactly what every
+lookup cost before. A false negative would reject a real document, so the
+filter is built never to produce one:
+
+* Ids are time-ordered (``utils.new_doc_id``). Everything created before the
+  *watermark* is in the filter. Ids stamped after it skip the filter and go
+  to the database. Ids stamped in the future cannot exist and are rejected.
+* Each process catches up every ``DOC_FILTER_REFRESH_SECONDS`` with one
+  indexed query for documents created since its watermark. Uploads also add
+  their id straight away (``signals.py``).
+* On first use a process loads ``DOC_FILTER_SNAPSHOT_PATH`` (a header plus
+  the bit array) and catches up from the snapshot's watermark. The header
+  carries a fingerprint of the
+  databases it was built from: their names plus the count and highest
+  doc_id of the documents before the watermark. A snapshot from another
+  database, or one that lost rows since, fails that check. Without a usable
+  snapshot the process reads every doc_id on every shard and writes one.
+  ``manage.py build_doc_filter`` rewrites it, resized for the current count.
+
+Loading and catching up run in a background thread that a lookup starts when
+the filter is due; lookups never wait for it. Until the first load finishes
+every id goes to the database, and while a catch-up runs the current filter
+keeps answering.
+
+Deleted documents stay in the filter; they are only false positives. Size,
+estimated false-positive rate and lookup outcomes are exported on /metrics.
+"""
+import hashlib
+import logging
+import math
+import os
+import re
+import struct
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count, Max
+
+from .metrics import DOC_FILTER_BYTES, DOC_FILTER_ITEMS, DOC_FILTER_FALSE_POSITIVE_RATE, DOC_FILTER_LOOKUPS
+from .models import Document
+from .sharding import shards
+
+logger = logging.getLogger('documents')
+
+SNAPSHOT_MAGIC = b'ADB2'
+SNAPSHOT_HEADER = struct.Struct('<4sQIQq16s')  # magic, bits, hashes, items, watermark (ms), fingerprint
+MIN_CAPACITY = 100000
+# Upper bound on the time between new_doc_id() and the upload's commit
+COMMIT_MARGIN_MS = 60 * 1000
+# Clocks of the workers that issue ids may run this far ahead of ours
+FUTURE_SKEW_MS = 5 * 60 * 1000
+TIME_ORDERED_ID_RE = re.compile(r'doc-([0-9a-f]{12})[0-9a-f]{20}')
+
+_lock = threading.Lock()  # held by whoever is loading or catching up
+_state = None  # (BloomFilter, watermark ms); replaced whole, so readers need no lock
+_next_refresh = 0.0
+_refresher = None  # the last background refresh thread
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (double hashing on BLAKE2b)."""
+
+    def __init__(self, bits, hashes, data=None, items=0):
+        self.bits = bits
+        self.hashes = hashes
+        self.data = bytearray(data) if data is not None else bytearray((bits + 7) // 8)
+        self.items = items
+        self._write_lock = threading.Lock()
+
+    @classmethod
+    def for_capacity(cls, capacity, false_positive_rate):
+        bits = max(8, math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        return cls(bits, max(1, round(bits / capacity * math.log(2))))
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, item):
+        positions = self._positions(item)
+        # Read-modify-write of a byte; unlocked writers could drop each other's bits
+        with self._write_lock:
+            added = False
+            for p in positions:
+                mask = 1 << (p & 7)
+                if not self.data[p >> 3] & mask:
+                    self.data[p >> 3] |= mask
+                    added = True
+            if added:
+                # Catch-up re-reads ids already added on upload; count each once
+                self.items += 1
+
+    def __contains__(self, item):
+        data = self.data
+        return all(data[p >> 3] & (1 << (p & 7)) for p in self._positions(item))
+
+    @property
+    def nbytes(self):
+        return len(self.data)
+
+    def false_positive_rate(self):
+        """Expected rate for the items added so far."""
+        return (1 - math.exp(-self.hashes * self.items / self.bits)) ** self.hashes
+
+
+def id_timestamp_ms(doc_id):
+    """Creation time embedded in a time-ordered doc_id, or None for legacy ids."""
+    match = TIME_ORDERED_ID_RE.fullmatch(doc_id)
+    return int(match.group(1), 16) if match else None
+
+
+def _now_ms():
+    return time.time_ns() // 1_000_000
+
+
+def _as_datetime(ms):
+    return datetime.fromtimestamp(ms / 1000, tz=dt_timezone.utc)
+
+
+def build(capacity=None):
+    """(filter, watermark) from every doc_id on every shard."""
+    watermark = _now_ms() - COMMIT_MARGIN_MS
+    aliases = shards()
+    if capacity is None:
+        count = sum(Document.objects.using(alias).count() for alias in aliases)
+        capacity = max(MIN_CAPACITY, 2 * count)
+    bloom = BloomFilter.for_capacity(capacity, settings.DOC_FILTER_FALSE_POSITIVE_RATE)
+    for alias in aliases:
+        for doc_id in Document.objects.using(alias).order_by().values_list('doc_id', flat=True).iterator(chunk_size=5000):
+            bloom.add(doc_id)
+    return bloom, watermark
+
+
+def catch_up(bloom, watermark):
+    """Add documents created since `watermark`; returns the new watermark."""
+    new_watermark = _now_ms() - COMMIT_MARGIN_MS
+    since = _as_datetime(watermark - COMMIT_MARGIN_MS)
+    for alias in shards():
+        recent = Document.objects.using(alias).filter(created_at__gte=since).order_by()
+        for doc_id in recent.values_list('doc_id', flat=True):
+            bloom.add(doc_id)
+    return max(watermark, new_watermark)
+
+
+def db_fingerprint(watermark):
+    """Digest of the shard databases' names and their documents created before `watermark`."""
+    digest = hashlib.blake2b(digest_size=16)
+    before = _as_datetime(watermark)
+    for alias in shards():
+        summary = Document.objects.using(alias).filter(created_at__lt=before).aggregate(
+            count=Count('pk'), newest=Max('doc_id'))
+        digest.update(f"{alias}={settings.DATABASES[alias]['NAME']}:{summary['count']}:{summary['newest']}\n".encode())
+    return digest.digest()
+
+
+def write_snapshot(bloom, watermark, path=None):
+    path = str(path or settings.DOC_FILTER_SNAPSHOT_PATH)
+    header = SNAPSHOT_HEADER.pack(
+        SNAPSHOT_MAGIC, bloom.bits, bloom.hashes, bloom.items, watermark, db_fingerprint(watermark))
+    # A temp file of our own, so processes writing at once never interleave
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix=os.path.basename(path) + '.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(header)
+            f.write(bloom.data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def read_snapshot(path=None):
+    """(filter, watermark) from the snapshot file, or None if there is no usable one.
+
+    A snapshot whose fingerprint does not match the databases is not usable.
+    """
+    try:
+        with open(path or settings.DOC_FILTER_SNAPSHOT_PATH, 'rb') as f:
+            header = f.read(SNAPSHOT_HEADER.size)
+            if len(header) != SNAPSHOT_HEADER.size:
+                return None
+            magic, bits, hashes, items, watermark, fingerprint = SNAPSHOT_HEADER.unpack(header)
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    if magic != SNAPSHOT_MAGIC or len(data) != (bits + 7) // 8:
+        return None
+    if fingerprint != db_fingerprint(watermark):
+        logger.warning("doc_id filter snapshot does not match the databases; rebuilding it")
+        return None
+    return BloomFilter(bits, hashes, data, items), watermark
+
+
+def _publish(bloom, watermark):
+    global _state
+    _state = (bloom, watermark)
+    update_gauges()
+
+
+def update_gauges():
+    if _state is None:
+        return
+    bloom = _state[0]
+    DOC_FILTER_BYTES.set(bloom.nbytes)
+    DOC_FILTER_ITEMS.set(bloom.items)
+    DOC_FILTER_FALSE_POSITIVE_RATE.set(round(bloom.false_positive_rate(), 6))
+
+
+def rebuild(write=True):
+    """Full rebuild from the database (and snapshot); returns the filter."""
+    bloom, watermark = build()
+    if write:
+        write_snapshot(bloom, watermark)
+    with _lock:
+        _publish(bloom, watermark)
+    return bloom
+
+
+def _needs_refresh():
+    return _state is None or time.monotonic() >= _next_refresh
+
+
+def refresh():
+    """Load the filter on first use, then catch up with other processes' uploads."""
+    with _lock:
+        _refresh_locked()
+
+
+def _refresh_locked():
+    global _next_refresh
+    if not _needs_refresh():
+        return
+    _next_refresh = time.monotonic() + settings.DOC_FILTER_REFRESH_SECONDS
+    if _state is None:
+        loaded = read_snapshot()
+        if loaded is None:
+            bloom, watermark = build()
+            write_snapshot(bloom, watermark)
+        else:
+            bloom, watermark = loaded
+    else:
+        bloom, watermark = _state
+    watermark = catch_up(bloom, watermark)
+    if bloom.items > bloom.bits / (-math.log(settings.DOC_FILTER_FALSE_POSITIVE_RATE) / math.log(2) ** 2):
+        # Past its sized capacity, so the false-positive rate is climbing: start over at twice the size
+        bloom, watermark = build()
+        write_snapshot(bloom, watermark)
+    _publish(bloom, watermark)
+
+
+def _start_refresh():
+    """Refresh in a background thread unless one is already running; never blocks."""
+    global _refresher
+    if not _lock.acquire(blocking=False):
+        return
+    try:
+        _refresher = threading.Thread(target=_refresh_in_background, name='doc-filter-refresh', daemon=True)
+        _refresher.start()
+    except BaseException:
+        _lock.release()
+        raise
+
+
+def _refresh_in_background():
+    try:
+        _refresh_locked()
+    except Exception as e:
+        # Fail open: without a filter every lookup just goes to the database
+        logger.exception("Refreshing the doc_id filter failed: %s", str(e))
+    finally:
+        _lock.release()
+        connections.close_all()
+
+
+def _lookup(doc_id):
+    if _state is None:
+        return True
+    bloom, watermark = _state
+    stamped = id_timestamp_ms(doc_id)
+    if stamped is not None and stamped >= watermark:
+        if stamped > _now_ms() + FUTURE_SKEW_MS:
+            DOC_FILTER_LOOKUPS.inc(result='rejected')
+            return False
+        # Newer than the filter: only the database knows
+        DOC_FILTER_LOOKUPS.inc(result='recent')
+        return True
+    if doc_id in bloom:
+        DOC_FILTER_LOOKUPS.inc(result='passed')
+        return True
+    DOC_FILTER_LOOKUPS.inc(result='rejected')
+    return False
+
+
+def might_exist(doc_id):
+    """False only if no document with this id was ever created."""
+    if not settings.DOC_FILTER_ENABLED:
+        return True
+    if _needs_refresh():
+        _start_refresh()
+    return _lookup(doc_id)
+
+
+async def amight_exist(doc_id):
+    """might_exist() for async views (it never blocks on the database)."""
+    return might_exist(doc_id)
+
+
+def add(doc_id):
+    """Record a newly created doc_id in this process's filter (if loaded)."""
+    state = _state
+    if state is not None:
+        state[0].add(doc_id)
+
+
+def record_miss(doc_id):
+    """Count a database miss for an id the bit array let through (a false positive)."""
+    state = _state
+    if not settings.DOC_FILTER_ENABLED or state is None:
+        return
+    stamped = id_timestamp_ms(doc_id)
+    if stamped is None or stamped < state[1]:
+        DOC_FILTER_LOOKUPS.inc(result='false_positive')
@@ -0,0 +1,72 @@
+"""Optional compression of uploads before AES-GCM (``UPLOAD_COMPRESSION``).
+
+The stored blob is ``encrypt(compress(pdf))`` and ``Document.compression``
+names the codec ('' = stored as-is); ``file_hash`` is always the SHA-256 of
+the original PDF. Scanned PDFs with raw image streams shrink a lot, while
+PDFs whose streams are already Flate/JPEG encoded barely change, so a fast
+trial compression of the first SAMPLE_SIZE bytes decides whether the full
+pass is worth the CPU, and the full result is kept only if it actually saves
+MIN_SAVING. Only our own uploads are compressed, so the length of the
+compressed output doesn't leak attacker-chosen content (no CRIME-style
+oracle).
+"""
+import zlib
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+SAMPLE_SIZE = 64 * 1024
+# Skip when the sample doesn't shrink below this fraction of its size
+SAMPLE_MAX_RATIO = 0.9
+# Keep the compressed form only if it saves at least this fraction overall
+MIN_SAVING = 0.05
+
+CODECS = ('zlib', 'br')
+
+
+def _compress(codec, data, fast=False):
+    if codec == 'zlib':
+        return zlib.compress(data, 1 if fast else 6)
+    if codec == 'br':
+        return brotli.compress(data, quality=1 if fast else 5)
+    raise ValueError(f"Unknown compression codec {codec!r}")
+
+
+def decompress(codec, data):
+    """Inverse of compress_for_storage for a decrypted blob."""
+    if not codec:
+        return data
+    if codec == 'zlib':
+        return zlib.decompress(data)
+    if codec == 'br':
+        if brotli is None:
+            raise RuntimeError("Document is brotli-compressed but the brotli package is not installed")
+        return brotli.decompress(data)
+    raise ValueError(f"Unknown compression codec {codec!r}")
+
+
+def configured_codec():
+    codec = getattr(settings, 'UPLOAD_COMPRESSION', '')
+    if codec == 'br' and brotli is None:
+        return 'zlib'
+    return codec if codec in CODECS else ''
+
+
+def looks_compressible(codec, data):
+    sample = data[:SAMPLE_SIZE]
+    return bool(sample) and len(_compress(codec, sample, fast=True)) < len(sample) * SAMPLE_MAX_RATIO
+
+
+def compress_for_storage(data, codec=None):
+    """(codec, bytes to encrypt); codec is '' when compression is off or not worth it."""
+    codec = configured_codec() if codec is None else codec
+    if not codec or not looks_compressible(codec, data):
+        return '', data
+    packed = _compress(codec, data)
+    if len(packed) > len(data) * (1 - MIN_SAVING):
+        return '', data
+    return codec, packed
@@ -2,6 +2,8 @@ from django.core.mail import send_mail
 from django.conf import settings
 import logging
 
+from .metrics import EMAILS_SENT
+
 logger = logging.getLogger('documents')
 
 def notify_institution(subject, message, recipient):
@@ -20,6 +22,7 @@ def notify_institution(subject, message, recipient):
         # Check if email is configured
         if not settings.EMAIL_HOST_USER or not settings.EMAIL_HOST_PASSWORD:
             logger.warning("Email not configured. Skipping notification.")
+            EMAILS_SENT.inc(result='skipped')
             return False
         
         # Send email
@@ -32,10 +35,12 @@ def notify_institution(subject, message, recipient):
         )
         
         logger.info(f"Email notification sent successfully to {recipient}")
+        EMAILS_SENT.inc(result='sent')
         return True
         
     except Exception as e:
         logger.error(f"Failed to send email notification: {str(e)}")
+        EMAILS_SENT.inc(result='failed')
         return False
 
 def notify_admin_document_verification_failed(doc_id, reason="Document verification failed"):
@@ -0,0 +1,215 @@
+"""Document change log and its Server-Sent Events fan-out.
+
+Uploads and status transitions append ``DocumentEvent`` rows in the same
+transaction as the change, so the auto-increment id is a gapless-enough
+sequence clients can resume from. Under ASGI each worker runs one
+``EventBroker`` poll loop (only while someone is subscribed) that reads new
+events with a single query per ``SSE_POLL_SECONDS`` and pushes them to
+per-connection queues; an idle subscriber is just a coroutine waiting on its
+queue.
+
+On PostgreSQL a sequence value can become visible after a larger one, so a
+poller may skip an event committed late; SQLite serialises writers and
+doesn't have this gap.
+
+With sharding each shard keeps its own sequence. The broker polls every
+shard, and a stream's SSE ids become a position per shard
+("default:120,shard1:57") so Last-Event-ID resumes all of them. Without
+shards the id is the plain sequence number, as before.
+"""
+import asyncio
+import json
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .models import DocumentEvent
+from .sharding import use_shard, shards, is_sharded
+
+QUEUE_SIZE = 1000
+POLL_BATCH = 500
+
+
+def record_events(docs, event):
+    """Append one change-log row per document; call inside the transaction that changed them."""
+    DocumentEvent.objects.bulk_create([
+        DocumentEvent(doc_id=doc.doc_id, owner=doc.owner, event=event, status=doc.status)
+        for doc in docs
+    ])
+
+
+def fetch_events(after_id, limit, owner=None, doc_ids=None):
+    """Events with id > after_id, oldest first, as plain dicts."""
+    events = DocumentEvent.objects.filter(id__gt=after_id)
+    if owner:
+        events = events.filter(owner=owner)
+    if doc_ids:
+        events = events.filter(doc_id__in=doc_ids)
+    return [
+        {
+            'id': event.id,
+            'doc_id': event.doc_id,
+            'owner': event.owner,
+            'event': event.event,
+            'status': event.status,
+            'at': event.created_at.isoformat(),
+        }
+        for event in events.order_by('id')[:limit]
+    ]
+
+
+def latest_event_id():
+    return DocumentEvent.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def fetch_shard_events(position, limit, owner=None, doc_ids=None):
+    """Events after `position` ({alias: id}) from every shard, each tagged with its shard."""
+    events = []
+    for alias in shards():
+        with use_shard(alias):
+            for event in fetch_events(position.get(alias, 0), limit, owner, doc_ids):
+                event['shard'] = alias
+                events.append(event)
+    return events
+
+
+def latest_position():
+    position = {}
+    for alias in shards():
+        with use_shard(alias):
+            position[alias] = latest_event_id()
+    return position
+
+
+def encode_position(position):
+    """SSE id for a {alias: last id} position."""
+    if not is_sharded():
+        return str(position.get('default', 0))
+    return ','.join(f"{alias}:{position[alias]}" for alias in sorted(position))
+
+
+def decode_position(raw):
+    """Inverse of encode_position; a plain number is a position on 'default'. Raises ValueError."""
+    if ':' not in raw:
+        return {'default': int(raw)}
+    position = {}
+    for part in raw.split(','):
+        alias, _, seq = part.partition(':')
+        position[alias] = int(seq)
+    return position
+
+
+def format_sse(event, position=None):
+    data = json.dumps({k: v for k, v in event.items() if k not in ('id', 'shard')}, separators=(',', ':'))
+    event_id = encode_position(position) if position is not None else event['id']
+    return f"id: {event_id}\nevent: {event['event'].lower()}\ndata: {data}\n\n"
+
+
+class Subscription:
+    def __init__(self, owner=None, doc_ids=None):
+        self.owner = owner
+        self.doc_ids = set(doc_ids or ())
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.overflowed = False
+
+    def matches(self, event):
+        if self.owner and event['owner'] != self.owner:
+            return False
+        return not self.doc_ids or event['doc_id'] in self.doc_ids
+
+    def push(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too slow to keep up; the stream tells the client to resync
+            self.overflowed = True
+
+
+class EventBroker:
+    """Polls the change log once for every subscriber on this event loop."""
+
+    def __init__(self):
+        self.subscribers = set()
+        self.position = None
+        self.task = None
+
+    async def subscribe(self, owner=None, doc_ids=None):
+        """Register a subscriber; returns (subscription, position it will receive events after)."""
+        if self.position is None:
+            self.position = await sync_to_async(latest_position)()
+        subscription = Subscription(owner, doc_ids)
+        self.subscribers.add(subscription)
+        if self.task is None:
+            self.task = asyncio.get_running_loop().create_task(self._run())
+        return subscription, dict(self.position)
+
+    def unsubscribe(self, subscription):
+        self.subscribers.discard(subscription)
+
+    async def _run(self):
+        try:
+            while self.subscribers:
+                await asyncio.sleep(settings.SSE_POLL_SECONDS)
+                events = await sync_to_async(fetch_shard_events)(self.position, POLL_BATCH)
+                for event in events:
+                    for subscription in list(self.subscribers):
+                        if subscription.matches(event):
+                            subscription.push(event)
+                    self.position[event['shard']] = event['id']
+        finally:
+            # Nobody listening: stop polling and re-read the head on the next subscribe
+            self.task = None
+            self.position = None
+
+
+_brokers = weakref.WeakKeyDictionary()
+
+
+def get_broker():
+    loop = asyncio.get_running_loop()
+    if loop not in _brokers:
+        _brokers[loop] = EventBroker()
+    return _brokers[loop]
+
+
+async def event_stream(owner=None, doc_ids=None, last_event_id=None):
+    """SSE body: replay after last_event_id ({alias: id}, if given), then live events with heartbeats."""
+    broker = get_broker()
+    subscription, head = await broker.subscribe(owner, doc_ids)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.SSE_MAX_STREAM_SECONDS
+    try:
+        yield f"retry: 3000\n: subscribed at {encode_position(head)}\n\n"
+        sent = dict(head)
+        if last_event_id is not None:
+            # Shards missing from the client's position start at the head
+            since = {alias: last_event_id.get(alias, seq) for alias, seq in head.items()}
+            backlog = await sync_to_async(fetch_shard_events)(
+                since, settings.SSE_REPLAY_LIMIT + 1, owner, doc_ids
+            )
+            if len(backlog) > settings.SSE_REPLAY_LIMIT:
+                # Too far behind to replay; the client should reload and continue from here
+                yield f"id: {encode_position(head)}\nevent: reset\ndata: {{}}\n\n"
+            else:
+                sent = since
+                for event in sorted(backlog, key=lambda e: e['at']):
+                    sent[event['shard']] = max(sent[event['shard']], event['id'])
+                    yield format_sse(event, sent)
+                for alias, seq in head.items():
+                    sent[alias] = max(sent[alias], seq)
+        while loop.time() < deadline:
+            if subscription.overflowed:
+                yield f"id: {encode_position(broker.position or sent)}\nevent: reset\ndata: {{}}\n\n"
+                return
+            timeout = min(settings.SSE_HEARTBEAT_SECONDS, max(0, deadline - loop.time()))
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if event['id'] > sent.get(event['shard'], 0):
+                sent[event['shard']] = event['id']
+                yield format_sse(event, sent)
+    finally:
+        broker.unsubscribe(subscription)
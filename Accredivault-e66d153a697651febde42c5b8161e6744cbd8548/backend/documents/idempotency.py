@@ -0,0 +1,170 @@
+"""``Idempotency-Key`` support for the upload endpoints.
+
+A client that times out and retries an upload sends the same key again.
+The first request with a key claims a row in ``IdempotencyRecord`` and runs
+the view. Its response (status and body) is stored on that row and replayed
+to any repeat until ``IDEMPOTENCY_TTL_SECONDS`` have passed. A replay returns
+at once, without validation, hashing, encryption or storage. A repeat that
+arrives while the first request is still running does not upload a second
+copy. It waits briefly (``IDEMPOTENCY_WAIT_SECONDS``, capped at
+``MAX_WAIT_SECONDS`` so duplicates can't tie up sync workers), then gets
+``409`` with ``Retry-After``.
+
+Keys are scoped to the caller (``X-User-ID``) and endpoint. Reusing a key
+with a different request (other fields, file names or sizes) gets ``422``.
+Server errors and "try again" answers (409, 429, 503) are not stored: the
+row is released so the retry does the work. A claim whose request died
+mid-flight (worker killed) can be taken over once it is older than
+``IDEMPOTENCY_LOCK_SECONDS``. Records live on the primary ('default').
+"""
+import hashlib
+import logging
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyRecord
+from .utils import get_user_from_headers
+
+logger = logging.getLogger('documents')
+
+DB = 'default'
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+POLL_SECONDS = 0.1
+MAX_WAIT_SECONDS = 5
+# Responses that ask the client to come back later; the retry must run again
+RETRYABLE_STATUSES = {409, 429, 503}
+
+
+def request_fingerprint(request):
+    """SHA-256 over the method, path, form fields and (name, size) of each file.
+
+    File contents are not hashed, so a replay costs no more than parsing the body.
+    """
+    digest = hashlib.sha256(f"{request.method} {request.path}\n".encode())
+    data = request.data
+    items = data.lists() if hasattr(data, 'lists') else ((k, [v]) for k, v in data.items())
+    for name, values in sorted(items, key=lambda item: item[0]):
+        for value in values:
+            if hasattr(value, 'read'):
+                value = f"<file {value.name} {value.size}>"
+            digest.update(f"{name}={value}\n".encode())
+    return digest.hexdigest()
+
+
+def _claim(owner, endpoint, key, fingerprint):
+    """(record, claimed): our fresh claim, or whoever holds the key now."""
+    while True:
+        now = timezone.now()
+        try:
+            with transaction.atomic(using=DB):
+                record = IdempotencyRecord.objects.using(DB).create(
+                    owner=owner, endpoint=endpoint, key=key, fingerprint=fingerprint, created_at=now,
+                    expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS),
+                )
+            return record, True
+        except IntegrityError:
+            pass
+        record = IdempotencyRecord.objects.using(DB).filter(owner=owner, endpoint=endpoint, key=key).first()
+        if record is None:
+            continue  # Released in between; claim again
+        stale = (record.expires_at <= now or (
+            record.response_status is None
+            and record.created_at <= now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS)))
+        if not stale:
+            return record, False
+        # Take over an expired record or an abandoned claim; the conditional update lets only one caller win
+        taken = IdempotencyRecord.objects.using(DB).filter(pk=record.pk, created_at=record.created_at).update(
+            fingerprint=fingerprint, response_status=None, response_body=None, created_at=now,
+            expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS),
+        )
+        if taken:
+            record.refresh_from_db(using=DB)
+            return record, True
+
+
+def _replay(record):
+    response = Response(record.response_body, status=record.response_status)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _store(record, response):
+    if response.status_code >= 500 or response.status_code in RETRYABLE_STATUSES:
+        _release(record)
+        return
+    IdempotencyRecord.objects.using(DB).filter(pk=record.pk).update(
+        response_status=response.status_code, response_body=response.data,
+    )
+
+
+def _release(record):
+    IdempotencyRecord.objects.using(DB).filter(pk=record.pk, created_at=record.created_at).delete()
+
+
+def idempotent(endpoint):
+    """Make a DRF view honour ``Idempotency-Key``; place it below ``@api_view``."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key = request.headers.get(HEADER)
+            if key is None:
+                return view(request, *args, **kwargs)
+            try:
+                owner, _ = get_user_from_headers(request)
+            except Exception:
+                # The view rejects the request itself; nothing worth storing
+                return view(request, *args, **kwargs)
+            if not key or len(key) > MAX_KEY_LENGTH:
+                return Response({'error': f'{HEADER} must be 1-{MAX_KEY_LENGTH} characters'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            fingerprint = request_fingerprint(request)
+
+            deadline = time.monotonic() + min(settings.IDEMPOTENCY_WAIT_SECONDS, MAX_WAIT_SECONDS)
+            while True:
+                record, claimed = _claim(owner, endpoint, key, fingerprint)
+                if claimed:
+                    break
+                if record.fingerprint != fingerprint:
+                    return Response({'error': f'{HEADER} was already used for a different request'},
+                                    status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+                # Give a nearly finished request a moment to store its response
+                while record is not None and record.response_status is None and time.monotonic() < deadline:
+                    time.sleep(POLL_SECONDS)
+                    record = IdempotencyRecord.objects.using(DB).filter(pk=record.pk).first()
+                if record is None:
+                    continue  # The first attempt failed and released the key; run it ourselves
+                if record.response_status is not None:
+                    return _replay(record)
+                response = Response({'error': f'A request with this {HEADER} is still in progress'},
+                                    status=status.HTTP_409_CONFLICT)
+                response['Retry-After'] = '1'
+                return response
+
+            try:
+                response = view(request, *args, **kwargs)
+            except BaseException:
+                _release(record)
+                raise
+            try:
+                _store(record, response)
+            except Exception as e:
+                logger.exception("Storing idempotent response failed: %s", str(e))
+                _release(record)
+            return response
+        return wrapper
+    return decorator
+
+
+def cleanup_expired(now=None):
+    """Delete records past their TTL; returns how many went."""
+    now = now or timezone.now()
+    deleted, _ = IdempotencyRecord.objects.using(DB).filter(expires_at__lte=now).delete()
+    return deleted
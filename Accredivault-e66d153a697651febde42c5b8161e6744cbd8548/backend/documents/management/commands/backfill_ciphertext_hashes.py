@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from documents.models import Document
+from documents.sharding import use_shard, shards
+from documents.utils import file_sha256
+
+
+class Command(BaseCommand):
+    help = "Store the SHA-256 of each stored blob for documents uploaded before ciphertext fingerprints existed"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        filled = missing = 0
+        for alias in shards():
+            with use_shard(alias):
+                shard_filled, shard_missing = self.backfill(options['batch_size'])
+            filled, missing = filled + shard_filled, missing + shard_missing
+        self.stdout.write(f"Fingerprinted {filled} documents ({missing} with unreadable files)")
+
+    def backfill(self, batch_size):
+        filled = missing = 0
+        last_pk = ''
+        while True:
+            batch = list(
+                Document.objects.filter(ciphertext_hash='', pk__gt=last_pk).order_by('pk')
+                .only('doc_id', 'file')[:batch_size]
+            )
+            if not batch:
+                return filled, missing
+            last_pk = batch[-1].pk
+            for document in batch:
+                try:
+                    with document.file.storage.open(document.file.name, 'rb') as f:
+                        digest = file_sha256(f)
+                except (FileNotFoundError, OSError) as e:
+                    missing += 1
+                    self.stderr.write(f"{document.doc_id}: stored file unreadable ({e})")
+                    continue
+                # update() keeps updated_at (and delta sync) unchanged
+                filled += Document.objects.filter(pk=document.pk, ciphertext_hash='').update(ciphertext_hash=digest)
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from documents.bloom import rebuild
+
+
+class Command(BaseCommand):
+    help = ("Rebuild the doc_id Bloom filter snapshot used by the verify endpoints from every shard, "
+            "sized for twice the current document count")
+
+    def handle(self, *args, **options):
+        bloom = rebuild()
+        self.stdout.write(
+            f"{bloom.items} doc_ids in {bloom.nbytes / 1024:.1f} KiB ({bloom.hashes} hashes), "
+            f"expected false-positive rate {bloom.false_positive_rate():.4%}; "
+            f"written to {settings.DOC_FILTER_SNAPSHOT_PATH}"
+        )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from documents.idempotency import cleanup_expired
+
+
+class Command(BaseCommand):
+    help = "Delete stored Idempotency-Key responses older than IDEMPOTENCY_TTL_SECONDS"
+
+    def handle(self, *args, **options):
+        deleted = cleanup_expired()
+        self.stdout.write(f"Removed {deleted} expired idempotency keys")
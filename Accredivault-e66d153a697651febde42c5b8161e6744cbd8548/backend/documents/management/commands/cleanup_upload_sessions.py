@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from documents.resumable import cleanup_expired
+
+
+class Command(BaseCommand):
+    help = "Delete resumable upload sessions idle past RESUMABLE_UPLOAD_TTL_SECONDS, and stray spool files"
+
+    def handle(self, *args, **options):
+        sessions, files = cleanup_expired()
+        self.stdout.write(f"Removed {sessions} expired upload sessions and {files} orphaned spool files")
@@ -0,0 +1,22 @@
+import os
+import time
+
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+from django.core.management.base import BaseCommand
+
+from documents.signing import b64url
+
+
+class Command(BaseCommand):
+    help = "Generate an Ed25519 manifest signing key as a MANIFEST_SIGNING_KEYS entry"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kid', help="Key id (default: date plus random suffix)")
+
+    def handle(self, *args, **options):
+        kid = options['kid'] or f"{time.strftime('%Y%m%d')}-{os.urandom(2).hex()}"
+        seed = os.urandom(32)
+        public = Ed25519PrivateKey.from_private_bytes(seed).public_key().public_bytes(Encoding.Raw, PublicFormat.Raw)
+        self.stdout.write(f"Signing key (append to MANIFEST_SIGNING_KEYS, keep secret): {kid}:{b64url(seed)}")
+        self.stdout.write(f"Public key (for MANIFEST_RETIRED_PUBLIC_KEYS once retired): {kid}:{b64url(public)}")
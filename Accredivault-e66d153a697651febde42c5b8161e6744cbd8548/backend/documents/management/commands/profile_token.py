@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from documents.profiling import PROFILE_HEADER, TOKEN_MAX_AGE, make_profile_token
+
+
+class Command(BaseCommand):
+    help = "Print a signed header value that profiles requests to the given path"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Request path, e.g. /api/docs/")
+
+    def handle(self, *args, **options):
+        token = make_profile_token(options['path'])
+        self.stdout.write(f"{PROFILE_HEADER}: {token}")
+        self.stdout.write(f"(valid for {TOKEN_MAX_AGE} seconds)")
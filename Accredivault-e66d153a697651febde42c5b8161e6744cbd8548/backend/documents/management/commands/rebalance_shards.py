@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from documents.sharding import is_sharded, shards, shard_loads, plan_moves, index_directory, move_institution
+
+
+class Command(BaseCommand):
+    help = ("Show how institutions are spread over the document shards, index existing data into the "
+            "shard directory (--index), or move institutions between shards (--move/--plan --apply)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--index', action='store_true',
+                            help="Record the owners and documents already on each shard in the directory")
+        parser.add_argument('--move', metavar='OWNER', help="Move one institution (with --to)")
+        parser.add_argument('--to', metavar='SHARD', help="Target shard alias for --move")
+        parser.add_argument('--plan', action='store_true', help="Propose moves that even out document counts")
+        parser.add_argument('--apply', action='store_true', help="Carry out the --plan moves")
+        parser.add_argument('--no-wait', action='store_true',
+                            help="Don't wait SHARD_DIRECTORY_CACHE_SECONDS around a move (no other processes running)")
+
+    def handle(self, *args, **options):
+        if not is_sharded():
+            raise CommandError("Sharding is off: set DB_SHARD_PATHS")
+        wait = not options['no_wait']
+
+        if options['index']:
+            indexed, conflicts = index_directory()
+            for alias, count in indexed.items():
+                self.stdout.write(f"{alias}: indexed {count} documents")
+            for owner in conflicts:
+                self.stderr.write(f"{owner} has documents on more than one shard; move it to consolidate")
+            return
+
+        if options['move']:
+            if options['to'] not in shards():
+                raise CommandError(f"--to must be one of {', '.join(shards())}")
+            moved = move_institution(options['move'], options['to'], wait=wait)
+            self.stdout.write(f"Moved {moved} documents of {options['move']} to {options['to']}")
+            return
+
+        loads = shard_loads()
+        for alias, owners in loads.items():
+            self.stdout.write(f"{alias}: {sum(owners.values())} documents, {len(owners)} institutions")
+        if not options['plan']:
+            return
+        moves = plan_moves(loads)
+        if not moves:
+            self.stdout.write("Shards are as even as whole institutions allow")
+            return
+        for owner, source, target in moves:
+            self.stdout.write(f"move {owner} ({loads[source][owner]} documents): {source} -> {target}")
+            if options['apply']:
+                move_institution(owner, target, wait=wait)
+        if not options['apply']:
+            self.stdout.write("Dry run; pass --apply to carry out these moves")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from documents.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the SQLite FTS5 search index from the Document table (e.g. after VACUUM)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        count = rebuild_index(using=options['database'])
+        self.stdout.write(f"Indexed {count} documents")
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from documents.stats import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute the dashboard counters from the Document table and report any drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without rewriting the counters')
+
+    def handle(self, *args, **options):
+        drift = rebuild(using=options['database'], dry_run=options['dry_run'])
+        for (scope, key), (stored, expected) in sorted(drift.items()):
+            self.stdout.write(f"{scope}:{key} stored={stored} expected={expected}")
+        verb = 'Found' if options['dry_run'] else 'Fixed'
+        self.stdout.write(f"{verb} {len(drift)} drifted counters")
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from documents.reconcile import reconcile
+
+
+class Command(BaseCommand):
+    help = ("Match stored blobs against Document rows: delete blobs no document references "
+            "(older than the grace period) and flag documents whose blob is missing")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Report only; delete and flag nothing")
+        parser.add_argument('--grace-seconds', type=int, default=settings.STORAGE_GC_GRACE_SECONDS,
+                            help="Leave orphaned blobs younger than this alone (uploads in flight)")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        report = reconcile(dry_run=options['dry_run'], grace_seconds=options['grace_seconds'],
+                           batch_size=options['batch_size'])
+        mib = lambda n: f"{n / 1024 / 1024:.1f} MiB"
+        self.stdout.write(f"{report['blobs']} blobs ({mib(report['bytes'])}) in storage")
+        self.stdout.write(f"{report['orphans']} orphaned ({mib(report['orphan_bytes'])}), "
+                          f"{report['young_orphans']} within the grace period")
+        for name in report['dangling_names']:
+            self.stderr.write(f"missing blob: {name}")
+        self.stdout.write(f"{report['dangling']} documents reference a missing blob")
+        if options['dry_run']:
+            self.stdout.write("Dry run; nothing deleted or flagged")
+        else:
+            self.stdout.write(f"Deleted {report['deleted']} orphaned blobs, reclaimed {mib(report['reclaimed_bytes'])}")
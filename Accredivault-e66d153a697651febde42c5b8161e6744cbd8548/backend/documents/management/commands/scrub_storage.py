@@ -0,0 +1,53 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from documents.scrub import Checkpoint, scrub, CORRUPT, MISSING
+from documents.utils import get_encryption_key_from_settings
+
+
+class Command(BaseCommand):
+    help = ("Decrypt and re-hash stored documents to detect bit-rot or truncation. "
+            "Resumes from a checkpoint; schedule it from cron with --time-budget, "
+            "or keep it running with --interval")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.SCRUB_WORKERS)
+        parser.add_argument('--max-mb-per-sec', type=float, default=settings.SCRUB_MAX_MB_PER_SEC,
+                            help="Storage read cap across all workers (0 = unlimited)")
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--time-budget', type=float, help="Stop (and checkpoint) after this many seconds")
+        parser.add_argument('--interval', type=float,
+                            help="Run forever, starting a new pass this many seconds after one finishes")
+        parser.add_argument('--restart', action='store_true', help="Discard the checkpoint and start a new pass")
+        parser.add_argument('--no-notify', action='store_true', help="Don't email the admin about failures")
+
+    def handle(self, *args, **options):
+        key = get_encryption_key_from_settings()
+        if not key:
+            raise CommandError("ENCRYPTION_KEY is not configured")
+        checkpoint = Checkpoint(settings.SCRUB_CHECKPOINT_PATH)
+        if options['restart']:
+            checkpoint.clear()
+
+        while True:
+            deadline = time.monotonic() + options['time_budget'] if options['time_budget'] else None
+            state, finished = scrub(
+                key,
+                checkpoint,
+                workers=options['workers'],
+                bytes_per_sec=options['max_mb_per_sec'] * 1024 * 1024,
+                batch_size=options['batch_size'],
+                deadline=deadline,
+                notify=not options['no_notify'],
+            )
+            progress = (f"{state['checked']} documents, {state['bytes'] / 1024 / 1024:.1f} MiB, "
+                        f"{state[CORRUPT]} corrupt, {state[MISSING]} missing")
+            if not finished:
+                self.stdout.write(f"Time budget used; checkpointed after {state['last_doc_id']} ({progress})")
+                return
+            self.stdout.write(f"Pass started {state['started_at']} complete: {progress}")
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
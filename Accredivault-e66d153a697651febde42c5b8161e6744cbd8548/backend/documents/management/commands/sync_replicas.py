@@ -0,0 +1,33 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = "Copy the primary SQLite database onto every configured read replica file"
+
+    def handle(self, *args, **options):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        if not replicas:
+            self.stdout.write("No replicas configured (set DB_REPLICA_PATHS)")
+            return
+
+        primary = settings.DATABASES['default']
+        if primary['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError("sync_replicas only handles SQLite; use the database's own replication")
+
+        # Online backup API: consistent snapshot even while the primary takes writes
+        source = sqlite3.connect(str(primary['NAME']))
+        try:
+            for alias in replicas:
+                connections[alias].close()
+                target = sqlite3.connect(str(settings.DATABASES[alias]['NAME']))
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(f"Synced {alias} <- default")
+        finally:
+            source.close()
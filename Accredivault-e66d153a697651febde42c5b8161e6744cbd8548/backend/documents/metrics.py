@@ -0,0 +1,169 @@
+"""In-process counters and latency histograms, rendered in Prometheus text format.
+
+Deliberately tiny instead of pulling in prometheus_client: a metric update is a
+dict lookup, a bisect and a few additions under a per-metric lock, cheap
+enough to leave on in production. Values are per process; scrape each worker
+(or sum them in Prometheus) when running several.
+"""
+import bisect
+import threading
+import time
+
+# Seconds; tuned for API phases from sub-millisecond hashing up to slow storage writes
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REGISTRY = []
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(labels.get(n, '') for n in self.labelnames)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._render_samples(items))
+        return lines
+
+    def _render_samples(self, items):
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def _render_samples(self, items):
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {value}' for key, value in items]
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def _render_samples(self, items):
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {value}' for key, value in items]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [per-bucket counts (+Inf last), sum, count]
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def time(self, **labels):
+        """Context manager observing the duration of its block."""
+        return _Timer(self, labels)
+
+    def _render_samples(self, items):
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                bucket_labels = _format_labels(self.labelnames, key, f'le="{le}"')
+                lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {total}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class _Timer:
+    # A plain class rather than @contextmanager: no generator per timed block
+    __slots__ = ('histogram', 'labels', 'started')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+def render_latest():
+    """All registered metrics in Prometheus text exposition format (0.0.4)."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+REQUEST_LATENCY = Histogram(
+    'accredivault_request_duration_seconds', 'HTTP request latency by view', ['view', 'method'])
+PHASE_LATENCY = Histogram(
+    'accredivault_phase_duration_seconds', 'Latency of individual processing phases', ['view', 'phase'])
+UPLOADS = Counter('accredivault_uploads_total', 'Documents stored successfully', ['view'])
+VERIFICATIONS = Counter('accredivault_verifications_total', 'Verification requests answered', ['endpoint'])
+VERIFICATION_MISMATCHES = Counter(
+    'accredivault_verification_mismatches_total', 'Verifications whose hash did not match', ['endpoint'])
+ADMISSION_REJECTED = Counter(
+    'accredivault_admission_rejected_total', 'Requests refused by admission control', ['endpoint', 'reason'])
+EMAILS_SENT = Counter('accredivault_emails_total', 'Notification emails by outcome', ['result'])
+DOC_FILTER_BYTES = Gauge('accredivault_doc_filter_bytes', 'Memory held by the doc_id Bloom filter bit array')
+DOC_FILTER_ITEMS = Gauge('accredivault_doc_filter_items', 'doc_ids in the Bloom filter')
+DOC_FILTER_FALSE_POSITIVE_RATE = Gauge(
+    'accredivault_doc_filter_false_positive_rate', 'Expected false-positive rate of the doc_id Bloom filter')
+DOC_FILTER_LOOKUPS = Counter(
+    'accredivault_doc_filter_lookups_total',
+    'Verify doc_id lookups by filter outcome (rejected, passed, recent, false_positive)', ['result'])
+
+
+def timed_phase(view, phase):
+    """Context manager timing one phase of a view, e.g. timed_phase('upload_document', 'encrypt')."""
+    return PHASE_LATENCY.time(view=view, phase=phase)
@@ -0,0 +1,260 @@
+import gzip
+import time
+import random
+import cProfile
+import logging
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async, async_to_sync
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+
+from .routers import set_primary_pin, reset_primary_pin, track_writes, stop_tracking_writes
+from .metrics import REQUEST_LATENCY
+from .profiling import PROFILE_HEADER, QueryTimer, is_valid_profile_token, write_profile
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only without it
+    brotli = None
+
+logger = logging.getLogger('documents')
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReplicaPinningMiddleware:
+    """Read-your-writes stickiness for the replica router.
+
+    Unsafe requests run against the primary unless their view is marked
+    ``@replica_ok`` (the verify POSTs only read). A request that actually
+    wrote through the router hands the client a short-lived cookie on
+    success; while it is present the client's reads skip the replicas.
+    Sync and async capable, so async views stay on the event loop.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.cookie_name = getattr(settings, 'REPLICA_PIN_COOKIE', 'avault_pin')
+        self.pin_seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            # Django runs a sync process_view on a thread in an async stack
+            self.process_view = self._aprocess_view
+
+    def _finish(self, tracker, response):
+        if tracker.wrote and response.status_code < 400:
+            response.set_cookie(
+                self.cookie_name, '1',
+                max_age=self.pin_seconds, httponly=True, samesite='Lax',
+            )
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        # Always set (and reset) so a pin never leaks into the next request on this thread
+        token = set_primary_pin(self.cookie_name in request.COOKIES)
+        tracker, tracker_token = track_writes()
+        try:
+            response = self.get_response(request)
+        finally:
+            stop_tracking_writes(tracker_token)
+            reset_primary_pin(token)
+        return self._finish(tracker, response)
+
+    async def __acall__(self, request):
+        token = set_primary_pin(self.cookie_name in request.COOKIES)
+        tracker, tracker_token = track_writes()
+        try:
+            response = await self.get_response(request)
+        finally:
+            stop_tracking_writes(tracker_token)
+            reset_primary_pin(token)
+        return self._finish(tracker, response)
+
+    def _pin_for_view(self, request, view_func):
+        # A write's own checks (ownership, current status) must not read a lagging replica
+        if request.method not in SAFE_METHODS and not getattr(view_func, 'replica_ok', False):
+            set_primary_pin()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        self._pin_for_view(request, view_func)
+        return None
+
+    async def _aprocess_view(self, request, view_func, view_args, view_kwargs):
+        self._pin_for_view(request, view_func)
+        return None
+
+
+class MetricsMiddleware:
+    """Record request latency per resolved view into the metrics histogram.
+
+    Sync and async capable, so the async verify/download views are not pushed
+    back onto a thread just to be timed.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _observe(self, request, started):
+        match = getattr(request, 'resolver_match', None)
+        view = match.url_name if match and match.url_name else 'unmatched'
+        REQUEST_LATENCY.observe(time.perf_counter() - started, view=view, method=request.method)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self._observe(request, started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self._observe(request, started)
+        return response
+
+
+class ProfilingMiddleware:
+    """Profile single requests on demand (signed header) or by sampling.
+
+    Removed from the stack at startup unless PROFILING_ENABLED is set, so it
+    costs nothing when profiling is off. Under ASGI only the profiled requests
+    leave the event loop: cProfile and the query timer follow one thread, so
+    those run on a worker thread from start to finish.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _trigger(self, request):
+        token = request.headers.get(PROFILE_HEADER)
+        if token and is_valid_profile_token(token, request.path):
+            return 'header'
+        if self.sample_rate and random.random() < self.sample_rate:
+            return 'sample'
+        return None
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        trigger = self._trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+        return self._profile(request, trigger, self.get_response)
+
+    async def __acall__(self, request):
+        trigger = self._trigger(request)
+        if trigger is None:
+            return await self.get_response(request)
+        return await sync_to_async(self._profile)(request, trigger, async_to_sync(self.get_response))
+
+    def _profile(self, request, trigger, get_response):
+        profiler = cProfile.Profile()
+        queries = QueryTimer()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(queries))
+            started = time.perf_counter()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler is already active on this interpreter
+                return get_response(request)
+            try:
+                response = get_response(request)
+            finally:
+                profiler.disable()
+            duration = time.perf_counter() - started
+        try:
+            summary = write_profile(profiler, request, response, duration, queries, trigger)
+            response['X-Profile-Id'] = summary['name']
+        except Exception as e:
+            logger.error(f"Failed to write request profile: {str(e)}")
+        return response
+
+
+class CompressionMiddleware:
+    """Brotli/gzip for large JSON and text responses.
+
+    Only bodies of at least COMPRESSION_MIN_SIZE bytes with a compressible
+    content type are encoded, so small API replies skip the CPU cost and the
+    (already random) encrypted downloads are never touched.
+    """
+
+    sync_capable = True
+    async_capable = True
+    compressible_types = ('application/json', 'text/')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _encoding(self, request):
+        accepted = {
+            part.split(';')[0].strip().lower()
+            for part in request.headers.get('Accept-Encoding', '').split(',')
+        }
+        if brotli is not None and 'br' in accepted:
+            return 'br'
+        if 'gzip' in accepted:
+            return 'gzip'
+        return None
+
+    def _compress(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if not response.get('Content-Type', '').startswith(self.compressible_types):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < self.min_size:
+            return response
+        encoding = self._encoding(request)
+        if encoding is None:
+            return response
+
+        if encoding == 'br':
+            compressed = brotli.compress(response.content, quality=4)
+        else:
+            compressed = gzip.compress(response.content, compresslevel=6)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        # The encoded bytes differ from the identity representation
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self._compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        return self._compress(request, response)
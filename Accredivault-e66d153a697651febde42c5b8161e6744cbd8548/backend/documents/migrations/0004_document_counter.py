@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:22
+
+from django.db import migrations, models
+
+
+def seed_counters(apps, schema_editor):
+    from documents.stats import expected_counts
+    DocumentCounter = apps.get_model('documents', 'DocumentCounter')
+    using = schema_editor.connection.alias
+    DocumentCounter.objects.using(using).bulk_create(
+        [DocumentCounter(scope=scope, key=key, count=n) for (scope, key), n in expected_counts(using).items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0003_document_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('total', 'Total'), ('status', 'By status'), ('owner', 'By owner'), ('owner_status', 'By owner and status'), ('day', 'By upload day')], max_length=20)),
+                ('key', models.CharField(max_length=150)),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='documentcounter',
+            constraint=models.UniqueConstraint(fields=('scope', 'key'), name='unique_document_counter'),
+        ),
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0004_document_counter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('doc_id', models.CharField(max_length=50)),
+                ('owner', models.CharField(max_length=100)),
+                ('event', models.CharField(choices=[('UPLOAD', 'Upload'), ('STATUS_CHANGE', 'Status Change')], max_length=20)),
+                ('status', models.CharField(max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['owner', 'id'], name='documentevent_owner_seq'), models.Index(fields=['doc_id', 'id'], name='documentevent_doc_seq')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:32
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0005_document_event'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('doc_id', models.CharField(max_length=50)),
+                ('owner', models.CharField(max_length=100)),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['updated_at', 'doc_id'], name='document_sync_cursor'),
+        ),
+        migrations.AddIndex(
+            model_name='documenttombstone',
+            index=models.Index(fields=['deleted_at', 'id'], name='tombstone_sync_cursor'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0006_delta_sync'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='last_verified_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='last_verify_result',
+            field=models.CharField(blank=True, default='', max_length=10),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0007_document_scrub_result'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='compression',
+            field=models.CharField(blank=True, default='', max_length=10),
+        ),
+    ]
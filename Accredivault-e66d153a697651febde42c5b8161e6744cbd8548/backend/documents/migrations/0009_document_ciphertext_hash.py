@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0008_document_compression'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='ciphertext_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0009_document_ciphertext_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='tree_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='tree_hash_alg',
+            field=models.CharField(blank=True, default='', max_length=20),
+        ),
+    ]
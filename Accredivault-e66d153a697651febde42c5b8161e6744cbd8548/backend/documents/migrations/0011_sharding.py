@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0010_document_tree_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentLocation',
+            fields=[
+                ('doc_id', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('owner', models.CharField(max_length=100)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='InstitutionShard',
+            fields=[
+                ('owner', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('shard', models.CharField(max_length=50)),
+                ('moving', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='documenttombstone',
+            name='tombstone_sync_cursor',
+        ),
+        migrations.AddIndex(
+            model_name='documenttombstone',
+            index=models.Index(fields=['deleted_at', 'doc_id'], name='tombstone_sync_cursor'),
+        ),
+    ]
@@ -0,0 +1,13 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # Used to re-create the SQLite search triggers dropped by 0007-0010; the
+    # post_migrate handler in documents/search.py does that now. Kept so the
+    # migration graph and databases that applied it stay consistent.
+
+    dependencies = [
+        ('documents', '0011_sharding'),
+    ]
+
+    operations = []
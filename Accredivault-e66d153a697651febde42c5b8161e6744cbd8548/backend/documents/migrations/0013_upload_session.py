@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0012_restore_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('upload_id', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('owner', models.CharField(max_length=100)),
+                ('title', models.CharField(max_length=255)),
+                ('filename', models.CharField(max_length=100)),
+                ('length', models.BigIntegerField()),
+                ('offset', models.BigIntegerField(default=0)),
+                ('enc_iv', models.CharField(max_length=24)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['expires_at'], name='uploadsession_expiry')],
+            },
+        ),
+    ]
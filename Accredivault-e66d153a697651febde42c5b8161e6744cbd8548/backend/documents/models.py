@@ -1,7 +1,8 @@
-import uuid
 import hashlib
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.utils import timezone
+from .utils import new_doc_id
 
 class Document(models.Model):
     STATUS_CHOICES = [
@@ -20,16 +21,26 @@ class Document(models.Model):
     ai_issues = models.JSONField(default=list)
     # Crypto & storage metadata
     file_hash = models.CharField(max_length=64, blank=True, default='')  # SHA-256 hex of plaintext
+    ciphertext_hash = models.CharField(max_length=64, blank=True, default='')  # SHA-256 hex of the stored blob
+    tree_hash = models.CharField(max_length=64, blank=True, default='')  # parallel tree hash of plaintext (optional)
+    tree_hash_alg = models.CharField(max_length=20, blank=True, default='')  # e.g. SHA256-TREE-1M
     enc_iv = models.CharField(max_length=24, blank=True, default='')  # base64 12 bytes
     enc_tag = models.CharField(max_length=24, blank=True, default='')  # base64 16 bytes (truncated ok)
     enc_alg = models.CharField(max_length=20, default='AES-256-GCM')
     storage_backend = models.CharField(max_length=10, default='LOCAL')  # LOCAL or S3
+    compression = models.CharField(max_length=10, blank=True, default='')  # codec applied before encryption ('' = none)
+    # Last storage integrity check (manage.py scrub_storage): OK, CORRUPT or MISSING
+    last_verified_at = models.DateTimeField(null=True, blank=True)
+    last_verify_result = models.CharField(max_length=10, blank=True, default='')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     def save(self, *args, **kwargs):
         if not self.doc_id:
-            self.doc_id = f"doc-{uuid.uuid4().hex[:8]}"
+            # Legacy ids were doc-<8 hex>; both forms stay valid primary keys.
+            # A freshly generated id is always an INSERT: never UPDATE a row that happens to share it.
+            self.doc_id = new_doc_id()
+            kwargs.setdefault('force_insert', True)
         super().save(*args, **kwargs)
     
     def __str__(self):
@@ -37,6 +48,13 @@ class Document(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Delta-sync cursor (see documents/sync.py)
+            models.Index(fields=['updated_at', 'doc_id'], name='document_sync_cursor'),
+            # Newest-first listings, optionally by status, and created_at ranges (admin date hierarchy)
+            models.Index(fields=['created_at', 'doc_id'], name='document_created'),
+            models.Index(fields=['status', 'created_at', 'doc_id'], name='document_status_created'),
+        ]
 
 class AuditLog(models.Model):
     ACTION_CHOICES = [
@@ -52,7 +70,136 @@ class AuditLog(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
-        return f"{self.doc.doc_id} - {self.action} by {self.actor}"
+        return f"{self.doc_id} - {self.action} by {self.actor}"
     
     class Meta:
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='auditlog_created'),
+            models.Index(fields=['actor', 'created_at'], name='auditlog_actor_created'),
+            models.Index(fields=['hash'], name='auditlog_hash'),
+        ]
+
+class DocumentCounter(models.Model):
+    """Pre-aggregated document counts for dashboards (see documents/stats.py)."""
+    SCOPE_CHOICES = [
+        ('total', 'Total'),
+        ('status', 'By status'),
+        ('owner', 'By owner'),
+        ('owner_status', 'By owner and status'),
+        ('day', 'By upload day'),
+    ]
+
+    scope = models.CharField(max_length=20, choices=SCOPE_CHOICES)
+    key = models.CharField(max_length=150)
+    count = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.scope}:{self.key} = {self.count}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key'], name='unique_document_counter'),
+        ]
+
+class DocumentEvent(models.Model):
+    """Append-only change log behind the SSE stream; id is the event sequence number."""
+    EVENT_CHOICES = [
+        ('UPLOAD', 'Upload'),
+        ('STATUS_CHANGE', 'Status Change'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    doc_id = models.CharField(max_length=50)
+    owner = models.CharField(max_length=100)
+    event = models.CharField(max_length=20, choices=EVENT_CHOICES)
+    status = models.CharField(max_length=20)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"#{self.id} {self.event} {self.doc_id}"
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['owner', 'id'], name='documentevent_owner_seq'),
+            models.Index(fields=['doc_id', 'id'], name='documentevent_doc_seq'),
+        ]
+
+class DocumentTombstone(models.Model):
+    """Marker left behind by a deleted document so delta-sync clients can drop it."""
+    doc_id = models.CharField(max_length=50)
+    owner = models.CharField(max_length=100)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.doc_id} deleted {self.deleted_at}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at', 'doc_id'], name='tombstone_sync_cursor'),
+        ]
+
+class InstitutionShard(models.Model):
+    """Shard directory: which database alias holds an institution's documents (see documents/sharding.py)."""
+    owner = models.CharField(max_length=100, primary_key=True)
+    shard = models.CharField(max_length=50)
+    # Set while rebalance_shards copies the institution; writes are refused meanwhile
+    moving = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.owner} -> {self.shard}"
+
+class DocumentLocation(models.Model):
+    """Shard directory: owner of each doc_id, so a lookup by id goes straight to one shard."""
+    doc_id = models.CharField(max_length=50, primary_key=True)
+    owner = models.CharField(max_length=100)
+
+    def __str__(self):
+        return f"{self.doc_id} ({self.owner})"
+
+
+class UploadSession(models.Model):
+    """Resumable upload in progress (see documents/resumable.py); the Document is created on finalize."""
+    upload_id = models.CharField(max_length=32, primary_key=True)
+    owner = models.CharField(max_length=100)
+    title = models.CharField(max_length=255)
+    filename = models.CharField(max_length=100)
+    length = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+    enc_iv = models.CharField(max_length=24)  # base64 12 bytes, also the IV of the final blob
+    offset_lock = models.CharField(max_length=32, null=True, blank=True)  # token of the request writing the spool
+    locked_until = models.DateTimeField(null=True, blank=True)  # when an abandoned claim lapses
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.upload_id} {self.offset}/{self.length}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['expires_at'], name='uploadsession_expiry'),
+        ]
+
+class IdempotencyRecord(models.Model):
+    """Stored outcome of an upload sent with an Idempotency-Key (see documents/idempotency.py)."""
+    owner = models.CharField(max_length=100)
+    endpoint = models.CharField(max_length=50)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)  # SHA-256 of the request it was first used with
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)  # null while in flight
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=timezone.now)  # reset when a stale claim is taken over
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.owner} {self.endpoint} {self.key}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'endpoint', 'key'], name='idempotency_key_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='idempotency_expiry'),
+        ]
@@ -0,0 +1,123 @@
+"""Opt-in single-request profiling.
+
+A request is profiled when ``PROFILING_ENABLED`` is on and either carries a
+valid signed ``X-Profile-Token`` header (see ``manage.py profile_token``) or
+falls inside ``PROFILING_SAMPLE_RATE``. Each profile is written to
+``PROFILING_DIR`` as a cProfile dump (``.prof``) plus a JSON summary with the
+view name, SQL query count and total SQL time; staff can browse them at
+``/admin/profiles/``.
+"""
+import io
+import json
+import pstats
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core import signing
+from django.http import FileResponse, Http404
+from django.shortcuts import render
+
+PROFILE_HEADER = 'X-Profile-Token'
+TOKEN_MAX_AGE = 300  # seconds a signed token stays valid
+TOP_FUNCTIONS = 40
+
+
+def _signer():
+    key = getattr(settings, 'PROFILING_SECRET', '') or settings.SECRET_KEY
+    return signing.TimestampSigner(key=key, salt='documents.profiling')
+
+
+def make_profile_token(path):
+    """Signed header value that enables profiling for requests to `path`."""
+    return _signer().sign(path)
+
+
+def is_valid_profile_token(token, path):
+    try:
+        return _signer().unsign(token, max_age=TOKEN_MAX_AGE) == path
+    except signing.BadSignature:
+        return False
+
+
+def profile_dir():
+    return Path(getattr(settings, 'PROFILING_DIR', Path(settings.BASE_DIR) / 'profiles'))
+
+
+class QueryTimer:
+    """connection.execute_wrapper hook counting queries and their total time."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+def write_profile(profiler, request, response, duration, queries, trigger):
+    """Dump the profiler and a JSON summary; returns the summary dict."""
+    match = getattr(request, 'resolver_match', None)
+    view = match.view_name if match else 'unmatched'
+    name = f"{time.strftime('%Y%m%dT%H%M%S')}-{view.replace(':', '_')}-{uuid.uuid4().hex[:6]}"
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+
+    profiler.dump_stats(str(directory / f'{name}.prof'))
+    text = io.StringIO()
+    pstats.Stats(profiler, stream=text).sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+
+    summary = {
+        'name': name,
+        'view': view,
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'trigger': trigger,
+        'duration_ms': round(duration * 1000, 3),
+        'sql_queries': queries.count,
+        'sql_ms': round(queries.seconds * 1000, 3),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'top_functions': text.getvalue(),
+    }
+    (directory / f'{name}.json').write_text(json.dumps(summary, indent=2))
+    return summary
+
+
+def recent_profiles(limit=50):
+    directory = profile_dir()
+    if not directory.exists():
+        return []
+    summaries = []
+    for path in sorted(directory.glob('*.json'), reverse=True)[:limit]:
+        try:
+            summaries.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue
+    return summaries
+
+
+@staff_member_required
+def profile_list(request):
+    """Admin page listing recent request profiles"""
+    return render(request, 'documents/profiles.html', {
+        'title': 'Request profiles',
+        'profiles': recent_profiles(),
+        'enabled': getattr(settings, 'PROFILING_ENABLED', False),
+    })
+
+
+@staff_member_required
+def profile_download(request, name):
+    """Download one .prof dump (open with snakeviz or pstats)"""
+    path = profile_dir() / f'{name}.prof'
+    if '/' in name or not path.exists():
+        raise Http404('Profile not found')
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=path.name)
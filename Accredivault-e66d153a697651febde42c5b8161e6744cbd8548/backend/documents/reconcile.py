@@ -0,0 +1,188 @@
+"""Storage/database reconciliation (``manage.py reconcile_storage``).
+
+Deleting a Document (admin, shell) cascades to its audit log but leaves the
+encrypted blob in storage, and an upload that fails after
+``document.file.save`` leaves a blob that no row points at. The reconciler
+streams the storage listing under ``documents/`` and the ``Document.file``
+names of every shard, both sorted by name, and merge-joins them without
+loading either side:
+
+* orphans are blobs no row references. Those last modified before the grace
+  period (``STORAGE_GC_GRACE_SECONDS``) are deleted in batches. Each batch is
+  checked against the database again first, so an upload that commits
+  mid-run keeps its blob. Younger orphans may belong to an upload still in
+  flight and are only counted.
+* dangling references are rows whose blob is missing. They are logged and
+  marked MISSING in ``last_verify_result``, as the scrubber does. Rows are
+  never deleted.
+
+A dry run reports the same figures without deleting or marking anything.
+Spool files of unfinished resumable uploads live outside storage;
+``cleanup_upload_sessions`` removes those.
+"""
+import heapq
+import logging
+import os
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connections
+from django.db.models.functions import Collate
+from django.utils import timezone
+
+from .models import Document
+from .scrub import MISSING
+from .sharding import shards
+
+logger = logging.getLogger('documents')
+
+REPORT_LIMIT = 100  # dangling names kept in the report
+
+Blob = namedtuple('Blob', 'name size modified')
+
+
+def blob_prefix():
+    upload_to = Document._meta.get_field('file').upload_to
+    return upload_to if isinstance(upload_to, str) else ''
+
+
+def storage_listing(storage, prefix):
+    """Blob for every stored file under `prefix`, in name order."""
+    bucket = getattr(storage, 'bucket', None)
+    if bucket is not None:
+        # S3 lists keys in byte order, a page of 1000 at a time
+        location = storage.location.strip('/')
+        for obj in bucket.objects.filter(Prefix=storage._normalize_name(prefix)):
+            name = obj.key[len(location) + 1:] if location else obj.key
+            yield Blob(name, obj.size, obj.last_modified)
+        return
+    yield from _walk(storage.path(''), prefix.rstrip('/'))
+
+
+def _walk(root, relative):
+    try:
+        entries = list(os.scandir(os.path.join(root, relative)))
+    except FileNotFoundError:
+        return
+    # Sort directories as their names plus '/' so the stream is in full-name order
+    entries.sort(key=lambda e: e.name + '/' if e.is_dir(follow_symlinks=False) else e.name)
+    for entry in entries:
+        name = f"{relative}/{entry.name}" if relative else entry.name
+        if entry.is_dir(follow_symlinks=False):
+            yield from _walk(root, name)
+        elif entry.is_file(follow_symlinks=False):
+            stat = entry.stat()
+            yield Blob(name, stat.st_size, datetime.fromtimestamp(stat.st_mtime, tz=dt_timezone.utc))
+
+
+def referenced_names(alias, prefix, batch_size=1000):
+    """Sorted Document.file names under `prefix` on one shard."""
+    # Byte order on PostgreSQL too, to match the storage listing
+    ordering = Collate('file', 'C') if connections[alias].vendor == 'postgresql' else 'file'
+    documents = Document.objects.using(alias).filter(file__startswith=prefix).exclude(file='')
+    return documents.order_by(ordering).values_list('file', flat=True).iterator(chunk_size=batch_size)
+
+
+def _unique(names):
+    previous = None
+    for name in names:
+        if name != previous:
+            yield name
+            previous = name
+
+
+def _still_referenced(names):
+    found = set()
+    for alias in shards():
+        found.update(Document.objects.using(alias).filter(file__in=names).values_list('file', flat=True))
+    return found
+
+
+def _delete_blobs(storage, names):
+    bucket = getattr(storage, 'bucket', None)
+    if bucket is not None:
+        # One request per batch (S3 takes up to 1000 keys)
+        bucket.delete_objects(Delete={'Objects': [{'Key': storage._normalize_name(n)} for n in names], 'Quiet': True})
+        return
+    for name in names:
+        storage.delete(name)
+
+
+def new_report():
+    return {'blobs': 0, 'bytes': 0, 'orphans': 0, 'orphan_bytes': 0, 'young_orphans': 0,
+            'deleted': 0, 'reclaimed_bytes': 0, 'dangling': 0, 'dangling_names': []}
+
+
+def reconcile(dry_run=True, grace_seconds=None, batch_size=500, now=None):
+    """One reconciliation pass; returns the report dict."""
+    storage = Document._meta.get_field('file').storage
+    prefix = blob_prefix()
+    now = now or timezone.now()
+    if grace_seconds is None:
+        grace_seconds = settings.STORAGE_GC_GRACE_SECONDS
+    cutoff = now - timedelta(seconds=grace_seconds)
+    report = new_report()
+    orphans, dangling = [], []
+
+    blobs = storage_listing(storage, prefix)
+    refs = _unique(heapq.merge(*(referenced_names(alias, prefix) for alias in shards())))
+    blob, ref = next(blobs, None), next(refs, None)
+    while blob is not None or ref is not None:
+        if ref is None or (blob is not None and blob.name < ref):
+            report['blobs'] += 1
+            report['bytes'] += blob.size
+            report['orphans'] += 1
+            report['orphan_bytes'] += blob.size
+            if blob.modified >= cutoff:
+                report['young_orphans'] += 1
+            else:
+                orphans.append(blob)
+                if len(orphans) >= batch_size:
+                    _collect(storage, orphans, report, dry_run)
+                    orphans = []
+            blob = next(blobs, None)
+        elif blob is None or ref < blob.name:
+            dangling.append(ref)
+            if len(dangling) >= batch_size:
+                _mark_dangling(storage, dangling, report, dry_run, now)
+                dangling = []
+            ref = next(refs, None)
+        else:
+            report['blobs'] += 1
+            report['bytes'] += blob.size
+            blob, ref = next(blobs, None), next(refs, None)
+    if orphans:
+        _collect(storage, orphans, report, dry_run)
+    if dangling:
+        _mark_dangling(storage, dangling, report, dry_run, now)
+    return report
+
+
+def _collect(storage, orphans, report, dry_run):
+    if dry_run:
+        return
+    # A row may have committed since its name went past in the sorted stream
+    referenced = _still_referenced([b.name for b in orphans])
+    doomed = [b for b in orphans if b.name not in referenced]
+    if not doomed:
+        return
+    _delete_blobs(storage, [b.name for b in doomed])
+    report['deleted'] += len(doomed)
+    report['reclaimed_bytes'] += sum(b.size for b in doomed)
+    logger.info("Reconcile: deleted %d orphaned blobs (%d bytes)", len(doomed), sum(b.size for b in doomed))
+
+
+def _mark_dangling(storage, names, report, dry_run, now):
+    # The blob may have been written since the listing passed its name
+    missing = [name for name in names if not storage.exists(name)]
+    report['dangling'] += len(missing)
+    room = REPORT_LIMIT - len(report['dangling_names'])
+    report['dangling_names'].extend(missing[:max(room, 0)])
+    for name in missing:
+        logger.error("Reconcile: document blob %s is missing from storage", name)
+    if dry_run or not missing:
+        return
+    # queryset.update() leaves updated_at alone, so this doesn't show up in delta sync
+    for alias in shards():
+        Document.objects.using(alias).filter(file__in=missing).update(last_verified_at=now, last_verify_result=MISSING)
@@ -0,0 +1,269 @@
+"""Resumable, tus-style chunked uploads (``/api/docs/uploads/``).
+
+A session is created with the final length. The client then PATCHes chunks
+at the current offset, can ask for the offset after a dropped connection,
+and finalizes once every byte has arrived; only then is a ``Document``
+created. Chunks are hashed (SHA-256, plus the tree hash for large files) and
+AES-GCM encrypted as they stream in, and only ciphertext is spooled to
+``RESUMABLE_UPLOAD_DIR``. GCM is a stream mode, so spool offsets equal
+plaintext offsets. The tag is appended at finalize, which gives the same
+blob layout as a single-request upload.
+
+The hash and cipher contexts live in the process that received the last
+chunk, in a small LRU (``MAX_CACHED_STREAMS``), so abandoned sessions don't
+pin memory in a worker. A PATCH that lands on another worker, arrives after
+a restart or finds its entry evicted rebuilds them by decrypting the spool
+once and then carries on incrementally. Resumable uploads are stored uncompressed because the codec
+decision needs the whole file. Sessions live on the primary ('default'):
+offsets must never be read from a lagging replica.
+
+Only one request at a time may write a session's spool. Before touching it,
+a PATCH (or finalize) claims the session with a conditional UPDATE on the
+expected offset and an empty ``offset_lock``. The claim is atomic across
+processes, and a concurrent request gets ``UploadBusy`` (409). The claim is
+released with the new offset. A claim left behind by a killed worker lapses
+after ``RESUMABLE_UPLOAD_LOCK_SECONDS``.
+"""
+import base64
+import hashlib
+import os
+import secrets
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from pathlib import Path
+
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import UploadSession
+from .treehash import ALGORITHM as TREE_ALGORITHM, TreeHasher, wants_tree_hash
+
+DB = 'default'
+READ_SIZE = 1024 * 1024
+TAG_SIZE = 16
+
+MAX_CACHED_STREAMS = 64
+
+_streams_lock = threading.Lock()
+_streams = OrderedDict()  # upload_id -> UploadStream for the bytes received so far, least recent first
+
+
+class OffsetMismatch(Exception):
+    """The client's Upload-Offset isn't where the session is; carries the real offset."""
+
+    def __init__(self, offset):
+        super().__init__(f"Upload offset is {offset}")
+        self.offset = offset
+
+
+class UploadBusy(Exception):
+    """Another request holds the session's claim (is writing its spool right now)."""
+
+
+class UploadStream:
+    """Hash and cipher state of an upload up to `offset`."""
+
+    def __init__(self, key, iv, tree):
+        self.offset = 0
+        self.sha256 = hashlib.sha256()
+        self.ciphertext_sha256 = hashlib.sha256()
+        self.tree = TreeHasher() if tree else None
+        self.encryptor = Cipher(algorithms.AES(key), modes.GCM(iv)).encryptor()
+
+    def update(self, chunk):
+        """Absorb a plaintext chunk; returns its ciphertext."""
+        self.sha256.update(chunk)
+        if self.tree is not None:
+            self.tree.update(chunk)
+        ciphertext = self.encryptor.update(chunk)
+        self.ciphertext_sha256.update(ciphertext)
+        self.offset += len(chunk)
+        return ciphertext
+
+    def finalize(self):
+        """(tag, document fields) once every chunk is in."""
+        self.encryptor.finalize()
+        tag = self.encryptor.tag
+        self.ciphertext_sha256.update(tag)
+        return tag, {
+            'file_hash': self.sha256.hexdigest(),
+            'tree_hash': self.tree.hexdigest() if self.tree is not None else '',
+            'tree_hash_alg': TREE_ALGORITHM if self.tree is not None else '',
+            'ciphertext_hash': self.ciphertext_sha256.hexdigest(),
+        }
+
+
+def spool_path(upload_id):
+    return Path(settings.RESUMABLE_UPLOAD_DIR) / f"{upload_id}.part"
+
+
+def _claim(upload_id, offset):
+    """Take the session for writing at `offset`; returns the claim token.
+
+    Raises OffsetMismatch when the session is elsewhere, UploadBusy when
+    another request holds it, and UploadSession.DoesNotExist once it is gone.
+    """
+    token = secrets.token_hex(16)
+    now = timezone.now()
+    claimed = UploadSession.objects.using(DB).filter(
+        Q(offset_lock__isnull=True) | Q(locked_until__lte=now), upload_id=upload_id, offset=offset,
+    ).update(offset_lock=token, locked_until=now + timedelta(seconds=settings.RESUMABLE_UPLOAD_LOCK_SECONDS))
+    if claimed:
+        return token
+    current = UploadSession.objects.using(DB).values_list('offset', flat=True).get(upload_id=upload_id)
+    if current != offset:
+        raise OffsetMismatch(current)
+    raise UploadBusy(f"Upload {upload_id} is being written by another request")
+
+
+def _release(upload_id, token, **fields):
+    """Drop our claim, saving `fields`; False if it had lapsed and was taken over."""
+    return bool(UploadSession.objects.using(DB).filter(upload_id=upload_id, offset_lock=token).update(
+        offset_lock=None, locked_until=None, **fields))
+
+
+def create_session(owner, title, filename, length):
+    session = UploadSession(
+        upload_id=secrets.token_hex(16),
+        owner=owner,
+        title=title,
+        filename=filename,
+        length=length,
+        enc_iv=base64.b64encode(os.urandom(12)).decode('utf-8'),
+        expires_at=timezone.now() + timedelta(seconds=settings.RESUMABLE_UPLOAD_TTL_SECONDS),
+    )
+    path = spool_path(session.upload_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.touch()
+    session.save(using=DB, force_insert=True)
+    return session
+
+
+def get_session(upload_id):
+    """The session, or None when unknown or expired."""
+    session = UploadSession.objects.using(DB).filter(upload_id=upload_id).first()
+    if session is None or session.expires_at <= timezone.now():
+        return None
+    return session
+
+
+def _cache_stream(upload_id, stream):
+    with _streams_lock:
+        _streams[upload_id] = stream
+        _streams.move_to_end(upload_id)
+        while len(_streams) > MAX_CACHED_STREAMS:
+            _streams.popitem(last=False)
+
+
+def _forget_stream(upload_id):
+    with _streams_lock:
+        _streams.pop(upload_id, None)
+
+
+def _stream_for(session, key):
+    with _streams_lock:
+        stream = _streams.get(session.upload_id)
+    if stream is not None and stream.offset == session.offset:
+        return stream
+    # Another worker took the earlier chunks (or we restarted): replay the spool
+    iv = base64.b64decode(session.enc_iv)
+    stream = UploadStream(key, iv, wants_tree_hash(session.length))
+    decryptor = Cipher(algorithms.AES(key), modes.GCM(iv)).decryptor()
+    remaining = session.offset
+    with open(spool_path(session.upload_id), 'rb') as f:
+        while remaining:
+            ciphertext = f.read(min(READ_SIZE, remaining))
+            if not ciphertext:
+                raise OSError(f"Spool of upload {session.upload_id} is shorter than its offset")
+            remaining -= len(ciphertext)
+            stream.update(decryptor.update(ciphertext))
+    _cache_stream(session.upload_id, stream)
+    return stream
+
+
+def append(session, offset, read, key):
+    """Encrypt and spool the chunk produced by read(n) at `offset`; returns the new offset.
+
+    Whatever arrived before a dropped connection is kept, so the client can
+    resume from the offset it reads back. Raises OffsetMismatch or UploadBusy.
+    """
+    token = _claim(session.upload_id, offset)
+    session.offset = offset
+    stream = None
+    written = offset  # spool bytes known to be on disk
+    try:
+        stream = _stream_for(session, key)
+        with open(spool_path(session.upload_id), 'r+b') as f:
+            f.seek(offset)
+            f.truncate()
+            while stream.offset < session.length:
+                chunk = read(min(READ_SIZE, session.length - stream.offset))
+                if not chunk:
+                    break
+                f.write(stream.update(chunk))
+                f.flush()
+                written = stream.offset
+    finally:
+        moved = _release(
+            session.upload_id, token,
+            offset=written,
+            expires_at=timezone.now() + timedelta(seconds=settings.RESUMABLE_UPLOAD_TTL_SECONDS),
+        )
+        if not moved or stream is None or stream.offset != written:
+            # Lost our claim, or the stream got ahead of a failed write: rebuild from the spool next time
+            _forget_stream(session.upload_id)
+    if not moved:
+        raise OffsetMismatch(UploadSession.objects.using(DB).get(upload_id=session.upload_id).offset)
+    session.offset = written
+    return session.offset
+
+
+def finish(session, key):
+    """Append the GCM tag to the spool; returns the Document crypto fields and the blob path.
+
+    Safe to repeat if creating the Document fails afterwards. Raises
+    OffsetMismatch or UploadBusy.
+    """
+    token = _claim(session.upload_id, session.length)
+    try:
+        session.offset = session.length
+        tag, fields = _stream_for(session, key).finalize()
+        _forget_stream(session.upload_id)
+        path = spool_path(session.upload_id)
+        with open(path, 'r+b') as f:
+            f.seek(session.length)
+            f.truncate()
+            f.write(tag)
+    finally:
+        _release(session.upload_id, token)
+    fields['enc_iv'] = session.enc_iv
+    return fields, path
+
+
+def discard(session):
+    """Drop the session and its spool."""
+    UploadSession.objects.using(DB).filter(upload_id=session.upload_id).delete()
+    spool_path(session.upload_id).unlink(missing_ok=True)
+    _forget_stream(session.upload_id)
+
+
+def cleanup_expired(now=None):
+    """Remove expired sessions and spool files with no session; returns (sessions, files) removed."""
+    now = now or timezone.now()
+    expired = list(UploadSession.objects.using(DB).filter(expires_at__lte=now))
+    for session in expired:
+        discard(session)
+    files = 0
+    directory = Path(settings.RESUMABLE_UPLOAD_DIR)
+    if directory.is_dir():
+        live = set(UploadSession.objects.using(DB).values_list('upload_id', flat=True))
+        cutoff = now.timestamp() - settings.RESUMABLE_UPLOAD_TTL_SECONDS
+        for path in directory.glob('*.part'):
+            # Leave young files alone: their session may still be committing
+            if path.stem not in live and path.stat().st_mtime < cutoff:
+                path.unlink(missing_ok=True)
+                files += 1
+    return len(expired), files
@@ -0,0 +1,94 @@
+"""Verifier status transitions (APPROVE/REJECT), single or in bulk.
+
+Each transition is a conditional UPDATE of ``status``/``updated_at`` only,
+guarded by the status read at the start of the transaction, so two verifiers
+racing on the same document can't both win and the dashboard counters move
+exactly once. Audit entries, change-log events and counter updates for the
+whole batch are written in the same transaction (one per shard when
+documents are sharded, see ``sharding.py``).
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import stats
+from .audit import log_actions_db
+from .events import record_events
+from .models import Document
+from .sharding import use_shard, shard_for_doc, ShardUnavailable
+
+FINAL_STATUSES = ('APPROVED', 'REJECTED')
+ACTION_STATUS = {'APPROVE': 'APPROVED', 'REJECT': 'REJECTED'}
+
+# Per-id outcomes
+UPDATED = 'updated'
+NOT_FOUND = 'not_found'
+ALREADY_FINAL = 'already_final'
+CONFLICT = 'conflict'
+UNAVAILABLE = 'unavailable'  # institution is being moved between shards
+
+
+def apply_review(doc_ids, action, actor):
+    """Apply `action` to every doc_id; returns {doc_id: (outcome, status)} in request order."""
+    new_status = ACTION_STATUS[action]
+    results = {}
+    by_shard = defaultdict(list)
+    for doc_id in doc_ids:
+        try:
+            by_shard[shard_for_doc(doc_id, for_write=True)].append(doc_id)
+        except ShardUnavailable:
+            results[doc_id] = (UNAVAILABLE, None)
+    for alias, ids in by_shard.items():
+        with use_shard(alias):
+            _review_shard(ids, new_status, actor, alias, results)
+    return {doc_id: results[doc_id] for doc_id in doc_ids}
+
+
+def _review_shard(doc_ids, new_status, actor, using, results):
+    with transaction.atomic(using=using):
+        current = {
+            pk: (status, owner)
+            for pk, status, owner in Document.objects.filter(pk__in=doc_ids).values_list('pk', 'status', 'owner')
+        }
+        groups = defaultdict(list)
+        for doc_id in doc_ids:
+            if doc_id not in current:
+                results[doc_id] = (NOT_FOUND, None)
+            elif current[doc_id][0] in FINAL_STATUSES:
+                results[doc_id] = (ALREADY_FINAL, current[doc_id][0])
+            else:
+                groups[current[doc_id][0]].append(doc_id)
+
+        now = timezone.now()
+        changed = []
+        for old_status, ids in groups.items():
+            # One UPDATE per status we read; if a concurrent review moved any of
+            # them, undo it and settle that group id by id instead
+            savepoint = transaction.savepoint(using=using)
+            count = Document.objects.filter(pk__in=ids, status=old_status).update(status=new_status, updated_at=now)
+            if count == len(ids):
+                transaction.savepoint_commit(savepoint, using=using)
+                changed.extend((doc_id, old_status) for doc_id in ids)
+                continue
+            transaction.savepoint_rollback(savepoint, using=using)
+            for doc_id in ids:
+                status = Document.objects.filter(pk=doc_id).values_list('status', flat=True).first()
+                if status is None:
+                    results[doc_id] = (NOT_FOUND, None)
+                elif status in FINAL_STATUSES:
+                    results[doc_id] = (ALREADY_FINAL, status)
+                elif Document.objects.filter(pk=doc_id, status=status).update(status=new_status, updated_at=now):
+                    changed.append((doc_id, status))
+                else:
+                    results[doc_id] = (CONFLICT, None)
+
+        if changed:
+            docs = [Document(doc_id=doc_id, owner=current[doc_id][1], status=new_status) for doc_id, _ in changed]
+            log_actions_db(docs, 'STATUS_CHANGE', actor)
+            record_events(docs, 'STATUS_CHANGE')
+            stats.record_status_changes(
+                [(current[doc_id][1], old_status, new_status) for doc_id, old_status in changed]
+            )
+            for doc_id, _ in changed:
+                results[doc_id] = (UPDATED, new_status)
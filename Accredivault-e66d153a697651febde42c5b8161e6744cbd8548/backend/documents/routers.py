@@ -0,0 +1,86 @@
+import random
+import contextvars
+from django.conf import settings
+
+# Set for the rest of the request once a write happens (or the client still
+# carries the read-your-writes cookie), so reads never see a lagging replica.
+_pinned_to_primary = contextvars.ContextVar('documents_pinned_to_primary', default=False)
+# The current request's WriteTracker while ReplicaPinningMiddleware runs it
+_write_tracker = contextvars.ContextVar('documents_write_tracker', default=None)
+
+
+class WriteTracker:
+    """Whether the router sent a write to the primary during one request.
+
+    A mutable object rather than a flag in the contextvar, so a write made in a
+    copied context (sync_to_async) is still seen by the middleware.
+    """
+
+    wrote = False
+
+
+def set_primary_pin(pinned=True):
+    """Route following reads in this context to the primary (or not); returns a reset token."""
+    return _pinned_to_primary.set(pinned)
+
+
+def reset_primary_pin(token):
+    """Restore the pinning state saved by set_primary_pin()."""
+    _pinned_to_primary.reset(token)
+
+
+def is_pinned_to_primary():
+    return _pinned_to_primary.get()
+
+
+def track_writes():
+    """Start recording writes in this context; returns (tracker, reset token)."""
+    tracker = WriteTracker()
+    return tracker, _write_tracker.set(tracker)
+
+
+def stop_tracking_writes(token):
+    _write_tracker.reset(token)
+
+
+def replica_ok(view):
+    """Mark a POST view that only reads, so it may be served from a replica.
+
+    Put it outermost. ReplicaPinningMiddleware otherwise pins every unsafe
+    request to the primary.
+    """
+    view.replica_ok = True
+    return view
+
+
+class ReplicaRouter:
+    """Send reads to a random replica alias and writes to the primary."""
+
+    primary = 'default'
+
+    def _replicas(self):
+        return getattr(settings, 'DATABASE_REPLICAS', [])
+
+    def db_for_read(self, model, **hints):
+        replicas = self._replicas()
+        if not replicas or is_pinned_to_primary():
+            return self.primary
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        set_primary_pin()
+        tracker = _write_tracker.get()
+        if tracker is not None:
+            tracker.wrote = True
+        return self.primary
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {self.primary, *self._replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary, never from migrate
+        return db not in self._replicas()
@@ -0,0 +1,165 @@
+"""Integrity scrubbing of stored ciphertexts (``manage.py scrub_storage``).
+
+Walks documents in primary-key order (shard by shard), reads each blob back from storage,
+decrypts it and compares the plaintext SHA-256 with ``Document.file_hash``.
+Reads and crypto run on a thread pool (both release the GIL) under a shared
+bytes-per-second cap so a pass doesn't starve live traffic of disk or S3
+bandwidth. Progress is checkpointed after every batch so an interrupted or
+time-boxed run picks up where it stopped. Each document's outcome lands in
+``last_verified_at``/``last_verify_result``; failures go out through the
+usual admin notification email.
+"""
+import base64
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from django.utils import timezone
+
+from .compression import decompress
+from .email_utils import notify_admin_document_verification_failed
+from .models import Document
+from .sharding import use_shard, shards
+from .treehash import tree_hash
+
+logger = logging.getLogger('documents')
+
+OK = 'OK'
+CORRUPT = 'CORRUPT'
+MISSING = 'MISSING'
+
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+class BandwidthLimiter:
+    """Byte-rate cap shared by all worker threads (0 disables it)."""
+
+    def __init__(self, bytes_per_sec):
+        self.rate = bytes_per_sec
+        self.lock = threading.Lock()
+        self.next_free = time.monotonic()
+
+    def acquire(self, nbytes):
+        if not self.rate:
+            return
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_free)
+            self.next_free = start + nbytes / self.rate
+        if start > now:
+            time.sleep(start - now)
+
+
+class Checkpoint:
+    """Progress of the current pass, persisted as JSON between runs."""
+
+    def __init__(self, path):
+        self.path = str(path)
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, state):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp, self.path)
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def check_document(document, key, limiter):
+    """(result, detail, bytes read) for one stored blob."""
+    try:
+        chunks = []
+        with document.file.storage.open(document.file.name, 'rb') as f:
+            for chunk in iter(lambda: f.read(READ_CHUNK_SIZE), b''):
+                limiter.acquire(len(chunk))
+                chunks.append(chunk)
+    except (FileNotFoundError, OSError) as e:
+        return MISSING, f"stored file unreadable: {e}", 0
+    ciphertext = b''.join(chunks)
+
+    if document.enc_iv:
+        try:
+            plaintext = AESGCM(key).decrypt(base64.b64decode(document.enc_iv), ciphertext, None)
+        except (InvalidTag, ValueError):
+            return CORRUPT, f"ciphertext failed authentication ({len(ciphertext)} bytes)", len(ciphertext)
+        try:
+            plaintext = decompress(document.compression, plaintext)
+        except Exception as e:
+            return CORRUPT, f"decrypted blob failed to decompress ({document.compression}): {e}", len(ciphertext)
+    else:
+        plaintext = ciphertext
+    if document.tree_hash:
+        if tree_hash(plaintext) != document.tree_hash:
+            return CORRUPT, f"decrypted file does not match stored {document.tree_hash_alg}", len(ciphertext)
+    elif document.file_hash and hashlib.sha256(plaintext).hexdigest() != document.file_hash:
+        return CORRUPT, "decrypted file does not match stored SHA-256", len(ciphertext)
+    return OK, '', len(ciphertext)
+
+
+def new_state():
+    return {'started_at': timezone.now().isoformat(), 'shard': shards()[0], 'last_doc_id': '',
+            'checked': 0, 'bytes': 0, CORRUPT: 0, MISSING: 0}
+
+
+def scrub(key, checkpoint, workers=4, bytes_per_sec=0, batch_size=100, deadline=None, notify=True):
+    """Run (or resume) a pass; returns (state, finished). Stops early once `deadline` (monotonic) passes."""
+    state = checkpoint.load() or new_state()
+    aliases = shards()
+    state.setdefault('shard', aliases[0])
+    start = aliases.index(state['shard']) if state['shard'] in aliases else 0
+    limiter = BandwidthLimiter(bytes_per_sec)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for alias in aliases[start:]:
+            if alias != state['shard']:
+                state['shard'], state['last_doc_id'] = alias, ''
+            with use_shard(alias):
+                while True:
+                    batch = list(
+                        Document.objects.filter(pk__gt=state['last_doc_id']).order_by('pk')
+                        .only('doc_id', 'file', 'enc_iv', 'file_hash', 'tree_hash', 'tree_hash_alg', 'compression')[:batch_size]
+                    )
+                    if not batch:
+                        break
+                    _check_batch(batch, key, limiter, pool, state, notify)
+                    checkpoint.save(state)
+                    if deadline is not None and time.monotonic() >= deadline:
+                        return state, False
+    checkpoint.clear()
+    return state, True
+
+
+def _check_batch(batch, key, limiter, pool, state, notify):
+    outcomes = list(pool.map(lambda d: check_document(d, key, limiter), batch))
+    now = timezone.now()
+    by_result = {}
+    for document, (result, detail, nbytes) in zip(batch, outcomes):
+        state['bytes'] += nbytes
+        by_result.setdefault(result, []).append(document.doc_id)
+        if result != OK:
+            state[result] += 1
+            logger.error("Scrub %s: %s %s", result, document.doc_id, detail)
+            if notify:
+                notify_admin_document_verification_failed(document.doc_id, f"Storage scrub: {detail}")
+    # queryset.update() leaves updated_at alone, so scrubbing doesn't show up in delta sync
+    for result, doc_ids in by_result.items():
+        Document.objects.filter(pk__in=doc_ids).update(last_verified_at=now, last_verify_result=result)
+
+    state['checked'] += len(batch)
+    state['last_doc_id'] = batch[-1].doc_id
@@ -0,0 +1,151 @@
+"""Full-text search over document titles and owners.
+
+SQLite: an FTS5 table (``documents_document_fts``) kept in sync by triggers on
+``documents_document`` inserts, title/owner updates and deletes, so every
+write path (save(), bulk_create, queryset.update, raw SQL) updates the index in
+the same transaction. FTS rows share the document row's rowid; VACUUM may
+renumber those, so run ``manage.py rebuild_search_index`` after one.
+Migrations that make SQLite rebuild ``documents_document`` (most field
+changes) drop the triggers; a ``post_migrate`` handler
+(``restore_missing_triggers``) re-creates them and refills the index after
+every ``migrate``, so migrations need no search-specific steps.
+PostgreSQL: a GIN expression index over
+``to_tsvector('simple', title || ' ' || owner)`` that the database maintains
+itself. Other backends fall back to ``icontains`` filtering.
+
+Every whitespace/punctuation separated term in the query must match, each as
+a prefix; results are ordered by relevance (bm25 / ts_rank).
+"""
+import logging
+import re
+
+from django.db import connections, router, transaction
+from django.db.models import Q
+
+from .models import Document
+
+logger = logging.getLogger('documents')
+
+FTS_TABLE = 'documents_document_fts'
+PG_INDEX = 'documents_document_search_idx'
+PG_VECTOR = "to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(owner, ''))"
+MAX_TERMS = 8
+TRIGGER_NAMES = ['documents_document_fts_insert', 'documents_document_fts_update', 'documents_document_fts_delete']
+
+SQLITE_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS documents_document_fts_insert AFTER INSERT ON documents_document BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, doc_id, title, owner) VALUES (new.rowid, new.doc_id, new.title, new.owner);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS documents_document_fts_update AFTER UPDATE OF title, owner ON documents_document BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.rowid;
+        INSERT INTO {FTS_TABLE} (rowid, doc_id, title, owner) VALUES (new.rowid, new.doc_id, new.title, new.owner);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS documents_document_fts_delete AFTER DELETE ON documents_document BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.rowid;
+    END""",
+]
+
+
+def query_terms(q):
+    return re.findall(r'\w+', q or '', flags=re.UNICODE)[:MAX_TERMS]
+
+
+def create_index(schema_editor):
+    """Create the backend's search structure and fill it (called from the migration)."""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            "doc_id UNINDEXED, title, owner, tokenize='unicode61', prefix='2 3')"
+        )
+        for trigger in SQLITE_TRIGGERS:
+            schema_editor.execute(trigger)
+        rebuild_index(schema_editor.connection.alias)
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {PG_INDEX} ON documents_document USING GIN ({PG_VECTOR})"
+        )
+
+
+def drop_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for name in TRIGGER_NAMES:
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif vendor == 'postgresql':
+        schema_editor.execute(f"DROP INDEX IF EXISTS {PG_INDEX}")
+
+
+def restore_missing_triggers(sender=None, using='default', **kwargs):
+    """post_migrate handler: re-create SQLite search triggers a table rebuild dropped.
+
+    Does nothing while the index itself is absent (before 0003 or after
+    rolling it back). Otherwise the index is refilled, since rows written
+    without the triggers are missing from it.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite' or not router.allow_migrate_model(using, Document):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE name IN (%s, %s, %s, %s)", [FTS_TABLE, *TRIGGER_NAMES]
+        )
+        present = {row[0] for row in cursor.fetchall()}
+    missing = [name for name in TRIGGER_NAMES if name not in present]
+    if FTS_TABLE not in present or not missing:
+        return
+    logger.info("Search triggers missing on %s (%s); re-creating them and refilling the index", using, ', '.join(missing))
+    with transaction.atomic(using=using):
+        with connection.cursor() as cursor:
+            for trigger in SQLITE_TRIGGERS:
+                cursor.execute(trigger)
+        rebuild_index(using)
+
+
+def rebuild_index(using='default'):
+    """Re-create every SQLite search entry from the Document table; returns the row count."""
+    conn = connections[using]
+    if conn.vendor != 'sqlite':
+        return 0
+    with conn.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, doc_id, title, owner) "
+            "SELECT rowid, doc_id, title, owner FROM documents_document"
+        )
+        return cursor.rowcount
+
+
+def search_doc_ids(q, limit, offset=0):
+    """Ranked doc_ids matching every term of `q` as a prefix."""
+    terms = query_terms(q)
+    if not terms:
+        return []
+    using = router.db_for_read(Document)
+    vendor = connections[using].vendor
+    if vendor == 'sqlite':
+        # Quote each term so FTS5 operators in user input are taken literally
+        match = ' '.join('"{}"*'.format(t.replace('"', '""')) for t in terms)
+        sql = (
+            f"SELECT doc_id FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+            f"ORDER BY bm25({FTS_TABLE}, 0.0, 10.0, 2.0) LIMIT %s OFFSET %s"
+        )
+        params = ['{title owner}: (' + match + ')', limit, offset]
+    elif vendor == 'postgresql':
+        tsquery = ' & '.join(f"{t}:*" for t in terms)
+        sql = (
+            f"SELECT doc_id FROM documents_document WHERE {PG_VECTOR} @@ to_tsquery('simple', %s) "
+            f"ORDER BY ts_rank({PG_VECTOR}, to_tsquery('simple', %s)) DESC LIMIT %s OFFSET %s"
+        )
+        params = [tsquery, tsquery, limit, offset]
+    else:
+        condition = Q()
+        for term in terms:
+            condition &= Q(title__icontains=term) | Q(owner__icontains=term)
+        documents = Document.objects.using(using).filter(condition)
+        return list(documents.values_list('doc_id', flat=True)[offset:offset + limit])
+
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework import serializers
 from .models import Document, AuditLog
 
@@ -97,6 +98,42 @@ class StatusUpdateSerializer(serializers.Serializer):
             raise serializers.ValidationError("Action must be either 'APPROVE' or 'REJECT'")
         return value
 
+class BulkReviewSerializer(serializers.Serializer):
+    """APPROVE/REJECT applied to many documents at once"""
+    ACTION_CHOICES = [('APPROVE', 'Approve'), ('REJECT', 'Reject')]
+    doc_ids = serializers.ListField(
+        child=serializers.CharField(max_length=50),
+        min_length=1,
+        max_length=500
+    )
+    action = serializers.ChoiceField(choices=ACTION_CHOICES, required=True)
+    
+    def validate_doc_ids(self, value):
+        # Drop duplicates, keeping request order for the per-id results
+        return list(dict.fromkeys(value))
+
+class UploadSessionSerializer(serializers.Serializer):
+    """Start of a resumable upload: the file's name and total size"""
+    title = serializers.CharField(max_length=200, required=True)
+    filename = serializers.CharField(max_length=100, required=True)
+    length = serializers.IntegerField(min_value=1)
+    
+    def validate_title(self, value):
+        if len(value.strip()) < 3:
+            raise serializers.ValidationError("Title must be at least 3 characters long")
+        return value.strip()
+    
+    def validate_filename(self, value):
+        if not value.lower().endswith('.pdf'):
+            raise serializers.ValidationError("Only PDF files are allowed")
+        return value
+    
+    def validate_length(self, value):
+        if value > settings.RESUMABLE_UPLOAD_MAX_BYTES:
+            raise serializers.ValidationError(
+                f"File size cannot exceed {settings.RESUMABLE_UPLOAD_MAX_BYTES // (1024 * 1024)}MB")
+        return value
+
 class DocumentListSerializer(serializers.ModelSerializer):
     """Lightweight serializer for document lists"""
     ai = serializers.SerializerMethodField()
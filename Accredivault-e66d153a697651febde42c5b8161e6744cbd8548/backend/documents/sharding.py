@@ -0,0 +1,366 @@
+"""Per-institution sharding of document data across database aliases.
+
+With ``DB_SHARD_PATHS`` set, every institution (``Document.owner``) lives on
+exactly one alias of ``DOCUMENT_SHARDS`` ('default' first). Documents and
+everything written alongside them (audit logs, counters, change-log events,
+tombstones) go to the owner's shard, so uploads and reviews keep their
+single-database transactions. Auth, admin and the shard directory stay on
+'default'.
+
+Code picks a shard with ``use_shard(alias)``; ``ShardRouter`` sends the
+sharded models to the current shard, like the replica pinning in
+``routers.py``. The directory lives on 'default': ``InstitutionShard`` maps
+each owner to its shard and ``DocumentLocation`` maps each doc_id to its
+owner. A doc_id lookup is one primary-key read on 'default' (cached) plus a
+query on one shard, with no fan-out. Queries without an owner
+(``scatter_page``) run on every shard and merge the results.
+
+New documents are saved inside ``document_transaction(shard)``: the directory
+rows commit on 'default' just before the shard transaction does, and are
+deleted again if the shard commit fails. A directory row whose document is
+missing only makes that doc_id read as not found; the reverse would send the
+lookup to the wrong database.
+
+``ShardRouter`` comes before ``ReplicaRouter`` and answers for every sharded
+model, so with sharding on, document reads always go to the owner's shard and
+never to a read replica (replicas only mirror 'default').
+
+When enabling sharding on an existing database, run
+``manage.py rebalance_shards --index`` first so the directory knows about the
+institutions and documents already on 'default'. After that,
+``rebalance_shards`` moves institutions between shards.
+"""
+import contextvars
+import heapq
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from itertools import islice
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count
+
+from .models import AuditLog, Document, DocumentTombstone, InstitutionShard, DocumentLocation
+
+# Model names (lowercase) stored on the owner's shard / only on 'default'
+SHARDED_MODELS = {'document', 'auditlog', 'documentcounter', 'documentevent', 'documenttombstone'}
+DIRECTORY_MODELS = {'institutionshard', 'documentlocation'}
+
+DOC_CACHE_SIZE = 100000
+
+_current_shard = contextvars.ContextVar('documents_current_shard', default=None)
+# doc_ids registered in the enclosing document_transaction()
+_registered = contextvars.ContextVar('documents_registered_doc_ids', default=None)
+
+_cache_lock = threading.Lock()
+_owner_cache = {}  # owner -> (alias, moving, expires at)
+_doc_owner_cache = {}  # doc_id -> owner (never changes)
+
+
+class ShardUnavailable(Exception):
+    """The institution is being moved between shards; writes should be retried shortly."""
+
+
+def shards():
+    return list(getattr(settings, 'DOCUMENT_SHARDS', ['default']))
+
+
+def is_sharded():
+    return len(shards()) > 1
+
+
+def current_shard():
+    return _current_shard.get() or 'default'
+
+
+@contextmanager
+def use_shard(alias):
+    """Route the sharded models to `alias` for the duration of the block."""
+    token = _current_shard.set(alias)
+    try:
+        yield alias
+    finally:
+        _current_shard.reset(token)
+
+
+class ShardRouter:
+    """Send the sharded models to the current shard and the directory to 'default'."""
+
+    def db_for_read(self, model, **hints):
+        name = model._meta.model_name
+        if name in SHARDED_MODELS:
+            instance = hints.get('instance')
+            if instance is not None and instance._state.db:
+                return instance._state.db
+            return current_shard()
+        if name in DIRECTORY_MODELS:
+            return 'default'
+        return None
+
+    db_for_write = db_for_read
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == 'default' or db not in shards():
+            return None
+        # Shards only carry the document tables (and the documents app's RunPython steps)
+        return app_label == 'documents' and model_name not in DIRECTORY_MODELS
+
+
+def _hashed_shard(owner):
+    aliases = shards()
+    return aliases[zlib.crc32(owner.encode()) % len(aliases)]
+
+
+def forget_owner(owner):
+    with _cache_lock:
+        _owner_cache.pop(owner, None)
+
+
+def shard_for_owner(owner, for_write=False):
+    """Alias holding `owner`'s documents; a write places an unseen owner for good.
+
+    Raises ShardUnavailable for writes while the owner is being moved.
+    """
+    if not is_sharded():
+        return 'default'
+    now = time.monotonic()
+    cached = _owner_cache.get(owner)
+    if cached and cached[2] > now:
+        alias, moving = cached[0], cached[1]
+    else:
+        row = InstitutionShard.objects.filter(owner=owner).values_list('shard', 'moving').first()
+        if row is None:
+            if not for_write:
+                # Nothing stored yet; don't fill the directory from reads
+                return _hashed_shard(owner)
+            placement, _ = InstitutionShard.objects.get_or_create(owner=owner, defaults={'shard': _hashed_shard(owner)})
+            row = (placement.shard, placement.moving)
+        alias, moving = row
+        with _cache_lock:
+            _owner_cache[owner] = (alias, moving, now + settings.SHARD_DIRECTORY_CACHE_SECONDS)
+    if for_write and moving:
+        raise ShardUnavailable(f"Institution {owner} is being moved between shards; retry shortly")
+    return alias
+
+
+def owner_of(doc_id):
+    """Owner recorded for `doc_id` in the directory, or None."""
+    owner = _doc_owner_cache.get(doc_id)
+    if owner is None:
+        owner = DocumentLocation.objects.filter(doc_id=doc_id).values_list('owner', flat=True).first()
+        if owner is not None:
+            with _cache_lock:
+                if len(_doc_owner_cache) >= DOC_CACHE_SIZE:
+                    _doc_owner_cache.clear()
+                _doc_owner_cache[doc_id] = owner
+    return owner
+
+
+def shard_for_doc(doc_id, for_write=False):
+    """Alias holding `doc_id`; documents missing from the directory are looked up on 'default'."""
+    if not is_sharded():
+        return 'default'
+    owner = owner_of(doc_id)
+    if owner is None:
+        return 'default'
+    return shard_for_owner(owner, for_write)
+
+
+@contextmanager
+def document_transaction(shard):
+    """Atomic block on `shard` for saving new documents and their directory rows.
+
+    Call register_document() inside it. Off 'default', the directory rows are
+    written in a 'default' transaction that commits right before the shard's,
+    and removed again if the shard commit fails.
+    """
+    if shard == 'default' or not is_sharded():
+        with use_shard(shard), transaction.atomic(using=shard):
+            yield
+        return
+    registered = []
+    token = _registered.set(registered)
+    try:
+        with use_shard(shard):
+            with transaction.atomic(using=shard):
+                with transaction.atomic(using='default'):
+                    yield
+    except Exception:
+        if registered:
+            DocumentLocation.objects.filter(doc_id__in=registered).delete()
+        raise
+    finally:
+        _registered.reset(token)
+
+
+def register_document(document):
+    """Record a new document in the directory; call right after saving it, inside document_transaction()."""
+    if is_sharded():
+        DocumentLocation.objects.create(doc_id=document.doc_id, owner=document.owner)
+        registered = _registered.get()
+        if registered is not None:
+            registered.append(document.doc_id)
+
+
+def scatter(fn):
+    """[fn() run with each shard as the current one]."""
+    results = []
+    for alias in shards():
+        with use_shard(alias):
+            results.append(fn())
+    return results
+
+
+def scatter_page(make_queryset, page, page_size, key):
+    """One page of make_queryset() across all shards, merged by `key` (descending).
+
+    Returns (objects, pages, total). Each shard reads at most page * page_size
+    rows, so deep pages of an unfiltered listing get slower.
+    """
+    total = sum(scatter(lambda: make_queryset().count()))
+    pages = max(1, -(-total // page_size))
+    page = min(max(page, 1), pages)
+    end = page * page_size
+    per_shard = scatter(lambda: list(make_queryset()[:end]))
+    merged = heapq.merge(*per_shard, key=key, reverse=True)
+    return list(islice(merged, end - page_size, end)), pages, total
+
+
+# Rebalancing (manage.py rebalance_shards)
+
+def index_directory(batch_size=1000):
+    """Record every owner and document already stored on the shards.
+
+    Returns ({alias: documents indexed}, [owners found on more than one shard]).
+    """
+    indexed, conflicts = {}, []
+    for alias in shards():
+        documents = Document.objects.using(alias)
+        for owner in documents.order_by().values_list('owner', flat=True).distinct():
+            placement, _ = InstitutionShard.objects.get_or_create(owner=owner, defaults={'shard': alias})
+            if placement.shard != alias:
+                conflicts.append(owner)
+        rows = documents.order_by().values_list('doc_id', 'owner').iterator(chunk_size=batch_size)
+        count = 0
+        while True:
+            batch = [DocumentLocation(doc_id=doc_id, owner=owner) for doc_id, owner in islice(rows, batch_size)]
+            if not batch:
+                break
+            DocumentLocation.objects.bulk_create(batch, ignore_conflicts=True)
+            count += len(batch)
+        indexed[alias] = count
+    return indexed, conflicts
+
+
+def shard_loads():
+    """{alias: {owner: document count}}."""
+    return {
+        alias: dict(Document.objects.using(alias).order_by().values_list('owner').annotate(n=Count('pk')))
+        for alias in shards()
+    }
+
+
+def plan_moves(loads):
+    """Greedy [(owner, source, target)] that evens out document counts across shards."""
+    totals = {alias: sum(owners.values()) for alias, owners in loads.items()}
+    placement = {alias: dict(owners) for alias, owners in loads.items()}
+    moves = []
+    for _ in range(sum(len(owners) for owners in loads.values())):
+        heaviest = max(totals, key=totals.get)
+        lightest = min(totals, key=totals.get)
+        gap = totals[heaviest] - totals[lightest]
+        # Moving an owner smaller than the gap always narrows it; take the largest such owner
+        candidates = [(n, owner) for owner, n in placement[heaviest].items() if 0 < n < gap]
+        if not candidates:
+            break
+        n, owner = max(candidates)
+        moves.append((owner, heaviest, lightest))
+        del placement[heaviest][owner]
+        placement[lightest][owner] = n
+        totals[heaviest] -= n
+        totals[lightest] += n
+    return moves
+
+
+def _wait_for_caches():
+    # Every process re-reads the directory within this long
+    time.sleep(settings.SHARD_DIRECTORY_CACHE_SECONDS)
+
+
+def _copy_rows(model, queryset, target, keep_pk=True, batch_size=500):
+    """INSERT queryset's rows into `target` as stored (bypasses auto_now and signals)."""
+    connection = connections[target]
+    fields = [f for f in model._meta.concrete_fields if keep_pk or not f.primary_key]
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        connection.ops.quote_name(model._meta.db_table),
+        ', '.join(connection.ops.quote_name(f.column) for f in fields),
+        ', '.join(['%s'] * len(fields)),
+    )
+    rows = queryset.iterator(chunk_size=batch_size)
+    copied = 0
+    with connection.cursor() as cursor:
+        while True:
+            batch = [[f.get_db_prep_save(getattr(obj, f.attname), connection) for f in fields]
+                     for obj in islice(rows, batch_size)]
+            if not batch:
+                return copied
+            cursor.executemany(sql, batch)
+            copied += len(batch)
+
+
+def _delete_owner_rows(owner, alias):
+    """Remove `owner`'s documents, audit logs and tombstones from `alias` without leaving tombstones."""
+    connection = connections[alias]
+    qn = connection.ops.quote_name
+    documents, logs, tombstones = (qn(m._meta.db_table) for m in (Document, AuditLog, DocumentTombstone))
+    with transaction.atomic(using=alias), connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {logs} WHERE {qn('doc_id')} IN (SELECT {qn('doc_id')} FROM {documents} WHERE {qn('owner')} = %s)",
+            [owner],
+        )
+        cursor.execute(f"DELETE FROM {documents} WHERE {qn('owner')} = %s", [owner])
+        cursor.execute(f"DELETE FROM {tombstones} WHERE {qn('owner')} = %s", [owner])
+
+
+def move_institution(owner, target, wait=True):
+    """Move `owner`'s documents, audit logs and tombstones to `target`; returns documents moved.
+
+    The owner is write-locked (uploads and reviews get ShardUnavailable) from
+    before the copy until the directory points at `target`; reads keep being
+    served from the source until then. Change-log events stay where they
+    were written. Counters on both shards are rebuilt at the end.
+    """
+    from . import stats
+
+    if target not in shards():
+        raise ValueError(f"Unknown shard {target!r}")
+    forget_owner(owner)
+    source = shard_for_owner(owner)
+    if source == target:
+        return 0
+    InstitutionShard.objects.update_or_create(owner=owner, defaults={'shard': source, 'moving': True})
+    try:
+        if wait:
+            _wait_for_caches()
+        with transaction.atomic(using=target):
+            # Leftovers of an interrupted move
+            _delete_owner_rows(owner, target)
+            moved = _copy_rows(Document, Document.objects.using(source).filter(owner=owner), target)
+            _copy_rows(AuditLog, AuditLog.objects.using(source).filter(doc__owner=owner), target, keep_pk=False)
+            _copy_rows(DocumentTombstone, DocumentTombstone.objects.using(source).filter(owner=owner), target,
+                       keep_pk=False)
+        InstitutionShard.objects.filter(owner=owner).update(shard=target, moving=False)
+    except Exception:
+        InstitutionShard.objects.filter(owner=owner).update(moving=False)
+        raise
+    finally:
+        forget_owner(owner)
+    if wait:
+        # Let readers with a cached placement finish on the source before it is emptied
+        _wait_for_caches()
+    _delete_owner_rows(owner, source)
+    stats.rebuild(using=source)
+    stats.rebuild(using=target)
+    return moved
@@ -0,0 +1,18 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import bloom
+from .models import Document, DocumentTombstone
+
+
+@receiver(post_delete, sender=Document)
+def leave_tombstone(sender, instance, using, **kwargs):
+    """Record deletions (admin, shell, queryset.delete()) for delta-sync clients"""
+    DocumentTombstone.objects.using(using).create(doc_id=instance.doc_id, owner=instance.owner)
+
+
+@receiver(post_save, sender=Document)
+def remember_doc_id(sender, instance, created, **kwargs):
+    """Let this process's verify filter know about the new doc_id right away"""
+    if created:
+        bloom.add(instance.doc_id)
@@ -0,0 +1,94 @@
+"""Ed25519-signed document manifests that verify offline.
+
+A manifest is signed over its canonical JSON form (sorted keys, no
+whitespace, UTF-8) without the ``signature`` field, and names the signing key
+in ``key_id``. Anyone holding the PDF, the manifest and our public keys
+(``GET /api/keys/``) can check it with ``verifier/accredivault_verify.py``,
+no API call needed.
+
+Keys come from settings: ``MANIFEST_SIGNING_KEYS`` holds ``kid:base64-seed``
+pairs (``manage.py generate_signing_key`` makes one) and
+``MANIFEST_ACTIVE_KEY_ID`` picks the one that signs. To roll over, add a new
+key, make it active, and later move the old key's public half to
+``MANIFEST_RETIRED_PUBLIC_KEYS`` (``kid:base64-public``) so manifests it signed
+keep verifying after its seed is destroyed.
+"""
+import base64
+import json
+from functools import lru_cache
+
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
+from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+from django.conf import settings
+
+SIGNATURE_ALG = 'Ed25519'
+MANIFEST_VERSION = 1
+
+
+def b64url(data):
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def _pairs(value):
+    for item in (value or '').split(','):
+        if item.strip():
+            kid, _, encoded = item.strip().partition(':')
+            yield kid, base64.b64decode(encoded + '=' * (-len(encoded) % 4), altchars=b'-_')
+
+
+@lru_cache(maxsize=1)
+def load_keys():
+    """({kid: private key}, {kid: public key}, active kid or None) from settings."""
+    private = {kid: Ed25519PrivateKey.from_private_bytes(seed)
+               for kid, seed in _pairs(getattr(settings, 'MANIFEST_SIGNING_KEYS', ''))}
+    public = {kid: key.public_key() for kid, key in private.items()}
+    for kid, raw in _pairs(getattr(settings, 'MANIFEST_RETIRED_PUBLIC_KEYS', '')):
+        public.setdefault(kid, Ed25519PublicKey.from_public_bytes(raw))
+    active = getattr(settings, 'MANIFEST_ACTIVE_KEY_ID', '') or next(iter(private), None)
+    if active and active not in private:
+        raise ValueError(f"MANIFEST_ACTIVE_KEY_ID {active!r} has no private key in MANIFEST_SIGNING_KEYS")
+    return private, public, active
+
+
+def canonical_bytes(manifest):
+    unsigned = {k: v for k, v in manifest.items() if k != 'signature'}
+    return json.dumps(unsigned, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def build_manifest(document):
+    """Manifest for a stored document, signed with the active key when one is configured."""
+    manifest = {
+        'v': MANIFEST_VERSION,
+        'doc_id': document.doc_id,
+        'title': document.title,
+        'owner': document.owner,
+        'file_hash': document.file_hash,
+        'hash_algorithm': 'SHA-256',
+        'algorithm': document.enc_alg,
+        'issued_at': document.created_at.isoformat(),
+    }
+    private, _, active = load_keys()
+    if active:
+        manifest['key_id'] = active
+        manifest['signature_alg'] = SIGNATURE_ALG
+        manifest['signature'] = b64url(private[active].sign(canonical_bytes(manifest)))
+    return manifest
+
+
+def public_jwks():
+    """Published verification keys as a JWK set (RFC 8037 OKP keys)."""
+    _, public, active = load_keys()
+    return {
+        'active': active,
+        'keys': [
+            {
+                'kty': 'OKP',
+                'crv': 'Ed25519',
+                'alg': 'EdDSA',
+                'use': 'sig',
+                'kid': kid,
+                'x': b64url(key.public_bytes(Encoding.Raw, PublicFormat.Raw)),
+            }
+            for kid, key in public.items()
+        ],
+    }
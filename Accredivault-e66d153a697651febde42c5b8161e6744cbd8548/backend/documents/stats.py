@@ -0,0 +1,149 @@
+"""Incrementally maintained document counts for the dashboard.
+
+Every upload and status transition bumps rows of ``DocumentCounter`` with
+``F()`` increments inside the same transaction as the document write, so
+``/api/stats/`` reads a handful of rows instead of aggregating the Document
+table. Writes that bypass these helpers (admin deletes, raw SQL, shell
+fixes) make the counters drift; ``manage.py rebuild_stats`` recomputes them.
+With sharding each shard counts its own documents and ``snapshot`` adds
+them up.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.db import IntegrityError, router, transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Document, DocumentCounter
+from .sharding import use_shard, shard_for_owner, shards
+
+STATUSES = [choice[0] for choice in Document.STATUS_CHOICES]
+
+
+def owner_status_key(owner, status):
+    # Statuses never contain '|', so the key stays unambiguous for any owner
+    return f"{owner}|{status}"
+
+
+def day_key(created_at):
+    return timezone.localdate(created_at).isoformat()
+
+
+def _bump(scope, key, delta, using):
+    counters = DocumentCounter.objects.using(using).filter(scope=scope, key=key)
+    if counters.update(count=F('count') + delta):
+        return
+    try:
+        # Savepoint so a concurrent creator's IntegrityError doesn't poison the caller's transaction
+        with transaction.atomic(using=using):
+            DocumentCounter.objects.using(using).create(scope=scope, key=key, count=delta)
+    except IntegrityError:
+        counters.update(count=F('count') + delta)
+
+
+def record_upload(document):
+    """Count a newly created document; call inside the transaction that saved it."""
+    using = router.db_for_write(DocumentCounter)
+    _bump('total', 'all', 1, using)
+    _bump('status', document.status, 1, using)
+    _bump('owner', document.owner, 1, using)
+    _bump('owner_status', owner_status_key(document.owner, document.status), 1, using)
+    _bump('day', day_key(document.created_at), 1, using)
+
+
+def record_status_change(document, old_status):
+    """Move a document between status counters; call inside the transaction that changed it."""
+    record_status_changes([(document.owner, old_status, document.status)])
+
+
+def record_status_changes(changes):
+    """Apply many (owner, old_status, new_status) transitions with one UPDATE per touched counter."""
+    deltas = Counter()
+    for owner, old_status, new_status in changes:
+        if old_status == new_status:
+            continue
+        deltas['status', old_status] -= 1
+        deltas['status', new_status] += 1
+        deltas['owner_status', owner_status_key(owner, old_status)] -= 1
+        deltas['owner_status', owner_status_key(owner, new_status)] += 1
+    using = router.db_for_write(DocumentCounter)
+    for (scope, key), delta in sorted(deltas.items()):
+        if delta:
+            _bump(scope, key, delta, using)
+
+
+def snapshot(owner=None, days=30):
+    """Dashboard figures from the counter table; scoped to one owner when given."""
+    if owner:
+        condition = Q(scope='owner_status', key__in=[owner_status_key(owner, s) for s in STATUSES])
+    else:
+        since = (timezone.localdate() - timedelta(days=days - 1)).isoformat()
+        condition = Q(scope__in=['total', 'status', 'owner']) | Q(scope='day', key__gte=since)
+
+    by_status = dict.fromkeys(STATUSES, 0)
+    by_owner, by_day = {}, {}
+    total = 0
+    rows = []
+    for alias in ([shard_for_owner(owner)] if owner else shards()):
+        with use_shard(alias):
+            rows.extend(DocumentCounter.objects.filter(condition).values_list('scope', 'key', 'count'))
+    for scope, key, count in rows:
+        if scope == 'total':
+            total += count
+        elif scope == 'status':
+            by_status[key] = by_status.get(key, 0) + count
+        elif scope == 'owner_status':
+            status = key.rsplit('|', 1)[1]
+            by_status[status] = by_status.get(status, 0) + count
+        elif scope == 'owner':
+            by_owner[key] = by_owner.get(key, 0) + count
+        elif scope == 'day':
+            by_day[key] = by_day.get(key, 0) + count
+
+    result = {'by_status': by_status}
+    if owner:
+        result.update(owner=owner, total=sum(by_status.values()))
+    else:
+        result.update(total=total, by_owner=by_owner, by_day=dict(sorted(by_day.items())))
+    return result
+
+
+def expected_counts(using='default'):
+    """Recompute every counter from the Document table."""
+    documents = Document.objects.using(using).order_by()
+    expected = Counter()
+    for status, owner, n in documents.values_list('status', 'owner').annotate(n=Count('pk')):
+        expected['total', 'all'] += n
+        expected['status', status] += n
+        expected['owner', owner] += n
+        expected['owner_status', owner_status_key(owner, status)] = n
+    for day, n in documents.annotate(day=TruncDate('created_at')).values_list('day').annotate(n=Count('pk')):
+        expected['day', day.isoformat()] = n
+    return expected
+
+
+def rebuild(using='default', dry_run=False):
+    """Replace the counters with freshly computed values; returns {(scope, key): (stored, expected)} for drifted rows.
+
+    Holds a write transaction for the duration, so run it off-peak on large tables.
+    """
+    with transaction.atomic(using=using):
+        stored = {
+            (scope, key): count
+            for scope, key, count in DocumentCounter.objects.using(using).values_list('scope', 'key', 'count')
+        }
+        expected = expected_counts(using)
+        drift = {
+            k: (stored.get(k, 0), expected.get(k, 0))
+            for k in stored.keys() | expected.keys()
+            if stored.get(k, 0) != expected.get(k, 0)
+        }
+        if not dry_run:
+            DocumentCounter.objects.using(using).all().delete()
+            DocumentCounter.objects.using(using).bulk_create(
+                [DocumentCounter(scope=scope, key=key, count=n) for (scope, key), n in expected.items()],
+                batch_size=1000,
+            )
+    return drift
@@ -0,0 +1,77 @@
+import os
+import tempfile
+from datetime import timedelta
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from documents import bloom
+from documents.models import Document
+
+from .utils import upload
+
+
+class DocFilterSnapshotTests(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, 'doc_filter.bin')
+        override = override_settings(DOC_FILTER_SNAPSHOT_PATH=self.path)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.doc_id = upload(self.client).json()['doc_id']
+        # Old enough to be behind the build's watermark
+        Document.objects.filter(pk=self.doc_id).update(created_at=timezone.now() - timedelta(hours=1))
+
+    def test_snapshot_round_trip(self):
+        built, watermark = bloom.build()
+        bloom.write_snapshot(built, watermark)
+        self.assertEqual(os.listdir(self.dir.name), ['doc_filter.bin'])
+        loaded, loaded_watermark = bloom.read_snapshot()
+        self.assertEqual(loaded_watermark, watermark)
+        self.assertIn(self.doc_id, loaded)
+
+    def test_snapshot_of_other_data_is_rejected(self):
+        built, watermark = bloom.build()
+        bloom.write_snapshot(built, watermark)
+        # Another database (or this one after a restore) has other rows before the watermark
+        Document.objects.filter(pk=self.doc_id).delete()
+        self.assertIsNone(bloom.read_snapshot())
+
+
+@override_settings(DOC_FILTER_ENABLED=True, DOC_FILTER_REFRESH_SECONDS=3600)
+class DocFilterRefreshTests(TransactionTestCase):
+    """The background thread has its own connection, so the rows must be committed."""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        override = override_settings(DOC_FILTER_SNAPSHOT_PATH=os.path.join(self.dir.name, 'doc_filter.bin'))
+        override.enable()
+        self.addCleanup(override.disable)
+        self.doc_id = upload(self.client).json()['doc_id']
+        Document.objects.filter(pk=self.doc_id).update(created_at=timezone.now() - timedelta(hours=1))
+        self.unknown = 'doc-' + format(bloom._now_ms() - 3600 * 1000, '012x') + '0' * 20
+        self.addCleanup(self.reset)
+        self.reset()
+
+    def reset(self):
+        if bloom._refresher is not None:
+            bloom._refresher.join()
+        bloom._state, bloom._next_refresh, bloom._refresher = None, 0.0, None
+
+    def test_first_lookup_loads_in_the_background(self):
+        # Nothing loaded yet: the lookup goes to the database instead of waiting
+        self.assertTrue(bloom.might_exist(self.unknown))
+        bloom._refresher.join()
+        self.assertTrue(bloom.might_exist(self.doc_id))
+        self.assertFalse(bloom.might_exist(self.unknown))
+
+    def test_lookup_does_not_wait_for_a_running_refresh(self):
+        bloom.refresh()
+        bloom._next_refresh = 0.0  # due again
+        with bloom._lock:
+            # Another thread is catching up: the current filter answers
+            self.assertFalse(bloom.might_exist(self.unknown))
+            self.assertIsNone(bloom._refresher)
@@ -0,0 +1,48 @@
+from django.test import Client, TestCase, override_settings
+
+from .utils import ADMIN, VERIFIER, upload
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        self.doc = upload(self.client).json()
+        self.detail_url = f"/api/docs/{self.doc['doc_id']}/"
+        self.download_url = f"/api/docs/{self.doc['doc_id']}/download/"
+
+    def test_unchanged_metadata_is_304(self):
+        first = self.client.get(self.detail_url, **ADMIN)
+        self.assertEqual(first.status_code, 200)
+        etag = first['ETag']
+        again = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag, **ADMIN)
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.content, b'')
+        self.assertEqual(again['ETag'], etag)
+        self.assertEqual(again['Cache-Control'], first['Cache-Control'])
+
+    def test_status_change_invalidates_the_etag(self):
+        etag = self.client.get(self.detail_url, **ADMIN)['ETag']
+        self.client.post('/api/docs/review/', {'doc_ids': [self.doc['doc_id']], 'action': 'APPROVE'},
+                         content_type='application/json', **VERIFIER)
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag, **ADMIN)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'APPROVED')
+        self.assertNotEqual(response['ETag'], etag)
+
+    @override_settings(COMPRESSION_MIN_SIZE=0)
+    def test_weak_etag_of_compressed_response_is_304(self):
+        # CompressionMiddleware reads its threshold when a client first loads the middleware
+        client = Client()
+        compressed = client.get(self.detail_url, HTTP_ACCEPT_ENCODING='gzip', **ADMIN)
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertTrue(compressed['ETag'].startswith('W/"'))
+        response = client.get(self.detail_url, HTTP_IF_NONE_MATCH=compressed['ETag'], HTTP_ACCEPT_ENCODING='gzip', **ADMIN)
+        self.assertEqual(response.status_code, 304)
+
+    def test_download_is_304_for_its_etag(self):
+        first = self.client.get(self.download_url, **VERIFIER)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first['ETag'], f"\"{self.doc['hash']}\"")
+        again = self.client.get(self.download_url, HTTP_IF_NONE_MATCH=f"W/{first['ETag']}, \"other\"", **VERIFIER)
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.content, b'')
@@ -0,0 +1,9 @@
+from django.test import TestCase
+
+
+class DocumentEventsRouteTests(TestCase):
+
+    def test_not_served_by_sync_workers(self):
+        # The test settings leave USE_ASYNC_VIEWS off, as under WSGI
+        response = self.client.get('/api/docs/events/')
+        self.assertEqual(response.status_code, 501)
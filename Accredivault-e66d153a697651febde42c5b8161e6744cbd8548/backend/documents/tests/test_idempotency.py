@@ -0,0 +1,54 @@
+import time
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from documents import views
+from documents.models import Document
+
+from .utils import ADMIN, pdf
+
+
+class IdempotencyKeyTests(TestCase):
+
+    def upload(self, key):
+        return self.client.post('/api/docs/upload/', {'title': 'Degree Certificate', 'file': pdf()},
+                                HTTP_IDEMPOTENCY_KEY=key, **ADMIN)
+
+    def upload_with_duplicate_in_flight(self, key):
+        """Upload once; while it is being processed, the same request arrives again."""
+        duplicate = {}
+        validate = views.validate_document
+
+        def validate_and_duplicate(*args, **kwargs):
+            started = time.monotonic()
+            duplicate['response'] = self.upload(key)
+            duplicate['seconds'] = time.monotonic() - started
+            return validate(*args, **kwargs)
+
+        with mock.patch.object(views, 'validate_document', side_effect=validate_and_duplicate):
+            first = self.upload(key)
+        return first, duplicate['response'], duplicate['seconds']
+
+    def test_replay(self):
+        first, again = self.upload('k1'), self.upload('k1')
+        self.assertEqual((first.status_code, again.status_code), (201, 201))
+        self.assertEqual(again['Idempotent-Replayed'], 'true')
+        self.assertEqual(first.json()['doc_id'], again.json()['doc_id'])
+        self.assertEqual(Document.objects.count(), 1)
+
+    @override_settings(IDEMPOTENCY_WAIT_SECONDS=0.2)
+    def test_duplicate_in_flight_gets_409_without_waiting_long(self):
+        first, duplicate, seconds = self.upload_with_duplicate_in_flight('k2')
+        self.assertEqual(duplicate.status_code, 409)
+        self.assertEqual(duplicate['Retry-After'], '1')
+        self.assertLess(seconds, 1)
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(self.upload('k2')['Idempotent-Replayed'], 'true')
+
+    @override_settings(IDEMPOTENCY_WAIT_SECONDS=3600)
+    @mock.patch('documents.idempotency.MAX_WAIT_SECONDS', 0.2)
+    def test_wait_is_capped(self):
+        _, duplicate, seconds = self.upload_with_duplicate_in_flight('k3')
+        self.assertEqual(duplicate.status_code, 409)
+        self.assertLess(seconds, 1)
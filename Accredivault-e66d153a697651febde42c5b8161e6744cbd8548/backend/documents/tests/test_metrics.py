@@ -0,0 +1,26 @@
+from django.test import TestCase, override_settings
+
+
+class MetricsEndpointTests(TestCase):
+
+    def scrape(self, **extra):
+        return self.client.get('/api/metrics', **extra)
+
+    @override_settings(METRICS_TOKEN='', METRICS_PUBLIC=False)
+    def test_without_token_only_direct_loopback(self):
+        self.assertEqual(self.scrape(REMOTE_ADDR='127.0.0.1').status_code, 200)
+        self.assertEqual(self.scrape(REMOTE_ADDR='203.0.113.7').status_code, 403)
+        # Relayed by a reverse proxy on this host
+        self.assertEqual(self.scrape(REMOTE_ADDR='127.0.0.1', HTTP_X_FORWARDED_FOR='203.0.113.7').status_code, 403)
+
+    @override_settings(METRICS_TOKEN='s3cret')
+    def test_token(self):
+        self.assertEqual(self.scrape(REMOTE_ADDR='127.0.0.1').status_code, 401)
+        self.assertEqual(self.scrape(HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+        response = self.scrape(REMOTE_ADDR='203.0.113.7', HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'# TYPE', response.content)
+
+    @override_settings(METRICS_TOKEN='', METRICS_PUBLIC=True)
+    def test_explicitly_public(self):
+        self.assertEqual(self.scrape(REMOTE_ADDR='203.0.113.7').status_code, 200)
@@ -0,0 +1,84 @@
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from documents import reconcile
+from documents.models import Document
+from documents.scrub import MISSING
+
+DAY = 24 * 3600
+
+
+class ReconcileTests(TestCase):
+    """Filesystem storage in a fresh MEDIA_ROOT, so only this test's blobs are listed."""
+
+    def setUp(self):
+        media = tempfile.mkdtemp(dir=getattr(settings, 'TEST_DIR', None))
+        override = override_settings(MEDIA_ROOT=media)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.storage = Document._meta.get_field('file').storage
+        self.now = timezone.now()
+
+    def blob(self, name, age=2 * DAY, body=b'ciphertext'):
+        name = self.storage.save(f'documents/{name}', ContentFile(body))
+        modified = (self.now - timedelta(seconds=age)).timestamp()
+        os.utime(self.storage.path(name), (modified, modified))
+        return name
+
+    def document(self, name):
+        return Document.objects.create(title='Degree', owner='Test University', file=name)
+
+    def reconcile(self, **kwargs):
+        return reconcile.reconcile(dry_run=False, grace_seconds=DAY, now=self.now, **kwargs)
+
+    def test_merge_join(self):
+        matched = self.document(self.blob('b-matched.pdf')).doc_id
+        orphan = self.blob('a-orphan.pdf')
+        dangling = self.document('documents/c-dangling.pdf').doc_id
+
+        with self.assertLogs('documents', 'ERROR'):
+            report = self.reconcile()
+
+        self.assertEqual((report['blobs'], report['orphans'], report['deleted']), (2, 1, 1))
+        self.assertEqual(report['dangling_names'], ['documents/c-dangling.pdf'])
+        self.assertFalse(self.storage.exists(orphan))
+        self.assertTrue(self.storage.exists(Document.objects.get(pk=matched).file.name))
+        self.assertEqual(Document.objects.get(pk=dangling).last_verify_result, MISSING)
+        self.assertNotEqual(Document.objects.get(pk=matched).last_verify_result, MISSING)
+
+    def test_dry_run_changes_nothing(self):
+        orphan = self.blob('orphan.pdf')
+        dangling = self.document('documents/dangling.pdf').doc_id
+        with self.assertLogs('documents', 'ERROR'):
+            report = reconcile.reconcile(dry_run=True, grace_seconds=DAY, now=self.now)
+        self.assertEqual((report['orphans'], report['deleted'], report['dangling']), (1, 0, 1))
+        self.assertTrue(self.storage.exists(orphan))
+        self.assertNotEqual(Document.objects.get(pk=dangling).last_verify_result, MISSING)
+
+    def test_young_orphan_is_kept(self):
+        young = self.blob('in-flight.pdf', age=60)
+        report = self.reconcile()
+        self.assertEqual((report['orphans'], report['young_orphans'], report['deleted']), (1, 1, 0))
+        self.assertTrue(self.storage.exists(young))
+
+    def test_reference_committed_mid_run_keeps_its_blob(self):
+        name = self.blob('late-commit.pdf')
+        listing = reconcile.storage_listing
+
+        def listing_then_commit(storage, prefix):
+            for blob in listing(storage, prefix):
+                yield blob
+                # The upload's row commits after the sorted reference stream went past its name
+                self.document(blob.name)
+
+        with mock.patch('documents.reconcile.storage_listing', listing_then_commit):
+            report = self.reconcile()
+        self.assertEqual((report['orphans'], report['deleted']), (1, 0))
+        self.assertTrue(self.storage.exists(name))
@@ -0,0 +1,113 @@
+from io import StringIO
+from unittest import skipUnless
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+
+from documents.middleware import ReplicaPinningMiddleware
+from documents.routers import ReplicaRouter, is_pinned_to_primary, replica_ok
+
+from .utils import ADMIN, VERIFIER, upload
+
+PIN_COOKIE = 'avault_pin'
+# Only accredivault.test_settings declares the replica file
+HAS_REPLICA = 'replica1' in settings.DATABASES
+
+
+def sync_replicas():
+    call_command('sync_replicas', stdout=StringIO())
+
+
+@skipUnless(HAS_REPLICA, "needs accredivault.test_settings")
+@override_settings(
+    DATABASE_REPLICAS=['replica1'],
+    DATABASE_ROUTERS=['documents.routers.ReplicaRouter'],
+    MIDDLEWARE=[*settings.MIDDLEWARE, 'documents.middleware.ReplicaPinningMiddleware'],
+    REPLICA_PIN_COOKIE=PIN_COOKIE,
+    REPLICA_PIN_SECONDS=5,
+    THROTTLE_ENABLED=False,
+)
+class ReplicaRoutingTests(TransactionTestCase):
+    """Primary and replica are separate SQLite files; the replica lags until sync_replicas runs."""
+
+    databases = {'default', 'replica1'} if HAS_REPLICA else {'default'}
+
+    def setUp(self):
+        sync_replicas()
+        self.writer = Client()
+        response = upload(self.writer)
+        self.assertEqual(response.status_code, 201)
+        self.doc = response.json()
+
+    def detail(self, client):
+        return client.get(f"/api/docs/{self.doc['doc_id']}/", **ADMIN)
+
+    def verify(self, client):
+        return client.post('/api/verify/', {'doc_id': self.doc['doc_id'], 'file_hash': self.doc['hash']},
+                           content_type='application/json', **VERIFIER)
+
+    def test_write_pins_the_client_to_the_primary(self):
+        cookie = self.writer.cookies[PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], 5)
+        self.assertEqual(self.detail(self.writer).status_code, 200)
+        # Anyone else reads the replica, which has not seen the upload yet
+        self.assertEqual(self.detail(Client()).status_code, 404)
+
+    def test_pin_ends_with_the_cookie(self):
+        del self.writer.cookies[PIN_COOKIE]  # what the browser does after max-age
+        self.assertEqual(self.detail(self.writer).status_code, 404)
+        sync_replicas()
+        self.assertEqual(self.detail(self.writer).status_code, 200)
+
+    def test_verify_reads_the_replica_and_sets_no_cookie(self):
+        verifier = Client()
+        self.assertEqual(self.verify(verifier).status_code, 404)
+        sync_replicas()
+        response = self.verify(verifier)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['valid'])
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_failed_write_sets_no_cookie(self):
+        client = Client()
+        response = client.patch('/api/docs/doc-missing/status/', {'status': 'VERIFIED'},
+                                content_type='application/json', **ADMIN)
+        self.assertGreaterEqual(response.status_code, 400)
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+
+class AsyncReplicaPinningTests(SimpleTestCase):
+    """Under ASGI the middleware must stay async, or every async view is pushed onto a thread."""
+
+    def middleware(self, view):
+        async def get_response(request):
+            await middleware.process_view(request, view, (), {})
+            return await view(request)
+        middleware = ReplicaPinningMiddleware(get_response)
+        return middleware
+
+    async def test_runs_on_the_event_loop(self):
+        seen = {}
+
+        async def read_only(request):
+            seen['pinned'] = is_pinned_to_primary()
+            return HttpResponse()
+
+        middleware = self.middleware(replica_ok(read_only))
+        self.assertTrue(iscoroutinefunction(middleware))
+        self.assertTrue(iscoroutinefunction(middleware.process_view))
+        response = await middleware(RequestFactory().post('/api/verify/'))
+        self.assertFalse(seen['pinned'])
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    async def test_write_pins_and_sets_the_cookie(self):
+        async def write(request):
+            ReplicaRouter().db_for_write(None)
+            return HttpResponse(status=201)
+
+        response = await self.middleware(write)(RequestFactory().post('/api/docs/upload/'))
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertFalse(is_pinned_to_primary())
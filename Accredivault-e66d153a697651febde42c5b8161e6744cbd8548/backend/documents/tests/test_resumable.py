@@ -0,0 +1,97 @@
+import hashlib
+from datetime import timedelta
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.test import TestCase
+from django.utils import timezone
+
+from documents import resumable
+from documents.models import UploadSession
+
+from .utils import ADMIN
+
+BODY = b'%PDF-1.4 ' + bytes(range(256)) * 64
+
+
+class ResumableAppendTests(TestCase):
+
+    def setUp(self):
+        self.session = resumable.create_session('Test University', 'Transcript', 'transcript.pdf', len(BODY))
+        self.url = f"/api/docs/uploads/{self.session.upload_id}/"
+
+    def patch(self, offset, chunk):
+        return self.client.generic('PATCH', self.url, chunk, content_type='application/offset+octet-stream',
+                                   HTTP_UPLOAD_OFFSET=str(offset), **ADMIN)
+
+    def test_concurrent_append_loses_with_409(self):
+        first, second = BODY[:4096], b'X' * 4096
+        source, responses = BytesIO(first), []
+
+        def read_first(n):
+            if not responses:
+                # A second PATCH for the same offset arrives while this one is writing the spool
+                responses.append(self.patch(0, second))
+            return source.read(n)
+
+        session = UploadSession.objects.get(pk=self.session.pk)
+        self.assertEqual(resumable.append(session, 0, read_first, settings.ENCRYPTION_KEY), len(first))
+        self.assertEqual(responses[0].status_code, 409)
+        self.assertEqual(responses[0]['Retry-After'], '1')
+
+        # The spool holds exactly the winner's bytes: the rest uploads and verifies
+        self.assertEqual(self.patch(len(first), BODY[len(first):]).status_code, 204)
+        response = self.client.post(f"{self.url}finalize/", **ADMIN)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['hash'], hashlib.sha256(BODY).hexdigest())
+
+    def test_stale_offset_gets_the_real_one(self):
+        self.assertEqual(self.patch(0, BODY[:100]).status_code, 204)
+        response = self.patch(0, BODY[:100])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Upload-Offset'], '100')
+
+    def test_abandoned_claim_lapses(self):
+        UploadSession.objects.filter(pk=self.session.pk).update(
+            offset_lock='dead-worker', locked_until=timezone.now() + timedelta(seconds=60))
+        self.assertEqual(self.patch(0, BODY[:100]).status_code, 409)
+        UploadSession.objects.filter(pk=self.session.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.patch(0, BODY[:100]).status_code, 204)
+        session = UploadSession.objects.get(pk=self.session.pk)
+        self.assertEqual((session.offset, session.offset_lock), (100, None))
+
+    def test_failed_write_does_not_advance_the_offset(self):
+        real_open = open
+
+        def full_disk(path, mode='r', *args, **kwargs):
+            f = real_open(path, mode, *args, **kwargs)
+            if mode == 'r+b':
+                f.write = mock.Mock(side_effect=OSError(28, 'No space left on device'))
+            return f
+
+        self.assertEqual(self.patch(0, BODY[:100]).status_code, 204)
+        session = UploadSession.objects.get(pk=self.session.pk)
+        with mock.patch('documents.resumable.open', full_disk, create=True), self.assertRaises(OSError):
+            resumable.append(session, 100, BytesIO(BODY[100:200]).read, settings.ENCRYPTION_KEY)
+        self.assertEqual(UploadSession.objects.get(pk=self.session.pk).offset, 100)
+        self.assertNotIn(self.session.upload_id, resumable._streams)
+
+        self.assertEqual(self.patch(100, BODY[100:]).status_code, 204)
+        response = self.client.post(f"{self.url}finalize/", **ADMIN)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['hash'], hashlib.sha256(BODY).hexdigest())
+
+    def test_stream_cache_is_bounded(self):
+        with mock.patch.object(resumable, 'MAX_CACHED_STREAMS', 2):
+            sessions = [resumable.create_session('Test University', 'Transcript', 'transcript.pdf', len(BODY))
+                        for _ in range(3)]
+            for session in sessions:
+                resumable.append(session, 0, BytesIO(BODY[:100]).read, settings.ENCRYPTION_KEY)
+            self.assertEqual(list(resumable._streams)[-2:], [s.upload_id for s in sessions[1:]])
+            self.assertNotIn(sessions[0].upload_id, resumable._streams)
+            self.assertLessEqual(len(resumable._streams), 2)
+
+        # An evicted session still resumes by replaying its spool
+        self.assertEqual(resumable.append(sessions[0], 100, BytesIO(BODY[100:]).read, settings.ENCRYPTION_KEY),
+                         len(BODY))
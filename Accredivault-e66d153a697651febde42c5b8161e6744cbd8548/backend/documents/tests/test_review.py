@@ -0,0 +1,57 @@
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from documents import review
+from documents.models import AuditLog, Document
+
+from .utils import VERIFIER, upload
+
+
+class ReviewTests(TestCase):
+
+    def setUp(self):
+        self.doc_ids = [upload(self.client, body=f'%PDF-1.4 doc {i}'.encode()).json()['doc_id'] for i in range(3)]
+
+    def status_changes(self, doc_id):
+        return AuditLog.objects.filter(doc_id=doc_id, action='STATUS_CHANGE').count()
+
+    def test_status_changed_concurrently_is_skipped(self):
+        first, stale, _ = self.doc_ids
+        now = timezone.now
+
+        def approve_stale():
+            # Another verifier's review commits between our read and our UPDATE
+            Document.objects.filter(pk=stale).update(status='APPROVED')
+            return now()
+
+        with mock.patch('documents.review.timezone.now', side_effect=approve_stale):
+            outcomes = review.apply_review([first, stale], 'REJECT', 'verifier')
+
+        self.assertEqual(outcomes, {first: (review.UPDATED, 'REJECTED'), stale: (review.ALREADY_FINAL, 'APPROVED')})
+        self.assertEqual(Document.objects.get(pk=stale).status, 'APPROVED')
+        self.assertEqual(self.status_changes(first), 1)
+        self.assertEqual(self.status_changes(stale), 0)
+
+    def test_bulk_request_with_mixed_results(self):
+        pending, final, _ = self.doc_ids
+        Document.objects.filter(pk=final).update(status='REJECTED')
+
+        response = self.client.post('/api/docs/review/', {'doc_ids': [pending, final, 'doc-missing'], 'action': 'APPROVE'},
+                                    content_type='application/json', **VERIFIER)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['updated'], 1)
+        self.assertEqual(response.json()['results'], [
+            {'doc_id': pending, 'result': review.UPDATED, 'status': 'APPROVED'},
+            {'doc_id': final, 'result': review.ALREADY_FINAL, 'status': 'REJECTED'},
+            {'doc_id': 'doc-missing', 'result': review.NOT_FOUND, 'status': None},
+        ])
+        self.assertEqual(self.status_changes(pending), 1)
+        self.assertEqual(self.status_changes(final), 0)
+        # A repeat changes nothing
+        again = self.client.post('/api/docs/review/', {'doc_ids': [pending], 'action': 'REJECT'},
+                                 content_type='application/json', **VERIFIER)
+        self.assertEqual(again.json()['results'][0]['result'], review.ALREADY_FINAL)
+        self.assertEqual(self.status_changes(pending), 1)
@@ -0,0 +1,57 @@
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from documents.search import FTS_TABLE, TRIGGER_NAMES
+
+from .utils import ADMIN, upload
+
+
+class SearchMixin:
+
+    def search(self, q):
+        response = self.client.get('/api/docs/search/', {'q': q}, **ADMIN)
+        self.assertEqual(response.status_code, 200)
+        return [doc['doc_id'] for doc in response.json()['results']]
+
+    def triggers(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'documents_document'")
+            return {row[0] for row in cursor.fetchall()}
+
+
+class SearchIndexTests(SearchMixin, TestCase):
+
+    def test_upload_after_migrate_is_searchable(self):
+        self.assertTrue(set(TRIGGER_NAMES) <= self.triggers())
+        doc_id = upload(self.client, title='Bachelor of Astrophysics').json()['doc_id']
+        self.assertEqual(self.search('astrophys'), [doc_id])
+        self.assertEqual(self.search('Test Univ'), [doc_id])
+        self.assertEqual(self.search('chemistry'), [])
+
+    def test_migrate_restores_dropped_triggers(self):
+        before = upload(self.client, title='Master of Geology').json()['doc_id']
+        with connection.cursor() as cursor:
+            # What a table rebuild in a migration does to them
+            for name in TRIGGER_NAMES:
+                cursor.execute(f"DROP TRIGGER {name}")
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        call_command('migrate', verbosity=0)
+        self.assertTrue(set(TRIGGER_NAMES) <= self.triggers())
+        after = upload(self.client, title='Diploma in Geology', body=b'%PDF-1.4 other').json()['doc_id']
+        self.assertCountEqual(self.search('geology'), [before, after])
+
+
+class TableRebuildTests(SearchMixin, TransactionTestCase):
+    """Runs real migrations, which SQLite can't do inside the TestCase transaction."""
+
+    def test_triggers_survive_a_table_rebuilding_migration(self):
+        before = upload(self.client, title='Master of Geology').json()['doc_id']
+        # Re-adding tree_hash (a column with a default) makes SQLite rebuild documents_document
+        call_command('migrate', 'documents', '0009', verbosity=0)
+        with self.assertLogs('documents', 'INFO') as logs:
+            call_command('migrate', 'documents', verbosity=0)
+        self.assertIn('Search triggers missing', logs.output[0])
+        self.assertTrue(set(TRIGGER_NAMES) <= self.triggers())
+        after = upload(self.client, title='Diploma in Geology', body=b'%PDF-1.4 other').json()['doc_id']
+        self.assertCountEqual(self.search('geology'), [before, after])
@@ -0,0 +1,86 @@
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from documents import sharding
+from documents.models import AuditLog, Document, DocumentLocation, InstitutionShard
+
+from .utils import ADMIN, VERIFIER, upload
+
+OWNER = ADMIN['HTTP_X_USER_ID']
+OTHER = {**ADMIN, 'HTTP_X_USER_ID': 'Other College'}
+# Only accredivault.test_settings declares the second shard
+HAS_SHARD = 'shard1' in settings.DATABASES
+
+
+@skipUnless(HAS_SHARD, "needs accredivault.test_settings")
+@override_settings(
+    DOCUMENT_SHARDS=['default', 'shard1'],
+    DATABASE_ROUTERS=['documents.sharding.ShardRouter'],
+    SHARD_DIRECTORY_CACHE_SECONDS=0,
+    THROTTLE_ENABLED=False,
+)
+class ShardingTests(TestCase):
+    """'default' and shard1 are separate SQLite files; every institution starts on 'default'."""
+
+    databases = {'default', 'shard1'} if HAS_SHARD else {'default'}
+
+    def setUp(self):
+        sharding._owner_cache.clear()
+        sharding._doc_owner_cache.clear()
+        for headers in (ADMIN, OTHER):
+            InstitutionShard.objects.create(owner=headers['HTTP_X_USER_ID'], shard='default')
+
+    def upload(self, headers=ADMIN, body=b'%PDF-1.4 test certificate'):
+        response = upload(self.client, body=body, **headers)
+        self.assertEqual(response.status_code, 201)
+        return response.json()
+
+    def verify(self, doc):
+        response = self.client.post('/api/verify/', {'doc_id': doc['doc_id'], 'file_hash': doc['hash']},
+                                    content_type='application/json', **VERIFIER)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_move_institution(self):
+        doc = self.upload()
+        self.assertEqual(sharding.move_institution(OWNER, 'shard1', wait=False), 1)
+
+        self.assertEqual(InstitutionShard.objects.get(owner=OWNER).shard, 'shard1')
+        self.assertFalse(InstitutionShard.objects.get(owner=OWNER).moving)
+        self.assertEqual(DocumentLocation.objects.get(doc_id=doc['doc_id']).owner, OWNER)
+        # Copied to the target and deleted from the source, audit trail included
+        self.assertTrue(Document.objects.using('shard1').filter(doc_id=doc['doc_id']).exists())
+        self.assertFalse(Document.objects.using('default').filter(doc_id=doc['doc_id']).exists())
+        self.assertTrue(AuditLog.objects.using('shard1').filter(doc_id=doc['doc_id'], action='UPLOAD').exists())
+        self.assertFalse(AuditLog.objects.using('default').filter(doc_id=doc['doc_id']).exists())
+
+        self.assertEqual(self.client.get(f"/api/docs/{doc['doc_id']}/", **ADMIN).status_code, 200)
+        self.assertTrue(self.verify(doc)['valid'])
+        # New uploads follow the institution
+        self.assertTrue(Document.objects.using('shard1').filter(doc_id=self.upload(body=b'%PDF-1.4 new')['doc_id']).exists())
+
+    def test_rebalance_moves_the_larger_institution(self):
+        docs = [self.upload(body=b'%PDF-1.4 a'), self.upload(body=b'%PDF-1.4 b'), self.upload(OTHER)]
+        out = StringIO()
+        call_command('rebalance_shards', '--plan', '--apply', '--no-wait', stdout=out)
+        self.assertIn(f"move {OWNER} (2 documents): default -> shard1", out.getvalue())
+
+        self.assertEqual(InstitutionShard.objects.get(owner=OWNER).shard, 'shard1')
+        self.assertEqual(InstitutionShard.objects.get(owner=OTHER['HTTP_X_USER_ID']).shard, 'default')
+        self.assertEqual(Document.objects.using('shard1').count(), 2)
+        self.assertEqual(Document.objects.using('default').count(), 1)
+        for doc in docs:
+            self.assertTrue(self.verify(doc)['valid'])
+
+    def test_failed_shard_write_leaves_no_directory_row(self):
+        InstitutionShard.objects.filter(owner=OWNER).update(shard='shard1')
+        with mock.patch('documents.views.record_events', side_effect=RuntimeError('disk full')), \
+                self.assertLogs('documents', 'ERROR'):
+            response = upload(self.client)
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(Document.objects.using('shard1').exists())
+        self.assertFalse(DocumentLocation.objects.exists())
@@ -0,0 +1,56 @@
+import base64
+import importlib.util
+import os
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from documents import signing
+
+from .utils import ADMIN, upload
+
+BODY = b'%PDF-1.4 signed certificate'
+
+
+def load_verifier():
+    """verifier/accredivault_verify.py, the standalone script verifiers run."""
+    path = settings.BASE_DIR.parent / 'verifier' / 'accredivault_verify.py'
+    spec = importlib.util.spec_from_file_location('accredivault_verify', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def seed():
+    return base64.urlsafe_b64encode(os.urandom(32)).decode()
+
+
+class ManifestRoundTripTests(TestCase):
+
+    def setUp(self):
+        override = override_settings(MANIFEST_SIGNING_KEYS=f'old:{seed()},new:{seed()}', MANIFEST_ACTIVE_KEY_ID='new')
+        override.enable()
+        self.addCleanup(override.disable)
+        signing.load_keys.cache_clear()
+        self.addCleanup(signing.load_keys.cache_clear)
+        self.verifier = load_verifier()
+        doc_id = upload(self.client, body=BODY).json()['doc_id']
+        self.manifest = self.client.get(f'/api/docs/{doc_id}/manifest/', **ADMIN).json()
+        self.keys = self.verifier.load_keys(self.client.get('/api/keys/').json())
+
+    def test_server_signature_verifies_offline(self):
+        self.assertEqual(self.manifest['key_id'], 'new')
+        self.assertEqual(set(self.keys), {'old', 'new'})
+        self.assertEqual(self.verifier.verify_document(BODY, self.manifest, self.keys), self.manifest)
+
+    def test_tampered_manifest_is_rejected(self):
+        tampered = {**self.manifest, 'owner': 'Diploma Mill'}
+        with self.assertRaisesMessage(self.verifier.VerificationError, 'signature does not match manifest'):
+            self.verifier.verify_document(BODY, tampered, self.keys)
+        # Re-pointing the signature at another published key doesn't help either
+        with self.assertRaisesMessage(self.verifier.VerificationError, 'signature does not match manifest'):
+            self.verifier.verify_document(BODY, {**self.manifest, 'key_id': 'old'}, self.keys)
+
+    def test_other_pdf_is_rejected(self):
+        with self.assertRaisesMessage(self.verifier.VerificationError, 'does not match manifest'):
+            self.verifier.verify_document(b'%PDF-1.4 forged certificate', self.manifest, self.keys)
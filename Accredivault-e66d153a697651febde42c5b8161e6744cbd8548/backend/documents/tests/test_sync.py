@@ -0,0 +1,59 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from documents.models import Document, DocumentTombstone
+
+from .utils import ADMIN, upload
+
+
+@override_settings(DELTA_SYNC_SETTLE_SECONDS=0)
+class DeltaSyncTests(TestCase):
+
+    def setUp(self):
+        self.doc_ids = [upload(self.client, body=f'%PDF-1.4 doc {i}'.encode()).json()['doc_id'] for i in range(3)]
+        # Two documents share a timestamp, so the doc_id tie-break decides their order
+        self.base = timezone.now() - timedelta(minutes=10)
+        for doc_id, minutes in zip(self.doc_ids, (0, 1, 1)):
+            Document.objects.filter(pk=doc_id).update(updated_at=self.base + timedelta(minutes=minutes))
+
+    def changes(self, since='', **params):
+        response = self.client.get('/api/docs/changes/', {'since': since, **params}, **ADMIN)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_pages_follow_the_cursor(self):
+        first = self.changes(limit=2)
+        second = self.changes(first['next'], limit=2)
+        self.assertTrue(first['has_more'])
+        self.assertFalse(second['has_more'])
+        tied = sorted(self.doc_ids[1:])
+        self.assertEqual([d['doc_id'] for d in first['changes']], [self.doc_ids[0], tied[0]])
+        self.assertEqual([d['doc_id'] for d in second['changes']], [tied[1]])
+
+        # Caught up: nothing new until a document changes again
+        caught_up = self.changes(second['next'])
+        self.assertEqual(caught_up['changes'], [])
+        Document.objects.filter(pk=self.doc_ids[0]).update(status='APPROVED', updated_at=timezone.now() - timedelta(seconds=1))
+        changed = self.changes(caught_up['next'])
+        self.assertEqual([(d['doc_id'], d['status']) for d in changed['changes']], [(self.doc_ids[0], 'APPROVED')])
+
+    def test_deletion_leaves_a_tombstone_once(self):
+        token = self.changes()['next']
+        Document.objects.filter(pk=self.doc_ids[1]).delete()
+        DocumentTombstone.objects.update(deleted_at=timezone.now() - timedelta(seconds=1))
+        delta = self.changes(token)
+        self.assertEqual(delta['changes'], [])
+        self.assertEqual([t['doc_id'] for t in delta['deleted']], [self.doc_ids[1]])
+        self.assertEqual(self.changes(delta['next'])['deleted'], [])
+
+    @override_settings(DELTA_SYNC_SETTLE_SECONDS=60)
+    def test_recent_writes_wait_for_the_settle_horizon(self):
+        token = self.changes()['next']
+        Document.objects.filter(pk=self.doc_ids[0]).update(status='APPROVED', updated_at=timezone.now())
+        self.assertEqual(self.changes(token)['changes'], [])
+
+    def test_invalid_token_is_400(self):
+        response = self.client.get('/api/docs/changes/', {'since': 'not-a-token'}, **ADMIN)
+        self.assertEqual(response.status_code, 400)
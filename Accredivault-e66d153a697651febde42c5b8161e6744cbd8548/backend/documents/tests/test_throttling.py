@@ -0,0 +1,77 @@
+import os
+import tempfile
+import time
+
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from documents.throttling import ConcurrencyLimiter, TokenBucketStore, client_id, get_limiter, get_store
+
+from .utils import VERIFIER, pdf
+
+
+class ConcurrencyLimiterTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'throttle.sqlite3')
+
+    def limiter(self):
+        # One per worker process, all on the same file
+        return ConcurrencyLimiter(TokenBucketStore(self.path), limit=4, expensive_share=0.5, lease_seconds=60)
+
+    def test_cap_is_shared_by_all_workers(self):
+        first, second = self.limiter(), self.limiter()
+        leases = [first.try_acquire(), second.try_acquire(), first.try_acquire()]
+        self.assertTrue(all(leases))
+        # Expensive calls stop at their share of the slots
+        self.assertIsNone(second.try_acquire(expensive=True))
+        leases.append(second.try_acquire())
+        self.assertIsNone(first.try_acquire())
+        second.release(leases.pop())
+        self.assertIsNotNone(first.try_acquire())
+
+    def test_leases_of_dead_workers_expire(self):
+        store = TokenBucketStore(self.path)
+        for _ in range(4):
+            self.assertIsNotNone(store.acquire_lease(4, lease_seconds=60))
+        self.assertIsNone(store.acquire_lease(4, lease_seconds=60))
+        self.assertIsNotNone(store.acquire_lease(4, lease_seconds=60, now=time.time() + 61))
+
+
+class AdmissionControlTests(TestCase):
+
+    def test_expensive_verify_is_shed_when_busy(self):
+        limiter = get_limiter()
+        held = [get_store().acquire_lease(limiter.limit, 60) for _ in range(limiter.expensive_limit)]
+        try:
+            expensive = self.client.post('/api/verify/file/', {'doc_id': 'doc-0', 'file': pdf()}, **VERIFIER)
+            # The cheap endpoint still has room
+            cheap = self.client.post('/api/verify/', {'doc_id': 'doc-0', 'file_hash': '0' * 64},
+                                     content_type='application/json', **VERIFIER)
+        finally:
+            for token in held:
+                limiter.release(token)
+        self.assertEqual(expensive.status_code, 503)
+        self.assertEqual(expensive['Retry-After'], '1')
+        self.assertEqual(cheap.status_code, 404)
+
+
+@override_settings(THROTTLE_CLIENT_IP_HEADER='X-Forwarded-For', THROTTLE_TRUSTED_PROXIES=1)
+class ClientIdTests(SimpleTestCase):
+
+    def client_id(self, forwarded, remote_addr='10.0.0.2'):
+        request = RequestFactory().get('/', HTTP_X_FORWARDED_FOR=forwarded, REMOTE_ADDR=remote_addr)
+        return client_id(request)
+
+    def test_spoofed_leftmost_entry_maps_to_the_same_bucket(self):
+        self.assertEqual(self.client_id('198.51.100.9'), '198.51.100.9')
+        # The client prepends whatever it likes; our proxy appends the real peer
+        self.assertEqual(self.client_id('1.2.3.4, 198.51.100.9'), '198.51.100.9')
+        self.assertEqual(self.client_id('5.6.7.8, 198.51.100.9'), '198.51.100.9')
+
+    @override_settings(THROTTLE_TRUSTED_PROXIES=2)
+    def test_counts_trusted_hops_from_the_right(self):
+        self.assertEqual(self.client_id('1.2.3.4, 198.51.100.9, 10.0.0.5'), '198.51.100.9')
+        # Fewer entries than proxies: the request skipped one, so trust only the peer
+        self.assertEqual(self.client_id('198.51.100.9'), '10.0.0.2')
@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+
+from django.test import TestCase, override_settings
+
+from documents.utils import digest_matches
+
+from .utils import VERIFIER, upload
+
+
+@override_settings(THROTTLE_ENABLED=False)
+class VerifyHashTests(TestCase):
+
+    def setUp(self):
+        self.doc = upload(self.client).json()
+
+    def verify(self, doc_id, file_hash):
+        return self.client.post('/api/verify/', {'doc_id': doc_id, 'file_hash': file_hash},
+                                content_type='application/json', **VERIFIER)
+
+    def test_matching_hash_in_either_case(self):
+        for file_hash in (self.doc['hash'], self.doc['hash'].upper()):
+            response = self.verify(self.doc['doc_id'], file_hash)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.json()['valid'])
+
+    def test_other_hash_is_invalid(self):
+        response = self.verify(self.doc['doc_id'], '0' * 64)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()['valid'])
+
+    def test_malformed_input_is_rejected(self):
+        for doc_id, file_hash in [
+            (self.doc['doc_id'], 'é' * 64),
+            (self.doc['doc_id'], 'abc'),
+            (self.doc['doc_id'], 12345),
+            (self.doc['doc_id'], ['0' * 64]),
+            (12345, self.doc['hash']),
+        ]:
+            with self.subTest(doc_id=doc_id, file_hash=file_hash):
+                self.assertEqual(self.verify(doc_id, file_hash).status_code, 400)
+
+    def test_digest_matches_takes_any_string(self):
+        document = SimpleNamespace(file_hash='a' * 64, tree_hash='')
+        self.assertTrue(digest_matches(document, 'A' * 64))
+        self.assertFalse(digest_matches(document, 'é' * 64))
@@ -0,0 +1,13 @@
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+ADMIN = {'HTTP_X_USER_ID': 'Test University', 'HTTP_X_USER_ROLE': 'ADMIN'}
+VERIFIER = {'HTTP_X_USER_ID': 'verifier', 'HTTP_X_USER_ROLE': 'VERIFIER'}
+
+
+def pdf(body=b'%PDF-1.4 test certificate', name='degree.pdf'):
+    return SimpleUploadedFile(name, body, content_type='application/pdf')
+
+
+def upload(client, title='Degree Certificate', body=b'%PDF-1.4 test certificate', **headers):
+    """POST one PDF through the upload endpoint; returns the response."""
+    return client.post('/api/docs/upload/', {'title': title, 'file': pdf(body)}, **{**ADMIN, **headers})
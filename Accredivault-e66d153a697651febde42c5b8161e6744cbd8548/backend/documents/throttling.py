@@ -0,0 +1,246 @@
+"""Admission control for the public verification endpoints.
+
+Two layers, applied by the ``admission_control`` decorator before any body
+parsing, DB query or crypto work:
+
+* Token buckets per client and per endpoint, stored in a small SQLite file
+  (``THROTTLE_DB_PATH``) so every worker process on the host shares them.
+  Over-limit requests get ``429`` with ``Retry-After``.
+* A host-wide concurrency cap, kept in the same SQLite file: each admitted
+  request holds a lease row until it finishes, so the cap applies to all
+  worker processes together. Leases expire (``lease_seconds``), so a killed
+  worker's slots come back. Expensive calls (decrypt + re-hash in
+  ``verify_document_file``) may only use a share of the slots, so under
+  overload they are shed with ``503`` before the cheap hash lookups are.
+"""
+import math
+import time
+import secrets
+import random
+import sqlite3
+import logging
+import threading
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+
+from .metrics import ADMISSION_REJECTED
+
+logger = logging.getLogger('documents')
+
+
+class TokenBucketStore:
+    """Token buckets and in-flight leases in a SQLite file, safe across threads and processes."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS buckets ('
+                'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)'
+            )
+            conn.execute('CREATE TABLE IF NOT EXISTS leases (token TEXT PRIMARY KEY, expires REAL NOT NULL)')
+            self._local.conn = conn
+        return conn
+
+    def take(self, buckets, now=None):
+        """Take one token from every (key, rate, burst) bucket, or from none.
+
+        Returns (allowed, retry_after_seconds).
+        """
+        now = time.time() if now is None else now
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            levels = []
+            retry_after = 0.0
+            for key, rate, burst in buckets:
+                row = conn.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+                tokens = burst if row is None else min(burst, row[0] + max(0.0, now - row[1]) * rate)
+                if tokens < 1:
+                    retry_after = max(retry_after, (1 - tokens) / rate)
+                levels.append((key, tokens))
+            allowed = retry_after == 0.0
+            if allowed:
+                conn.executemany(
+                    'INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) '
+                    'ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated',
+                    [(key, tokens - 1, now) for key, tokens in levels],
+                )
+            if random.random() < 0.001:
+                # Forget idle clients; a missing bucket is simply a full one
+                conn.execute('DELETE FROM buckets WHERE updated < ?', (now - 3600,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return allowed, retry_after
+
+    def acquire_lease(self, limit, lease_seconds, now=None):
+        """A lease token if fewer than `limit` unexpired leases are held, else None."""
+        now = time.time() if now is None else now
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM leases WHERE expires <= ?', (now,))
+            held = conn.execute('SELECT COUNT(*) FROM leases').fetchone()[0]
+            token = None
+            if held < limit:
+                token = secrets.token_hex(8)
+                conn.execute('INSERT INTO leases (token, expires) VALUES (?, ?)', (token, now + lease_seconds))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return token
+
+    def release_lease(self, token):
+        self._connection().execute('DELETE FROM leases WHERE token = ?', (token,))
+
+
+class ConcurrencyLimiter:
+    """In-flight request cap across all workers, with a smaller share for expensive calls."""
+
+    def __init__(self, store, limit, expensive_share, lease_seconds):
+        self.store = store
+        self.limit = limit
+        self.expensive_limit = max(1, int(limit * expensive_share))
+        self.lease_seconds = lease_seconds
+
+    def try_acquire(self, expensive=False):
+        """A lease token to hand to release(), or None when at the cap."""
+        try:
+            return self.store.acquire_lease(self.expensive_limit if expensive else self.limit, self.lease_seconds)
+        except Exception as e:
+            # Fail open, as the rate limiter does
+            logger.error(f"Concurrency limiter unavailable: {str(e)}")
+            return ''
+
+    def release(self, token):
+        if not token:
+            return
+        try:
+            self.store.release_lease(token)
+        except Exception as e:
+            # The lease runs out by itself
+            logger.error(f"Releasing concurrency lease failed: {str(e)}")
+
+
+_store = None
+_limiter = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        _store = TokenBucketStore(settings.THROTTLE_DB_PATH)
+    return _store
+
+
+def get_limiter():
+    global _limiter
+    if _limiter is None:
+        config = getattr(settings, 'THROTTLE_CONCURRENCY', {})
+        _limiter = ConcurrencyLimiter(get_store(), config.get('limit', 32), config.get('expensive_share', 0.5),
+                                      config.get('lease_seconds', 120))
+    return _limiter
+
+
+def client_id(request):
+    """Identify the caller by peer address (x-user-id is caller-chosen, so not trusted).
+
+    Behind reverse proxies set THROTTLE_CLIENT_IP_HEADER (e.g. 'X-Forwarded-For')
+    and THROTTLE_TRUSTED_PROXIES. Each proxy appends the peer it saw, so the
+    client is that many entries from the right; anything further left was
+    written by the client and could be changed on every request.
+    """
+    header = getattr(settings, 'THROTTLE_CLIENT_IP_HEADER', '')
+    hops = getattr(settings, 'THROTTLE_TRUSTED_PROXIES', 1)
+    if header and hops > 0 and request.headers.get(header):
+        addresses = [a.strip() for a in request.headers[header].split(',')]
+        if len(addresses) >= hops and addresses[-hops]:
+            return addresses[-hops]
+    return request.META.get('REMOTE_ADDR', 'unknown')
+
+
+def _check_rate(endpoint, request):
+    """Returns a 429 response when over limit, else None."""
+    rates = getattr(settings, 'THROTTLE_RATES', {}).get(endpoint)
+    if not rates:
+        return None
+    buckets = [
+        (f'{endpoint}:client:{client_id(request)}', rates['rate'], rates['burst']),
+        (f'{endpoint}:all', rates['global_rate'], rates['global_burst']),
+    ]
+    try:
+        allowed, retry_after = get_store().take(buckets)
+    except Exception as e:
+        # Fail open: a broken limiter must not take verification down with it
+        logger.error(f"Rate limiter unavailable: {str(e)}")
+        return None
+    if allowed:
+        return None
+    ADMISSION_REJECTED.inc(endpoint=endpoint, reason='rate_limited')
+    seconds = max(1, math.ceil(retry_after))
+    response = JsonResponse({'error': 'Rate limit exceeded', 'retry_after': seconds}, status=429)
+    response['Retry-After'] = str(seconds)
+    return response
+
+
+def _overloaded(endpoint):
+    ADMISSION_REJECTED.inc(endpoint=endpoint, reason='overloaded')
+    response = JsonResponse({'error': 'Server busy, retry shortly'}, status=503)
+    response['Retry-After'] = '1'
+    return response
+
+
+def admission_control(endpoint, expensive=False):
+    """Rate-limit and concurrency-cap a (sync or async) view.
+
+    Put it outermost, above @api_view, so rejected requests skip DRF entirely.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if not getattr(settings, 'THROTTLE_ENABLED', True):
+                    return await view(request, *args, **kwargs)
+                rejected = await sync_to_async(_check_rate, thread_sensitive=False)(endpoint, request)
+                if rejected is not None:
+                    return rejected
+                limiter = get_limiter()
+                lease = await sync_to_async(limiter.try_acquire, thread_sensitive=False)(expensive)
+                if lease is None:
+                    return _overloaded(endpoint)
+                try:
+                    return await view(request, *args, **kwargs)
+                finally:
+                    await sync_to_async(limiter.release, thread_sensitive=False)(lease)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not getattr(settings, 'THROTTLE_ENABLED', True):
+                return view(request, *args, **kwargs)
+            rejected = _check_rate(endpoint, request)
+            if rejected is not None:
+                return rejected
+            limiter = get_limiter()
+            lease = limiter.try_acquire(expensive)
+            if lease is None:
+                return _overloaded(endpoint)
+            try:
+                return view(request, *args, **kwargs)
+            finally:
+                limiter.release(lease)
+        return wrapper
+    return decorator
@@ -1,14 +1,31 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import views, async_views
+
+# Under ASGI the verification/download endpoints can be served natively async
+verify_views = async_views if getattr(settings, 'USE_ASYNC_VIEWS', False) else views
+# A sync worker would spend itself on one SSE stream, so events need the async views
+document_events = async_views.document_events if getattr(settings, 'USE_ASYNC_VIEWS', False) else views.document_events_unavailable
 
 urlpatterns = [
     path('docs/upload/', views.upload_document, name='upload-document'),
     path('docs/upload/multiple/', views.upload_multiple_documents, name='upload-multiple-documents'),
+    path('docs/review/', views.bulk_review_documents, name='bulk-review-documents'),
+    path('docs/uploads/', views.create_upload_session, name='create-upload-session'),
+    path('docs/uploads/<str:upload_id>/', views.upload_session, name='upload-session'),
+    path('docs/uploads/<str:upload_id>/finalize/', views.finalize_upload_session, name='finalize-upload-session'),
+    path('docs/changes/', views.document_changes, name='document-changes'),
+    path('docs/events/', document_events, name='document-events'),
+    path('docs/search/', views.search_documents, name='search-documents'),
     path('docs/<str:doc_id>/', views.document_detail, name='document-detail'),
-    path('docs/<str:doc_id>/download/', views.download_encrypted_document, name='download-document'),
+    path('docs/<str:doc_id>/manifest/', views.document_manifest, name='document-manifest'),
+    path('docs/<str:doc_id>/download/', verify_views.download_encrypted_document, name='download-document'),
     path('docs/', views.document_list, name='document-list'),
     path('docs/<str:doc_id>/status/', views.update_document_status, name='update-status'),
+    path('stats/', views.dashboard_stats, name='dashboard-stats'),
+    path('keys/', views.public_keys, name='public-keys'),
     path('audit/', views.audit_logs, name='audit-logs'),
-    path('verify/', views.verify_document, name='verify-document'),
-    path('verify/file/', views.verify_document_file, name='verify-document-file'),
-]
\ No newline at end of file
+    path('verify/', verify_views.verify_document, name='verify-document'),
+    path('verify/file/', verify_views.verify_document_file, name='verify-document-file'),
+    path('metrics', views.metrics, name='metrics'),
+]
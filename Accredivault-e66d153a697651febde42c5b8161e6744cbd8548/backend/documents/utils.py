@@ -1,3 +1,41 @@
+import os
+import re
+import time
+import base64
+import hashlib
+import hmac
+import threading
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from django.utils.http import parse_etags, quote_etag
+from .compression import decompress
+
+SHA256_HEX_RE = re.compile(r'[0-9a-fA-F]{64}')
+
+_id_lock = threading.Lock()
+_last_id_ms = 0
+_last_id_rand = 0
+
+def new_doc_id():
+    """Time-ordered 128-bit document id in UUIDv7 layout: ``doc-`` + 32 hex chars.
+
+    48-bit Unix millisecond timestamp, then 74 random bits (around the version
+    and variant bits). Ids from one process are strictly increasing: within a
+    millisecond the random part is incremented instead of redrawn. Ids sort by
+    creation time, so inserts append to the primary key index.
+    """
+    global _last_id_ms, _last_id_rand
+    with _id_lock:
+        ms = time.time_ns() // 1_000_000
+        if ms <= _last_id_ms:
+            ms, rand = _last_id_ms, _last_id_rand + 1
+            if rand >= 1 << 74:
+                ms, rand = ms + 1, int.from_bytes(os.urandom(10), 'big') >> 6
+        else:
+            rand = int.from_bytes(os.urandom(10), 'big') >> 6
+        _last_id_ms, _last_id_rand = ms, rand
+    value = (ms << 80) | (0x7 << 76) | ((rand >> 62) << 64) | (0b10 << 62) | (rand & ((1 << 62) - 1))
+    return f"doc-{value:032x}"
+
 def get_user_from_headers(request):
     """Extract user info from custom headers"""
     user_id = request.headers.get('x-user-id')
@@ -63,4 +101,85 @@ def get_encryption_key_from_settings():
         from django.conf import settings
         return getattr(settings, 'ENCRYPTION_KEY', None)
     except Exception:
-        return None
\ No newline at end of file
+        return None
+
+def compute_verification_hash(payload, enc_iv_b64, key, compression='', hasher=None):
+    """SHA-256 hex used to verify an uploaded file against a stored document.
+
+    Prefers the hash embedded in a stamped PDF's trailing comment; otherwise
+    tries to decrypt the payload as one of our blobs (undoing the document's
+    pre-encryption compression) and hashes the plaintext, falling back to
+    hashing the payload as-is. `hasher` (bytes -> hex) replaces SHA-256 for
+    the plaintext, e.g. the document's tree hash.
+    """
+    # 1) Try to extract embedded hash from stamped PDF comments tail
+    try:
+        tail_text = payload[-4096:].decode('utf-8', errors='ignore') if payload else ''
+        m = re.search(r"%%ACREDIVAULT-HASH:([0-9a-fA-F]{64})", tail_text)
+        if m:
+            return m.group(1).lower()
+    except Exception:
+        pass
+
+    # 2) Fall back to decrypting (if ours) then hash plaintext
+    plaintext = None
+    try:
+        iv_bytes = base64.b64decode(enc_iv_b64) if enc_iv_b64 else None
+        if iv_bytes:
+            plaintext = decompress(compression, AESGCM(key).decrypt(iv_bytes, payload, None))
+    except Exception:
+        plaintext = None
+    if plaintext is None:
+        plaintext = payload
+    if hasher is not None:
+        return hasher(plaintext)
+    return hashlib.sha256(plaintext).hexdigest()
+
+
+def file_sha256(file):
+    """Streaming SHA-256 hex of an uploaded/stored file; leaves it rewound for further reads."""
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def is_own_ciphertext(sha256_hex, document):
+    """True when the bytes are exactly the blob we stored for `document` (constant-time compare)."""
+    return bool(document.ciphertext_hash) and hmac.compare_digest(sha256_hex, document.ciphertext_hash)
+
+
+def is_sha256_hex(value):
+    """True for a string of 64 hex digits (either case), the form of every hash we store."""
+    return isinstance(value, str) and SHA256_HEX_RE.fullmatch(value) is not None
+
+
+def digest_matches(document, digest):
+    """True when `digest` is the document's SHA-256 or its tree hash (constant-time compare)."""
+    # compare_digest only takes ASCII str; bytes work for any input
+    digest = (digest or '').lower().encode()
+    return any(
+        stored and hmac.compare_digest(stored.encode(), digest)
+        for stored in (document.file_hash, document.tree_hash)
+    )
+
+
+# Conditional GET helpers
+def document_etag(document):
+    """Strong ETag for document metadata: changes whenever the row is saved."""
+    return quote_etag(f"{document.doc_id}-{document.updated_at.timestamp():.6f}")
+
+
+def blob_etag(document):
+    """Strong ETag for the encrypted blob; one document's ciphertext never changes."""
+    return quote_etag(document.file_hash) if document.file_hash else None
+
+
+def etag_matches(request, etag):
+    """True when the request's If-None-Match covers `etag` (weak comparison, per RFC 9110)."""
+    header = request.headers.get('If-None-Match')
+    if not header or not etag:
+        return False
+    etags = [e[2:] if e.startswith('W/') else e for e in parse_etags(header)]
+    return '*' in etags or etag in etags
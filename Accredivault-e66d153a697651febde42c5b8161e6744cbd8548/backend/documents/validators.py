@@ -1,6 +1,6 @@
 import random
 
-def validate_document(file):
+def validate_document(file, max_size=10 * 1024 * 1024):
     """
     AI validation with basic file validation
     Returns confidence score and list of issues
@@ -14,12 +14,11 @@ def validate_document(file):
             'issues': ['Only PDF files are allowed']
         }
     
-    # Check file size (10MB limit)
-    max_size = 10 * 1024 * 1024  # 10MB in bytes
+    # Check file size (10MB limit unless the caller allows more)
     if file.size > max_size:
         return {
             'confidence': 0,
-            'issues': ['File size too large (maximum 10MB allowed)']
+            'issues': [f'File size too large (maximum {max_size // (1024 * 1024)}MB allowed)']
         }
     
     # Check if file is empty
@@ -2,25 +2,44 @@ from rest_framework import status, generics
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
-from django.shortcuts import get_object_or_404
 from django.core.paginator import Paginator
-from django.http import HttpResponse
+from django.http import HttpResponse, HttpResponseNotModified
+from django.core.files import File
+from django.utils.http import http_date
 
-from .models import Document, AuditLog
-from .serializers import DocumentSerializer, UploadSerializer, AuditSerializer, StatusUpdateSerializer, MultipleUploadSerializer
+from .models import Document, AuditLog, UploadSession
+from .serializers import DocumentSerializer, UploadSerializer, AuditSerializer, StatusUpdateSerializer, MultipleUploadSerializer, BulkReviewSerializer
+from .serializers import UploadSessionSerializer
 from .validators import validate_document
 from .audit import log_action_db
-from .utils import get_user_from_headers, validate_role, get_encryption_key_from_settings
+from .utils import get_user_from_headers, validate_role, get_encryption_key_from_settings, compute_verification_hash
+from .utils import document_etag, blob_etag, etag_matches, file_sha256, is_own_ciphertext, digest_matches, is_sha256_hex
 from .email_utils import notify_admin_document_verification_failed
+from .throttling import admission_control
+from .routers import replica_ok
+from .idempotency import idempotent
+from .search import search_doc_ids
+from .sync import changes_since
+from .signing import build_manifest, public_jwks
+from .compression import compress_for_storage
+from .treehash import hash_upload, tree_hash
+from .events import record_events
+from .sharding import use_shard, shard_for_owner, shard_for_doc, register_document, document_transaction, is_sharded, scatter, scatter_page, ShardUnavailable
+from . import stats, review, resumable, bloom
+from .review import apply_review
+from .metrics import timed_phase, UPLOADS, VERIFICATIONS, VERIFICATION_MISMATCHES, render_latest
 import logging
 logger = logging.getLogger('documents')
 from django.conf import settings
 import base64
+import hmac
 from io import BytesIO
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 import re
+from types import SimpleNamespace
 
 @api_view(['POST'])
+@idempotent('upload_document')
 def upload_document(request):
     """Upload a new document"""
     try:
@@ -37,9 +56,11 @@ def upload_document(request):
     serializer = UploadSerializer(data=request.data)
     if serializer.is_valid():
         try:
+            shard = shard_for_owner(user_id, for_write=True)
             # Run AI validation (on metadata only)
             file = serializer.validated_data['file']
-            ai_result = validate_document(file)
+            with timed_phase('upload_document', 'validate'):
+                ai_result = validate_document(file)
             
             # If validation fails (confidence 0), return error
             if ai_result['confidence'] == 0:
@@ -59,9 +80,15 @@ def upload_document(request):
             plaintext = file.read()
             # Compute SHA-256 of plaintext
             import hashlib
-            file_hash = hashlib.sha256(plaintext).hexdigest()
+            with timed_phase('upload_document', 'hash'):
+                file_hash, tree_digest, tree_alg = hash_upload(plaintext)
             # Encrypt
-            ciphertext = aesgcm.encrypt(iv_bytes, plaintext, None)
+            # Optionally compress first (skipped for already-compressed content)
+            with timed_phase('upload_document', 'compress'):
+                compression, stored_bytes = compress_for_storage(plaintext)
+            with timed_phase('upload_document', 'encrypt'):
+                ciphertext = aesgcm.encrypt(iv_bytes, stored_bytes, None)
+                ciphertext_hash = hashlib.sha256(ciphertext).hexdigest()
             # Store encrypted content in a Django File-like object
             encrypted_file = BytesIO(ciphertext)
             encrypted_file.name = file.name  # preserve filename
@@ -73,32 +100,41 @@ def upload_document(request):
                 ai_issues=ai_result['issues'],
             )
             # Save file field first so storage backend handles writing
-            document.file.save(file.name, encrypted_file, save=False)
+            with timed_phase('upload_document', 'storage_save'):
+                document.file.save(file.name, encrypted_file, save=False)
             # Crypto metadata
             document.file_hash = file_hash
+            document.tree_hash = tree_digest
+            document.tree_hash_alg = tree_alg
+            document.ciphertext_hash = ciphertext_hash
             document.enc_iv = base64.b64encode(iv_bytes).decode('utf-8')
             document.enc_tag = ''  # AESGCM ciphertext includes tag at the end; optional to store separately
             document.enc_alg = 'AES-256-GCM'
             document.storage_backend = 'S3' if getattr(settings, 'USE_S3', False) else 'LOCAL'
-            document.save()
-            
-            # Log upload action
-            log_action_db(document, 'UPLOAD', user_id)
+            document.compression = compression
+            # Document row, audit entry and dashboard counters commit together on the owner's shard
+            with document_transaction(shard):
+                with timed_phase('upload_document', 'db_save'):
+                    document.save()
+                register_document(document)
+                # Log upload action
+                with timed_phase('upload_document', 'audit_log'):
+                    log_action_db(document, 'UPLOAD', user_id)
+                stats.record_upload(document)
+                record_events([document], 'UPLOAD')
+            UPLOADS.inc(view='upload_document')
             
             # Return response
             response_serializer = DocumentSerializer(document, context={'request': request})
             resp = response_serializer.data
-            # Include simple manifest for verification flows
-            resp['manifest'] = {
-                'doc_id': document.doc_id,
-                'file_hash': document.file_hash,
-                'algorithm': document.enc_alg,
-                'issued_at': document.created_at.isoformat()
-            }
+            # Include signed manifest for offline verification flows
+            resp['manifest'] = build_manifest(document)
             # Provide a download URL for the encrypted file via our endpoint
             resp['download_url'] = request.build_absolute_uri(f"/api/docs/{document.doc_id}/download/")
             return Response(resp, status=status.HTTP_201_CREATED)
             
+        except ShardUnavailable as e:
+            return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         except Exception as e:
             try:
                 logger.exception("Upload failed: %s", str(e))
@@ -110,6 +146,7 @@ def upload_document(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
+@idempotent('upload_multiple_documents')
 def upload_multiple_documents(request):
     """Upload multiple documents at once (ADMIN only)"""
     try:
@@ -129,6 +166,7 @@ def upload_multiple_documents(request):
             files = serializer.validated_data['files']
             title_prefix = serializer.validated_data['title_prefix']
             owner = serializer.validated_data['owner']
+            shard = shard_for_owner(owner, for_write=True)
             
             # Prepare crypto key
             key = get_encryption_key_from_settings()
@@ -142,7 +180,8 @@ def upload_multiple_documents(request):
             for i, file in enumerate(files):
                 try:
                     # Run AI validation (on metadata only)
-                    ai_result = validate_document(file)
+                    with timed_phase('upload_multiple_documents', 'validate'):
+                        ai_result = validate_document(file)
                     
                     # If validation fails (confidence 0), skip this file
                     if ai_result['confidence'] == 0:
@@ -160,10 +199,16 @@ def upload_multiple_documents(request):
                     
                     # Compute SHA-256 of plaintext
                     import hashlib
-                    file_hash = hashlib.sha256(plaintext).hexdigest()
+                    with timed_phase('upload_multiple_documents', 'hash'):
+                        file_hash, tree_digest, tree_alg = hash_upload(plaintext)
                     
                     # Encrypt
-                    ciphertext = aesgcm.encrypt(iv_bytes, plaintext, None)
+                    # Optionally compress first (skipped for already-compressed content)
+                    with timed_phase('upload_multiple_documents', 'compress'):
+                        compression, stored_bytes = compress_for_storage(plaintext)
+                    with timed_phase('upload_multiple_documents', 'encrypt'):
+                        ciphertext = aesgcm.encrypt(iv_bytes, stored_bytes, None)
+                        ciphertext_hash = hashlib.sha256(ciphertext).hexdigest()
                     
                     # Store encrypted content in a Django File-like object
                     encrypted_file = BytesIO(ciphertext)
@@ -181,18 +226,30 @@ def upload_multiple_documents(request):
                     )
                     
                     # Save file field first so storage backend handles writing
-                    document.file.save(file.name, encrypted_file, save=False)
+                    with timed_phase('upload_multiple_documents', 'storage_save'):
+                        document.file.save(file.name, encrypted_file, save=False)
                     
                     # Crypto metadata
                     document.file_hash = file_hash
+                    document.tree_hash = tree_digest
+                    document.tree_hash_alg = tree_alg
+                    document.ciphertext_hash = ciphertext_hash
                     document.enc_iv = base64.b64encode(iv_bytes).decode('utf-8')
                     document.enc_tag = ''  # AESGCM ciphertext includes tag at the end
                     document.enc_alg = 'AES-256-GCM'
                     document.storage_backend = 'S3' if getattr(settings, 'USE_S3', False) else 'LOCAL'
-                    document.save()
-                    
-                    # Log upload action
-                    log_action_db(document, 'UPLOAD', user_id)
+                    document.compression = compression
+                    # Document row, audit entry and dashboard counters commit together on the owner's shard
+                    with document_transaction(shard):
+                        with timed_phase('upload_multiple_documents', 'db_save'):
+                            document.save()
+                        register_document(document)
+                        # Log upload action
+                        with timed_phase('upload_multiple_documents', 'audit_log'):
+                            log_action_db(document, 'UPLOAD', user_id)
+                        stats.record_upload(document)
+                        record_events([document], 'UPLOAD')
+                    UPLOADS.inc(view='upload_multiple_documents')
                     
                     # Add to successful uploads
                     uploaded_documents.append({
@@ -200,7 +257,8 @@ def upload_multiple_documents(request):
                         'title': document.title,
                         'filename': file.name,
                         'file_hash': document.file_hash,
-                        'ai_confidence': document.ai_confidence
+                        'ai_confidence': document.ai_confidence,
+                        'manifest': build_manifest(document)
                     })
                     
                 except Exception as e:
@@ -224,6 +282,8 @@ def upload_multiple_documents(request):
             
             return Response(response_data, status=status.HTTP_201_CREATED)
             
+        except ShardUnavailable as e:
+            return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         except Exception as e:
             try:
                 logger.exception("Multiple upload failed: %s", str(e))
@@ -234,13 +294,209 @@ def upload_multiple_documents(request):
     
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+TUS_VERSION = '1.0.0'
+
+def _upload_session_headers(response, session):
+    response['Tus-Resumable'] = TUS_VERSION
+    response['Upload-Offset'] = str(session.offset)
+    response['Upload-Length'] = str(session.length)
+    response['Upload-Expires'] = http_date(session.expires_at.timestamp())
+    response['Cache-Control'] = 'no-store'
+    return response
+
+def _owned_upload_session(request, upload_id):
+    """(session, None) for the calling institution's live session, else (None, error response)"""
+    try:
+        user_id, user_role = get_user_from_headers(request)
+    except Exception:
+        return None, Response({'error': 'Missing or invalid user headers'}, status=status.HTTP_400_BAD_REQUEST)
+    if user_role != 'ADMIN':
+        return None, Response({'error': 'Only institutions (ADMIN) can upload documents'},
+                              status=status.HTTP_403_FORBIDDEN)
+    session = resumable.get_session(upload_id)
+    if session is None or session.owner != user_id:
+        return None, Response({'error': 'Upload session not found or expired'}, status=status.HTTP_404_NOT_FOUND)
+    return session, None
+
+@api_view(['POST'])
+def create_upload_session(request):
+    """Start a resumable upload (ADMIN only); chunks are then PATCHed to the returned Location"""
+    try:
+        user_id, user_role = get_user_from_headers(request)
+    except Exception as e:
+        return Response({'error': 'Missing or invalid user headers'}, 
+                       status=status.HTTP_400_BAD_REQUEST)
+    
+    if user_role != 'ADMIN':
+        return Response({'error': 'Only institutions (ADMIN) can upload documents'}, 
+                       status=status.HTTP_403_FORBIDDEN)
+    
+    serializer = UploadSessionSerializer(data={
+        'title': request.data.get('title'),
+        'filename': request.data.get('filename'),
+        # tus clients send the size as a header
+        'length': request.data.get('length') or request.headers.get('Upload-Length'),
+    })
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        session = resumable.create_session(user_id, **serializer.validated_data)
+    except Exception as e:
+        logger.exception("Creating upload session failed: %s", str(e))
+        return Response({'error': 'Failed to start upload'}, 
+                       status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    response = Response({
+        'upload_id': session.upload_id,
+        'offset': session.offset,
+        'length': session.length,
+        'max_chunk_size': settings.RESUMABLE_UPLOAD_MAX_CHUNK_BYTES,
+        'expires_at': session.expires_at,
+    }, status=status.HTTP_201_CREATED)
+    response['Location'] = request.build_absolute_uri(f"/api/docs/uploads/{session.upload_id}/")
+    return _upload_session_headers(response, session)
+
+@api_view(['HEAD', 'GET', 'PATCH', 'DELETE'])
+def upload_session(request, upload_id):
+    """Resumable upload: current offset (HEAD/GET), append a chunk (PATCH) or abort (DELETE)"""
+    session, error = _owned_upload_session(request, upload_id)
+    if error:
+        return error
+    
+    if request.method in ('HEAD', 'GET'):
+        return _upload_session_headers(Response({
+            'upload_id': session.upload_id,
+            'offset': session.offset,
+            'length': session.length,
+            'expires_at': session.expires_at,
+        }), session)
+    
+    if request.method == 'DELETE':
+        resumable.discard(session)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
+    # PATCH: raw bytes starting at Upload-Offset
+    if request.content_type.split(';')[0].strip() != 'application/offset+octet-stream':
+        return Response({'error': 'Content-Type must be application/offset+octet-stream'},
+                       status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+    try:
+        offset = int(request.headers['Upload-Offset'])
+        content_length = int(request.headers.get('Content-Length') or 0)
+    except (KeyError, ValueError):
+        return Response({'error': 'Upload-Offset header is required'}, status=status.HTTP_400_BAD_REQUEST)
+    if content_length > settings.RESUMABLE_UPLOAD_MAX_CHUNK_BYTES or offset + content_length > session.length:
+        return Response({'error': 'Chunk is larger than allowed or runs past the upload length'},
+                       status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+    key = get_encryption_key_from_settings()
+    if key is None:
+        return Response({'error': 'Encryption key missing on server'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    stream = request.stream
+    try:
+        with timed_phase('upload_session', 'append'):
+            resumable.append(session, offset, stream.read if stream else (lambda n: b''), key)
+    except resumable.OffsetMismatch as e:
+        response = Response({'error': 'Upload-Offset does not match the upload', 'offset': e.offset},
+                           status=status.HTTP_409_CONFLICT)
+        response['Upload-Offset'] = str(e.offset)
+        return response
+    except resumable.UploadBusy:
+        response = Response({'error': 'Another request is writing this upload'}, status=status.HTTP_409_CONFLICT)
+        response['Retry-After'] = '1'
+        return response
+    except UploadSession.DoesNotExist:
+        return Response({'error': 'Upload session not found or expired'}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        logger.exception("Upload chunk failed: %s", str(e))
+        return Response({'error': 'Failed to store chunk'}, 
+                       status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return _upload_session_headers(Response(status=status.HTTP_204_NO_CONTENT), session)
+
+@api_view(['POST'])
+@idempotent('finalize_upload_session')
+def finalize_upload_session(request, upload_id):
+    """Create the document once every byte of a resumable upload has arrived"""
+    session, error = _owned_upload_session(request, upload_id)
+    if error:
+        return error
+    if session.offset != session.length:
+        return _upload_session_headers(Response({'error': 'Upload is incomplete', 'offset': session.offset},
+                                                status=status.HTTP_409_CONFLICT), session)
+    
+    try:
+        shard = shard_for_owner(session.owner, for_write=True)
+        with timed_phase('finalize_upload_session', 'validate'):
+            ai_result = validate_document(SimpleNamespace(name=session.filename, size=session.length),
+                                          max_size=settings.RESUMABLE_UPLOAD_MAX_BYTES)
+        if ai_result['confidence'] == 0:
+            resumable.discard(session)
+            return Response({
+                'error': 'File validation failed', 
+                'issues': ai_result['issues']
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        key = get_encryption_key_from_settings()
+        if key is None:
+            return Response({'error': 'Encryption key missing on server'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        # Hashes and ciphertext were computed as chunks arrived; only the GCM tag is left
+        with timed_phase('finalize_upload_session', 'encrypt'):
+            crypto_fields, blob_path = resumable.finish(session, key)
+        document = Document(
+            title=session.title,
+            owner=session.owner,
+            ai_confidence=ai_result['confidence'],
+            ai_issues=ai_result['issues'],
+        )
+        with timed_phase('finalize_upload_session', 'storage_save'), open(blob_path, 'rb') as blob:
+            document.file.save(session.filename, File(blob), save=False)
+        for field, value in crypto_fields.items():
+            setattr(document, field, value)
+        document.enc_tag = ''  # AESGCM ciphertext includes tag at the end
+        document.enc_alg = 'AES-256-GCM'
+        document.storage_backend = 'S3' if getattr(settings, 'USE_S3', False) else 'LOCAL'
+        # Document row, audit entry and dashboard counters commit together on the owner's shard
+        with document_transaction(shard):
+            with timed_phase('finalize_upload_session', 'db_save'):
+                document.save()
+            register_document(document)
+            log_action_db(document, 'UPLOAD', session.owner)
+            stats.record_upload(document)
+            record_events([document], 'UPLOAD')
+        resumable.discard(session)
+        UPLOADS.inc(view='finalize_upload_session')
+        
+        resp = DocumentSerializer(document, context={'request': request}).data
+        resp['manifest'] = build_manifest(document)
+        resp['download_url'] = request.build_absolute_uri(f"/api/docs/{document.doc_id}/download/")
+        return Response(resp, status=status.HTTP_201_CREATED)
+    
+    except resumable.UploadBusy:
+        response = Response({'error': 'Another request is writing this upload'}, status=status.HTTP_409_CONFLICT)
+        response['Retry-After'] = '1'
+        return response
+    except ShardUnavailable as e:
+        return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    except Exception as e:
+        logger.exception("Finalizing upload failed: %s", str(e))
+        return Response({'error': 'Failed to process document upload'}, 
+                       status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 @api_view(['GET'])
 def document_detail(request, doc_id):
     """Get document details"""
     try:
-        document = get_object_or_404(Document, doc_id=doc_id)
-        serializer = DocumentSerializer(document, context={'request': request})
-        return Response(serializer.data)
+        with use_shard(shard_for_doc(doc_id)):
+            document = Document.objects.get(doc_id=doc_id)
+        etag = document_etag(document)
+        if etag_matches(request, etag):
+            response = HttpResponseNotModified()
+        else:
+            serializer = DocumentSerializer(document, context={'request': request})
+            response = Response(serializer.data)
+        response['ETag'] = etag
+        response['Cache-Control'] = settings.DOCUMENT_CACHE_CONTROL
+        return response
     except Document.DoesNotExist:
         return Response({'error': 'Document not found'}, 
                        status=status.HTTP_404_NOT_FOUND)
@@ -248,23 +504,53 @@ def document_detail(request, doc_id):
         return Response({'error': 'Failed to retrieve document'}, 
                        status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(['GET'])
+def document_manifest(request, doc_id):
+    """Signed manifest for offline verification of a document"""
+    try:
+        with use_shard(shard_for_doc(doc_id)):
+            document = Document.objects.get(doc_id=doc_id)
+    except Document.DoesNotExist:
+        return Response({'error': 'Document not found'}, 
+                       status=status.HTTP_404_NOT_FOUND)
+    try:
+        return Response(build_manifest(document))
+    except Exception as e:
+        logger.exception("Manifest signing failed: %s", str(e))
+        return Response({'error': 'Failed to build manifest'}, 
+                       status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+def public_keys(request):
+    """Manifest verification keys (JWK set), including retired ones"""
+    try:
+        response = Response(public_jwks())
+    except Exception as e:
+        logger.exception("Loading signing keys failed: %s", str(e))
+        return Response({'error': 'Signing keys unavailable'}, 
+                       status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    response['Cache-Control'] = 'public, max-age=3600'
+    return response
+
 @api_view(['GET'])
 def document_list(request):
     """List documents with filtering and pagination"""
     try:
-        documents = Document.objects.all().order_by('-created_at')
-        
         # Apply filters
         owner = request.GET.get('owner')
         status_filter = request.GET.get('status')
         
-        if owner:
-            documents = documents.filter(owner=owner)
-        if status_filter:
-            if status_filter not in ['SUBMITTED', 'UNDER_REVIEW', 'APPROVED', 'REJECTED']:
-                return Response({'error': 'Invalid status filter'}, 
-                               status=status.HTTP_400_BAD_REQUEST)
-            documents = documents.filter(status=status_filter)
+        if status_filter and status_filter not in ['SUBMITTED', 'UNDER_REVIEW', 'APPROVED', 'REJECTED']:
+            return Response({'error': 'Invalid status filter'}, 
+                           status=status.HTTP_400_BAD_REQUEST)
+        
+        def documents():
+            queryset = Document.objects.all().order_by('-created_at')
+            if owner:
+                queryset = queryset.filter(owner=owner)
+            if status_filter:
+                queryset = queryset.filter(status=status_filter)
+            return queryset
         
         # Pagination
         try:
@@ -274,22 +560,114 @@ def document_list(request):
             return Response({'error': 'Invalid page or page_size parameter'}, 
                            status=status.HTTP_400_BAD_REQUEST)
         
-        paginator = Paginator(documents, page_size)
-        page_obj = paginator.get_page(page)
+        if owner or not is_sharded():
+            # An institution lives on a single shard
+            with use_shard(shard_for_owner(owner) if owner else 'default'):
+                paginator = Paginator(documents(), page_size)
+                page_obj = paginator.get_page(page)
+                results, pages, total = list(page_obj.object_list), paginator.num_pages, paginator.count
+        else:
+            results, pages, total = scatter_page(documents, page, page_size, key=lambda d: d.created_at)
         
-        serializer = DocumentSerializer(page_obj.object_list, many=True, context={'request': request})
+        serializer = DocumentSerializer(results, many=True, context={'request': request})
         
         return Response({
             'results': serializer.data,
             'page': page,
-            'pages': paginator.num_pages,
-            'total': paginator.count
+            'pages': pages,
+            'total': total
         })
         
     except Exception as e:
         return Response({'error': 'Failed to retrieve documents'}, 
                        status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(['GET'])
+def document_events_unavailable(request):
+    """/api/docs/events/ without USE_ASYNC_VIEWS: SSE streams would each hold a sync worker"""
+    return Response({'error': 'Event streams need USE_ASYNC_VIEWS under ASGI; poll /api/docs/changes/ instead'},
+                    status=status.HTTP_501_NOT_IMPLEMENTED)
+
+@api_view(['GET'])
+def document_changes(request):
+    """Documents created/updated and deleted since a sync token, in bounded batches"""
+    try:
+        limit = min(max(int(request.GET.get('limit', 100)), 1), 500)
+    except ValueError:
+        return Response({'error': 'Invalid limit parameter'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        documents, tombstones, token, has_more = changes_since(
+            request.GET.get('since', ''), limit, owner=request.GET.get('owner'))
+    except ValueError:
+        return Response({'error': 'Invalid since token'}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        logger.exception("Delta sync failed: %s", str(e))
+        return Response({'error': 'Failed to retrieve changes'},
+                       status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    serializer = DocumentSerializer(documents, many=True, context={'request': request})
+    return Response({
+        'changes': serializer.data,
+        'deleted': [{'doc_id': t.doc_id, 'deleted_at': t.deleted_at} for t in tombstones],
+        'next': token,
+        'has_more': has_more,
+    })
+
+@api_view(['GET'])
+def search_documents(request):
+    """Full-text search over titles and owners, ranked by relevance"""
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return Response({'error': 'q parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+        page_size = min(int(request.GET.get('page_size', 20)), 100)  # Max 100 per page
+    except ValueError:
+        return Response({'error': 'Invalid page or page_size parameter'},
+                       status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        # One extra id tells us whether another page exists without a COUNT(*)
+        offset = (page - 1) * page_size
+        if is_sharded():
+            # Ranks aren't comparable across shards' indexes: interleave each shard's ranking
+            per_shard = scatter(lambda: search_doc_ids(query, offset + page_size + 1))
+            interleaved = [ids[i] for i in range(max(map(len, per_shard))) for ids in per_shard if i < len(ids)]
+            doc_ids = interleaved[offset:offset + page_size + 1]
+        else:
+            doc_ids = search_doc_ids(query, page_size + 1, offset)
+        has_more = len(doc_ids) > page_size
+        doc_ids = doc_ids[:page_size]
+        documents = {}
+        for found in scatter(lambda: Document.objects.in_bulk(doc_ids)):
+            documents.update(found)
+        ranked = [documents[doc_id] for doc_id in doc_ids if doc_id in documents]
+        serializer = DocumentSerializer(ranked, many=True, context={'request': request})
+        return Response({
+            'results': serializer.data,
+            'query': query,
+            'page': page,
+            'has_more': has_more,
+        })
+    except Exception as e:
+        logger.exception("Search failed: %s", str(e))
+        return Response({'error': 'Search failed'},
+                       status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+def dashboard_stats(request):
+    """Document counts by status, owner and upload day (served from counter tables)"""
+    try:
+        days = min(max(int(request.GET.get('days', 30)), 1), 366)
+    except ValueError:
+        return Response({'error': 'Invalid days parameter'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        return Response(stats.snapshot(owner=request.GET.get('owner'), days=days))
+    except Exception as e:
+        logger.exception("Stats failed: %s", str(e))
+        return Response({'error': 'Failed to retrieve statistics'},
+                       status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 @api_view(['PATCH'])
 def update_document_status(request, doc_id):
     """Update document status (VERIFIER only)"""
@@ -305,7 +683,8 @@ def update_document_status(request, doc_id):
                        status=status.HTTP_403_FORBIDDEN)
     
     try:
-        document = get_object_or_404(Document, doc_id=doc_id)
+        with use_shard(shard_for_doc(doc_id)):
+            document = Document.objects.get(doc_id=doc_id)
     except Document.DoesNotExist:
         return Response({'error': 'Document not found'}, 
                        status=status.HTTP_404_NOT_FOUND)
@@ -321,19 +700,17 @@ def update_document_status(request, doc_id):
         try:
             action = serializer.validated_data['action']
             
-            # Update status
-            if action == 'APPROVE':
-                document.status = 'APPROVED'
-            elif action == 'REJECT':
-                document.status = 'REJECTED'
-            else:
-                return Response({'error': 'Invalid action. Use APPROVE or REJECT'}, 
+            outcome, current_status = apply_review([document.doc_id], action, user_id)[document.doc_id]
+            if outcome == review.ALREADY_FINAL:
+                return Response({'error': f'Document already {current_status.lower()}'}, 
                                status=status.HTTP_400_BAD_REQUEST)
-            
-            document.save()
-            
-            # Log status change
-            log_action_db(document, 'STATUS_CHANGE', user_id)
+            if outcome == review.UNAVAILABLE:
+                return Response({'error': 'Institution is being moved between shards, retry shortly'},
+                               status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            if outcome != review.UPDATED:
+                return Response({'error': 'Document status changed concurrently, reload and retry'},
+                               status=status.HTTP_409_CONFLICT)
+            document.refresh_from_db()
             
             response_serializer = DocumentSerializer(document, context={'request': request})
             return Response(response_serializer.data)
@@ -344,6 +721,41 @@ def update_document_status(request, doc_id):
     
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['POST'])
+def bulk_review_documents(request):
+    """Approve or reject many documents in one request (VERIFIER only)"""
+    try:
+        user_id, user_role = get_user_from_headers(request)
+    except Exception as e:
+        return Response({'error': 'Missing or invalid user headers'}, 
+                       status=status.HTTP_400_BAD_REQUEST)
+    
+    if user_role != 'VERIFIER':
+        return Response({'error': 'Only verifiers can update document status'}, 
+                       status=status.HTTP_403_FORBIDDEN)
+    
+    serializer = BulkReviewSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        outcomes = apply_review(serializer.validated_data['doc_ids'], serializer.validated_data['action'], user_id)
+    except Exception as e:
+        logger.exception("Bulk review failed: %s", str(e))
+        return Response({'error': 'Failed to update document status'}, 
+                       status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    return Response({
+        'action': serializer.validated_data['action'],
+        'updated': sum(1 for outcome, _ in outcomes.values() if outcome == review.UPDATED),
+        'results': [
+            {'doc_id': doc_id, 'result': outcome, 'status': doc_status}
+            for doc_id, (outcome, doc_status) in outcomes.items()
+        ],
+    })
+
+@replica_ok
+@admission_control('verify_document')
 @api_view(['POST'])
 def verify_document(request):
     """Verify a document by doc_id and file_hash provided by verifier.
@@ -356,12 +768,21 @@ def verify_document(request):
         file_hash = data.get('file_hash')
         if not doc_id or not file_hash:
             return Response({'error': 'doc_id and file_hash are required'}, status=status.HTTP_400_BAD_REQUEST)
-        document = get_object_or_404(Document, doc_id=doc_id)
-        is_valid = (document.file_hash == file_hash)
+        if not isinstance(doc_id, str) or not is_sha256_hex(file_hash):
+            return Response({'error': 'doc_id must be a string and file_hash a 64-character hex SHA-256'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        # Unknown (guessed) ids are answered from memory, before any query
+        if not bloom.might_exist(doc_id):
+            return Response({'error': 'Document not found'}, status=status.HTTP_404_NOT_FOUND)
+        with use_shard(shard_for_doc(doc_id)):
+            document = Document.objects.get(doc_id=doc_id)
+        is_valid = digest_matches(document, file_hash)
+        VERIFICATIONS.inc(endpoint='verify_document')
         payload = {'valid': bool(is_valid)}
         if is_valid:
             payload['doc'] = DocumentSerializer(document, context={'request': request}).data
         else:
+            VERIFICATION_MISMATCHES.inc(endpoint='verify_document')
             # Send email notification to admin about verification failure
             try:
                 notify_admin_document_verification_failed(
@@ -373,6 +794,7 @@ def verify_document(request):
         
         return Response(payload, status=status.HTTP_200_OK)
     except Document.DoesNotExist:
+        bloom.record_miss(doc_id)
         return Response({'error': 'Document not found'}, status=status.HTTP_404_NOT_FOUND)
     except Exception:
         return Response({'error': 'Verification failed'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -389,22 +811,34 @@ def download_encrypted_document(request, doc_id):
     if user_role not in ['ADMIN', 'VERIFIER']:
         return Response({'error': 'Not authorized to download document'}, status=status.HTTP_403_FORBIDDEN)
     try:
-        document = get_object_or_404(Document, doc_id=doc_id)
-        document.file.open('rb')
-        data = document.file.read()
-        response = HttpResponse(data, content_type='application/octet-stream')
-        response['Content-Disposition'] = f'attachment; filename="{document.file.name.split("/")[-1]}"'
+        with use_shard(shard_for_doc(doc_id)):
+            document = Document.objects.get(doc_id=doc_id)
+        etag = blob_etag(document)
+        if etag_matches(request, etag):
+            response = HttpResponseNotModified()
+        else:
+            with timed_phase('download_encrypted_document', 'storage_read'):
+                document.file.open('rb')
+                data = document.file.read()
+            response = HttpResponse(data, content_type='application/octet-stream')
+            response['Content-Disposition'] = f'attachment; filename="{document.file.name.split("/")[-1]}"'
+        if etag:
+            response['ETag'] = etag
+        response['Cache-Control'] = settings.DOWNLOAD_CACHE_CONTROL
         return response
     except Document.DoesNotExist:
         return Response({'error': 'Document not found'}, status=status.HTTP_404_NOT_FOUND)
     except Exception:
         return Response({'error': 'Failed to download document'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@replica_ok
+@admission_control('verify_document_file', expensive=True)
 @api_view(['POST'])
 def verify_document_file(request):
     """Verify by accepting an uploaded file and a doc_id.
     - Expects multipart/form-data with fields: file, doc_id
-    - Attempts to decrypt using stored IV and server key; if decrypt fails, treats file as plaintext
+    - Recognises our own encrypted blob by its ciphertext SHA-256 without decrypting
+    - Otherwise attempts to decrypt using stored IV and server key; if decrypt fails, treats file as plaintext
     - Computes SHA-256 over plaintext and compares with stored file_hash
     """
     try:
@@ -412,43 +846,31 @@ def verify_document_file(request):
         upload = request.FILES.get('file')
         if not doc_id or not upload:
             return Response({'error': 'doc_id and file are required'}, status=status.HTTP_400_BAD_REQUEST)
-        document = get_object_or_404(Document, doc_id=doc_id)
-        key = get_encryption_key_from_settings()
-        if key is None:
-            return Response({'error': 'Encryption key missing on server'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        payload = upload.read()
-        # 1) Try to extract embedded hash from stamped PDF comments tail
-        embedded_hash = None
-        try:
-            tail_text = payload[-4096:].decode('utf-8', errors='ignore') if payload else ''
-            m = re.search(r"%%ACREDIVAULT-HASH:([0-9a-fA-F]{64})", tail_text)
-            if m:
-                embedded_hash = m.group(1).lower()
-        except Exception:
-            embedded_hash = None
-
-        if embedded_hash:
-            calc_hash = embedded_hash
+        if not bloom.might_exist(doc_id):
+            return Response({'error': 'Document not found'}, status=status.HTTP_404_NOT_FOUND)
+        with use_shard(shard_for_doc(doc_id)):
+            document = Document.objects.get(doc_id=doc_id)
+        # Our own encrypted blob is recognised by its stored SHA-256: no key, no decryption
+        with timed_phase('verify_document_file', 'fingerprint'):
+            own_blob = is_own_ciphertext(file_sha256(upload), document)
+        if own_blob:
+            calc_hash = document.file_hash
         else:
-            # 2) Fall back to decrypting (if ours) then hash plaintext
-            plaintext = None
-            try:
-                iv_bytes = base64.b64decode(document.enc_iv) if document.enc_iv else None
-                if iv_bytes:
-                    aesgcm = AESGCM(key)
-                    plaintext = aesgcm.decrypt(iv_bytes, payload, None)
-            except Exception:
-                plaintext = None
-            if plaintext is None:
-                plaintext = payload
-            import hashlib
-            calc_hash = hashlib.sha256(plaintext).hexdigest()
-        is_valid = (calc_hash == document.file_hash)
+            key = get_encryption_key_from_settings()
+            if key is None:
+                return Response({'error': 'Encryption key missing on server'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            payload = upload.read()
+            with timed_phase('verify_document_file', 'verify_hash'):
+                calc_hash = compute_verification_hash(
+                    payload, document.enc_iv, key, document.compression, tree_hash if document.tree_hash else None)
+        is_valid = digest_matches(document, calc_hash)
+        VERIFICATIONS.inc(endpoint='verify_document_file')
         result = {'valid': bool(is_valid), 'doc_id': doc_id}
         if is_valid:
             result['doc'] = DocumentSerializer(document, context={'request': request}).data
         else:
             result['reason'] = 'hash-mismatch'
+            VERIFICATION_MISMATCHES.inc(endpoint='verify_document_file')
             # Send email notification to admin about verification failure
             try:
                 notify_admin_document_verification_failed(
@@ -460,6 +882,7 @@ def verify_document_file(request):
         
         return Response(result, status=status.HTTP_200_OK)
     except Document.DoesNotExist:
+        bloom.record_miss(doc_id)
         return Response({'error': 'Document not found'}, status=status.HTTP_404_NOT_FOUND)
     except Exception:
         return Response({'error': 'Verification failed'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -473,14 +896,17 @@ def audit_logs(request):
         if doc_id:
             # Get audit logs for a specific document
             try:
-                document = get_object_or_404(Document, doc_id=doc_id)
-                logs = AuditLog.objects.filter(doc=document).order_by('-created_at')
+                shard = shard_for_doc(doc_id)
+                with use_shard(shard):
+                    document = Document.objects.get(doc_id=doc_id)
+                logs = lambda: AuditLog.objects.filter(doc=document).order_by('-created_at')
             except Document.DoesNotExist:
                 return Response({'error': 'Document not found'}, 
                                status=status.HTTP_404_NOT_FOUND)
         else:
             # Get all audit logs
-            logs = AuditLog.objects.all().order_by('-created_at')
+            shard = None
+            logs = lambda: AuditLog.objects.all().order_by('-created_at')
         
         # Apply pagination
         try:
@@ -490,18 +916,39 @@ def audit_logs(request):
             return Response({'error': 'Invalid page or page_size parameter'}, 
                            status=status.HTTP_400_BAD_REQUEST)
         
-        paginator = Paginator(logs, page_size)
-        page_obj = paginator.get_page(page)
+        if shard or not is_sharded():
+            with use_shard(shard or 'default'):
+                paginator = Paginator(logs(), page_size)
+                page_obj = paginator.get_page(page)
+                results, pages, total = list(page_obj.object_list), paginator.num_pages, paginator.count
+        else:
+            results, pages, total = scatter_page(logs, page, page_size, key=lambda log: log.created_at)
         
-        serializer = AuditSerializer(page_obj.object_list, many=True)
+        serializer = AuditSerializer(results, many=True)
         
         return Response({
             'results': serializer.data,
             'page': page,
-            'pages': paginator.num_pages,
-            'total': paginator.count
+            'pages': pages,
+            'total': total
         })
         
     except Exception as e:
         return Response({'error': 'Failed to retrieve audit logs'}, 
-                       status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+                       status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+LOOPBACK_ADDRS = ('127.0.0.1', '::1')
+
+def metrics(request):
+    """Prometheus scrape endpoint (text exposition format)"""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        supplied = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(supplied.encode(), f'Bearer {token}'.encode()):
+            return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+    elif not getattr(settings, 'METRICS_PUBLIC', False):
+        # A proxy on this host makes every client look local; only direct loopback scrapes count
+        local = request.META.get('REMOTE_ADDR') in LOOPBACK_ADDRS and 'X-Forwarded-For' not in request.headers
+        if not local:
+            return HttpResponse('Forbidden: set METRICS_TOKEN to scrape remotely', status=403, content_type='text/plain')
+    return HttpResponse(render_latest(), content_type='text/plain; version=0.0.4; charset=utf-8')
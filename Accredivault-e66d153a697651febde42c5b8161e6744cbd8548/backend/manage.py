@@ -6,7 +6,9 @@ import sys
 
 def main():
     """Run administrative tasks."""
-    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'accredivault.settings')
+    # The test suite never touches db.sqlite3 or media/ (see accredivault/test_settings.py)
+    default_settings = 'accredivault.test_settings' if sys.argv[1:2] == ['test'] else 'accredivault.settings'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', default_settings)
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Offline verifier for AccrediVault document manifests.
+
+    python accredivault_verify.py document.pdf manifest.json --keys keys.json
+
+``manifest.json`` is the ``manifest`` returned by the upload endpoints or by
+``GET /api/docs/<doc_id>/manifest/`` (a whole upload response works too);
+``keys.json`` is a saved copy of ``GET /api/keys/``. Fetch the keys once, over
+a channel you trust; after that nothing here talks to the network. Exits 0
+when the signature is valid and the PDF's SHA-256 matches, 1 otherwise.
+
+Only depends on ``cryptography``. Importable as a library:
+``verify_document(pdf_bytes, manifest, load_keys(jwks))``.
+"""
+import argparse
+import base64
+import hashlib
+import json
+import sys
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
+
+
+class VerificationError(Exception):
+    pass
+
+
+def _b64url_decode(value):
+    return base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+
+
+def canonical_bytes(manifest):
+    """Bytes the signature covers: the manifest minus its signature, sorted and compact."""
+    unsigned = {k: v for k, v in manifest.items() if k != 'signature'}
+    return json.dumps(unsigned, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def load_keys(jwks):
+    """{kid: public key} from a JWK set as served by /api/keys/."""
+    keys = {}
+    for jwk in jwks.get('keys', []):
+        if jwk.get('kty') == 'OKP' and jwk.get('crv') == 'Ed25519':
+            keys[jwk['kid']] = Ed25519PublicKey.from_public_bytes(_b64url_decode(jwk['x']))
+    return keys
+
+
+def verify_manifest(manifest, keys):
+    """Check the manifest signature; raises VerificationError."""
+    if 'signature' not in manifest:
+        raise VerificationError('manifest is not signed')
+    if manifest.get('signature_alg') != 'Ed25519':
+        raise VerificationError(f"unsupported signature algorithm {manifest.get('signature_alg')!r}")
+    key = keys.get(manifest.get('key_id'))
+    if key is None:
+        raise VerificationError(f"unknown key id {manifest.get('key_id')!r}; refresh keys.json")
+    try:
+        key.verify(_b64url_decode(manifest['signature']), canonical_bytes(manifest))
+    except (InvalidSignature, ValueError) as e:
+        raise VerificationError('signature does not match manifest') from e
+
+
+def verify_document(pdf_bytes, manifest, keys):
+    """Check the signature and that the PDF is the one the manifest describes."""
+    verify_manifest(manifest, keys)
+    if manifest.get('hash_algorithm', 'SHA-256') != 'SHA-256':
+        raise VerificationError(f"unsupported hash algorithm {manifest['hash_algorithm']!r}")
+    digest = hashlib.sha256(pdf_bytes).hexdigest()
+    if digest != manifest.get('file_hash', '').lower():
+        raise VerificationError(f'file hash {digest} does not match manifest')
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Verify an AccrediVault document offline')
+    parser.add_argument('pdf')
+    parser.add_argument('manifest')
+    parser.add_argument('--keys', required=True, help='saved copy of GET /api/keys/')
+    args = parser.parse_args(argv)
+
+    with open(args.manifest) as f:
+        manifest = json.load(f)
+    manifest = manifest.get('manifest', manifest)
+    with open(args.keys) as f:
+        keys = load_keys(json.load(f))
+    with open(args.pdf, 'rb') as f:
+        pdf_bytes = f.read()
+
+    try:
+        verify_document(pdf_bytes, manifest, keys)
+    except VerificationError as e:
+        print(f'INVALID: {e}')
+        return 1
+    print(f"VALID: {manifest['doc_id']} \"{manifest.get('title', '')}\" issued by {manifest.get('owner')} "
+          f"at {manifest.get('issued_at')} (key {manifest['key_id']})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())